@@ -0,0 +1 @@
+"""HTTP API for the plan, version, log and auth operations (see api/app.py)."""
@@ -0,0 +1,282 @@
+"""Async HTTP API over the plan, version, log and auth operations of db/query.py.
+
+Requests run on an AsyncEngine (aiosqlite or asyncpg) with a pooled connection
+and a session per request. Simple reads are plain async SELECTs reusing the
+query layer's statements; operations built on the session-level helpers
+(delta versioning, sections, search index, archived logs) run through
+``AsyncSession.run_sync`` so the exact same code paths serve the CLI and the
+API. Password hashing runs in a worker thread so it never blocks the loop.
+
+Authenticate with ``POST /auth/login`` and send the returned token as
+``Authorization: Bearer <token>``. Serve with ``python main.py serve``.
+"""
+import asyncio
+import os
+import secrets
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, UTC
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.schemas import (
+    ChangePage, LoginRequest, LogPage, PlanContent, PlanCreate, PlanSummary, RollbackRequest, SectionUpdate,
+    TokenResponse, UserCreate, UserOut, VersionCreate, VersionOut,
+)
+from db.changes import read_changes
+from db.content_cache import plan_content
+from db.database_setup import create_async_db_engine, ensure_schema_on
+from db.models import Plan, PlanVersion, User
+from db.query import CATALOG_SORT_KEYS, catalog_statement
+from db.retention import iter_logs
+from db.search import unindex_plan
+from db.sections import read_section, replace_section
+from db.versioning import VersionConflict, append_edit, append_version, is_write_conflict, reconstruct
+from scripts import login_tokens
+from scripts.auth import check_permission, hash_password, verify_password
+from scripts.plan_diff import MergeConflict, merge_sections
+
+API_TOKEN_TTL = int(os.getenv("API_TOKEN_TTL", str(login_tokens.session_ttl())))
+MAX_PAGE_SIZE = 1000
+
+
+def create_app(database_url=None):
+    """Build the FastAPI application bound to database_url (DATABASE_URL by default)."""
+
+    @asynccontextmanager
+    async def lifespan(app):
+        engine = create_async_db_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(ensure_schema_on)
+        app.state.engine = engine
+        app.state.sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        # SQLite allows one writer; queueing writers here is far cheaper than busy-waiting on the file lock
+        app.state.write_lock = asyncio.Lock() if engine.dialect.name == "sqlite" else None
+        yield
+        await engine.dispose()
+
+    app = FastAPI(title="DR/IR Plan API", lifespan=lifespan)
+    _add_routes(app)
+    return app
+
+
+# Dependencies
+async def get_session(request: Request):
+    """Yield a session for the duration of one request."""
+    async with request.app.state.sessionmaker() as session:
+        yield session
+
+async def write_session(request: Request, session=Depends(get_session)):
+    """The request session, holding the single-writer lock on SQLite for the rest of the request."""
+    lock = request.app.state.write_lock
+    if lock is None:
+        yield session
+        return
+    async with lock:
+        yield session
+
+_bearer = HTTPBearer(auto_error=False)
+
+async def current_user(credentials: HTTPAuthorizationCredentials | None = Depends(_bearer), session=Depends(get_session)):
+    """Resolve the bearer token to a user; tokens die when the user's password changes."""
+    claims = login_tokens.verify_token(credentials.credentials) if credentials else None
+    if not claims or claims.get("typ") != "api":
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid or expired token.", {"WWW-Authenticate": "Bearer"})
+    user = await session.get(User, claims["uid"])
+    if user is None or not login_tokens.session_matches(claims, user.password_hash):
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid or expired token.", {"WWW-Authenticate": "Bearer"})
+    return user
+
+def require_role(role):
+    """Dependency factory: the current user, if their role is at least role."""
+    async def dependency(user=Depends(current_user)):
+        if not check_permission(user, role):
+            raise HTTPException(status.HTTP_403_FORBIDDEN, f"Requires the '{role}' role.")
+        return user
+    return dependency
+
+async def _plan_summary(session, plan_id):
+    """Return the catalog row for one plan or raise 404."""
+    row = (await session.execute(catalog_statement().where(Plan.id == plan_id))).first()
+    if row is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Plan {plan_id} not found.")
+    return row
+
+async def _commit_version(session, plan_id, write, *args):
+    """Run a versioning helper and commit its version (if any); another writer getting in first is a 409."""
+    try:
+        version = await session.run_sync(write, *args)
+        if version is not None:
+            await session.commit()
+        return version
+    except Exception as e:
+        if not is_write_conflict(e):
+            raise
+        await session.rollback()
+        raise HTTPException(status.HTTP_409_CONFLICT, f"Plan {plan_id} was changed by another request; retry.")
+
+
+def _add_routes(app):
+    # Health and auth
+    @app.get("/health")
+    async def health(session=Depends(get_session)):
+        await session.execute(select(1))
+        return {"status": "ok"}
+
+    @app.post("/auth/login", response_model=TokenResponse)
+    async def login(credentials: LoginRequest, session=Depends(get_session)):
+        user = (await session.execute(select(User).where(User.username == credentials.username))).scalar_one_or_none()
+        valid = user is not None and await asyncio.to_thread(verify_password, credentials.password, user.password_hash)
+        if not valid:
+            raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid credentials.")
+        now = int(time.time())
+        claims = {
+            "typ": "api",
+            "uid": user.id,
+            "usr": user.username,
+            "iat": now,
+            "exp": now + API_TOKEN_TTL,
+            "jti": secrets.token_hex(8),
+            "pwh": login_tokens.hash_fingerprint(user.password_hash),
+        }
+        return TokenResponse(access_token=login_tokens.sign_claims(claims),
+                             expires_at=datetime.fromtimestamp(claims["exp"], UTC))
+
+    # Users
+    @app.get("/users/me", response_model=UserOut)
+    async def me(user=Depends(current_user)):
+        return user
+
+    @app.post("/users", response_model=UserOut, status_code=status.HTTP_201_CREATED)
+    async def create_user(new_user: UserCreate, session=Depends(write_session), _=Depends(require_role("admin"))):
+        password_hash = await asyncio.to_thread(hash_password, new_user.password)
+        user = User(username=new_user.username, password_hash=password_hash, role=new_user.role)
+        session.add(user)
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(status.HTTP_409_CONFLICT, f"User '{new_user.username}' already exists.")
+        return user
+
+    # Plans
+    @app.get("/plans", response_model=list[PlanSummary])
+    async def list_plans(plan_type: str | None = None, owner: str | None = None, sort_by: str = "id",
+                         descending: bool = False, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                         offset: int = Query(0, ge=0), session=Depends(get_session), _=Depends(current_user)):
+        if sort_by not in CATALOG_SORT_KEYS:
+            raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, f"sort_by must be one of {', '.join(CATALOG_SORT_KEYS)}.")
+        stmt = catalog_statement(plan_type, owner, sort_by, descending, limit, offset)
+        return (await session.execute(stmt)).all()
+
+    @app.post("/plans", response_model=PlanSummary, status_code=status.HTTP_201_CREATED)
+    async def create_plan(new_plan: PlanCreate, session=Depends(write_session), user=Depends(require_role("editor"))):
+        framework = new_plan.framework.lower() if new_plan.framework else None
+        plan = Plan(title=new_plan.title, plan_type=new_plan.plan_type, owner_id=user.id, framework=framework)
+        session.add(plan)
+        await session.flush()
+        if new_plan.content is not None:
+            await session.run_sync(append_version, plan.id, new_plan.content)
+        await session.commit()
+        return await _plan_summary(session, plan.id)
+
+    @app.get("/plans/{plan_id}", response_model=PlanSummary)
+    async def get_plan(plan_id: int, session=Depends(get_session), _=Depends(current_user)):
+        return await _plan_summary(session, plan_id)
+
+    @app.delete("/plans/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
+    async def delete_plan(plan_id: int, session=Depends(write_session), _=Depends(require_role("admin"))):
+        def delete(sync_session):
+            plan = sync_session.get(Plan, plan_id)
+            if plan is None:
+                return False
+            unindex_plan(sync_session, plan_id)
+            sync_session.delete(plan)
+            return True
+
+        if not await session.run_sync(delete):
+            raise HTTPException(status.HTTP_404_NOT_FOUND, f"Plan {plan_id} not found.")
+        await session.commit()
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    # Versions
+    @app.get("/plans/{plan_id}/versions", response_model=list[VersionOut])
+    async def list_versions(plan_id: int, session=Depends(get_session), _=Depends(current_user)):
+        stmt = (
+            select(PlanVersion.version_number, PlanVersion.storage, PlanVersion.content_length,
+                   PlanVersion.content_hash, PlanVersion.created_at)
+            .where(PlanVersion.plan_id == plan_id)
+            .order_by(PlanVersion.version_number)
+        )
+        return (await session.execute(stmt)).all()
+
+    @app.post("/plans/{plan_id}/versions", response_model=VersionOut, status_code=status.HTTP_201_CREATED)
+    async def save_version(plan_id: int, new_version: VersionCreate, session=Depends(write_session),
+                           _=Depends(require_role("editor"))):
+        await _plan_summary(session, plan_id)
+        merge = merge_sections if new_version.merge else None
+        try:
+            return await _commit_version(session, plan_id, append_edit, plan_id, new_version.content,
+                                         new_version.base_version, merge)
+        except (VersionConflict, MergeConflict) as e:
+            raise HTTPException(status.HTTP_409_CONFLICT, str(e))
+
+    @app.get("/plans/{plan_id}/content", response_model=PlanContent)
+    async def get_content(plan_id: int, version: int | None = None, session=Depends(get_session), _=Depends(current_user)):
+        entry = await session.run_sync(plan_content, plan_id, version)
+        if entry is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, f"Plan {plan_id} has no such version.")
+        return PlanContent(plan_id=plan_id, version_number=entry.version_number, content=entry.content)
+
+    @app.post("/plans/{plan_id}/rollback", response_model=VersionOut, status_code=status.HTTP_201_CREATED)
+    async def rollback(plan_id: int, request: RollbackRequest, session=Depends(write_session),
+                       _=Depends(require_role("editor"))):
+        content = await session.run_sync(reconstruct, plan_id, request.version_number)
+        if content is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, f"Version {request.version_number} of plan {plan_id} not found.")
+        return await _commit_version(session, plan_id, append_version, plan_id, content)
+
+    # Sections
+    @app.get("/plans/{plan_id}/sections/{path:path}", response_model=PlanContent)
+    async def get_section(plan_id: int, path: str, session=Depends(get_session), _=Depends(current_user)):
+        section = await session.run_sync(read_section, plan_id, path)
+        if section is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, f"Plan {plan_id} has no section '{path}'.")
+        return PlanContent(plan_id=plan_id, content=section.content)
+
+    @app.put("/plans/{plan_id}/sections/{path:path}", response_model=VersionOut)
+    async def update_section(plan_id: int, path: str, update: SectionUpdate, session=Depends(write_session),
+                             _=Depends(require_role("editor"))):
+        try:
+            version = await _commit_version(session, plan_id, replace_section, plan_id, path, update.body)
+        except ValueError as e:
+            raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
+        if version is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, f"Plan {plan_id} has no section '{path}'.")
+        return version
+
+    # Logs
+    @app.get("/logs", response_model=LogPage)
+    async def logs(user_id: int | None = None, action: str | None = None, since: datetime | None = None,
+                   until: datetime | None = None, after_id: int | None = None,
+                   limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), session=Depends(get_session),
+                   _=Depends(require_role("admin"))):
+        since = since.astimezone(UTC).replace(tzinfo=None) if since and since.tzinfo else since
+        until = until.astimezone(UTC).replace(tzinfo=None) if until and until.tzinfo else until
+        items = await session.run_sync(lambda sync_session: list(iter_logs(
+            sync_session, user_id=user_id, action_prefix=action, since=since, until=until,
+            after_id=after_id, limit=limit, batch_size=limit,
+        )))
+        return LogPage(items=items, next_after_id=items[-1].id if len(items) == limit else None)
+
+    # Change feed
+    @app.get("/changes", response_model=ChangePage)
+    async def changes(since: int = Query(0, ge=0), limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                      table: list[str] | None = Query(None), session=Depends(get_session),
+                      _=Depends(require_role("admin"))):
+        cursor, items = await session.run_sync(lambda sync_session: read_changes(sync_session, since, limit, table))
+        return ChangePage(cursor=cursor, changes=items)
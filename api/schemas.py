@@ -0,0 +1,101 @@
+"""Pydantic request and response models for the HTTP API."""
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field
+
+Role = Literal["admin", "approver", "editor", "viewer"]
+PlanType = Literal["drp", "irp"]
+
+
+# Auth and users
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_at: datetime
+
+class UserCreate(BaseModel):
+    username: str = Field(min_length=1, max_length=50)
+    password: str = Field(min_length=8)
+    role: Role = "viewer"
+
+class UserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    username: str
+    role: str
+    created_at: datetime | None = None
+
+
+# Plans and versions
+class PlanCreate(BaseModel):
+    title: str = Field(min_length=1, max_length=255)
+    plan_type: PlanType
+    framework: str | None = Field(default=None, max_length=20)  # Control catalog for coverage checks (e.g. nist)
+    content: str | None = None  # Saved as version 1 when given
+
+class PlanSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    plan_type: str
+    owner: str | None = None
+    latest_version: int | None = None
+    updated_at: datetime | None = None
+
+class VersionCreate(BaseModel):
+    content: str
+    base_version: int | None = Field(default=None, ge=0)  # Version the edit started from; 409 if the plan moved on
+    merge: bool = False  # With base_version, merge section by section with edits saved since instead of refusing
+
+class VersionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    version_number: int
+    storage: str
+    content_length: int
+    content_hash: str
+    created_at: datetime | None = None
+
+class PlanContent(BaseModel):
+    plan_id: int
+    version_number: int | None = None  # None when composed from the latest sections
+    content: str
+
+class RollbackRequest(BaseModel):
+    version_number: int = Field(ge=1)
+
+class SectionUpdate(BaseModel):
+    body: str
+
+
+# Logs
+class LogOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: int | None = None
+    action: str
+    timestamp: datetime | None = None
+
+class LogPage(BaseModel):
+    items: list[LogOut]
+    next_after_id: int | None = None  # Pass as after_id to fetch the next page
+
+# Change feed
+class ChangeOut(BaseModel):
+    seq: int
+    table: str
+    id: int
+    op: str  # insert, update or delete
+    row: dict | None = None  # Current column values; None for deletes
+
+class ChangePage(BaseModel):
+    cursor: int  # Pass as since to fetch the next page
+    changes: list[ChangeOut]
@@ -0,0 +1,59 @@
+"""Benchmark audit log throughput: per-event commits vs. the buffered writer.
+
+Usage: python benchmarks/bench_audit_log.py [--events 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to sys.path to resolve module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.orm import sessionmaker
+from db.database_setup import create_db_engine
+from db.models import Base, Log
+from db.audit import AuditWriter
+
+def bench_sync(Session, events):
+    """Commit every event individually, as log_action does in sync mode."""
+    session = Session()
+    start = time.perf_counter()
+    for i in range(events):
+        session.add(Log(user_id=1, action=f"Sync action {i}"))
+        session.commit()
+    elapsed = time.perf_counter() - start
+    session.close()
+    return elapsed
+
+def bench_async(Session, events, batch_size):
+    """Queue every event on the buffered writer and wait for the final flush."""
+    writer = AuditWriter(Session, batch_size=batch_size)
+    start = time.perf_counter()
+    for i in range(events):
+        writer.submit(1, f"Async action {i}")
+    writer.close()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        sync_elapsed = bench_sync(Session, args.events)
+        async_elapsed = bench_async(Session, args.events, args.batch_size)
+        engine.dispose()
+
+    print(f"sync  : {args.events / sync_elapsed:10.0f} events/sec ({sync_elapsed:.2f}s)")
+    print(f"async : {args.events / async_elapsed:10.0f} events/sec ({async_elapsed:.2f}s)")
+    print(f"speedup: {sync_elapsed / async_elapsed:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark online snapshots against a plain file copy, with and without concurrent writers.
+
+Builds a WAL-mode SQLite database of roughly --size-mb megabytes of plan-like
+text, then times shutil.copy, create_backup (copy + compression), verify and
+restore. While each copy runs a writer thread keeps committing small inserts;
+its commit latency shows how much the copy stalls writers.
+
+Usage: python benchmarks/bench_backup.py [--size-mb 2048] [--compression gz] [--pages 1024]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Add the project root to sys.path to resolve module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.backup import create_backup, restore_backup, verify_backup
+
+WORDS = ("recovery backup failover restore payroll server incident contact escalation network "
+         "database storage vendor priority impact objective runbook").split()
+
+def build_database(path, size_mb, seed):
+    """Fill a WAL-mode database with about size_mb megabytes of text rows."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE docs (id INTEGER PRIMARY KEY, body TEXT)")
+    conn.execute("CREATE TABLE writes (id INTEGER PRIMARY KEY, at REAL)")
+    row = 4096
+    batch = [" ".join(rng.choices(WORDS, k=row // 8))[:row] for _ in range(256)]
+    for _ in range(size_mb * 1024 * 1024 // (row * len(batch))):
+        rng.shuffle(batch)
+        conn.executemany("INSERT INTO docs (body) VALUES (?)", [(body,) for body in batch])
+        conn.commit()
+    conn.close()
+
+class Writer(threading.Thread):
+    """Commit one small insert after another and record each commit's latency."""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.latencies = []
+        self.running = True
+
+    def run(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        while self.running:
+            start = time.perf_counter()
+            conn.execute("INSERT INTO writes (at) VALUES (?)", (start,))
+            conn.commit()
+            self.latencies.append(time.perf_counter() - start)
+            time.sleep(0.001)
+        conn.close()
+
+def timed(label, function, path=None):
+    """Run function with a concurrent writer; print its time and the writer's commit latencies."""
+    writer = Writer(path) if path else None
+    if writer:
+        writer.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    line = f"{label:28} {elapsed:8.2f}s"
+    if writer:
+        writer.running = False
+        writer.join()
+        latencies = sorted(writer.latencies)
+        line += (f"   writer: {len(latencies) / elapsed:7.0f} commits/s, p50 {statistics.median(latencies) * 1000:6.2f} ms,"
+                 f" max {latencies[-1] * 1000:8.2f} ms")
+    print(line)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--compression", choices=["gz", "br", "none"], default="gz")
+    parser.add_argument("--pages", type=int, default=1024, help="Pages per backup step")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", default=None, help="Work directory (default: a temporary directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        source = os.path.join(tmp, "source.db")
+        start = time.perf_counter()
+        build_database(source, args.size_mb, args.seed)
+        size = os.path.getsize(source)
+        print(f"database: {size / 1e6:.0f} MB built in {time.perf_counter() - start:.1f}s")
+
+        backup_dir = os.path.join(tmp, "backups")
+        timed("shutil.copy (may be torn)", lambda: shutil.copy(source, os.path.join(tmp, "copy.db")), source)
+        metadata = timed(f"create_backup ({args.compression})",
+                         lambda: create_backup(source, backup_dir, args.compression, pages=args.pages), source)
+        snapshot = os.path.join(backup_dir, metadata["file"])
+        print(f"  copy {metadata['copy_seconds']:.2f}s ({size / 1e6 / metadata['copy_seconds']:.0f} MB/s), "
+              f"{metadata['steps']} steps, {metadata['backup_bytes'] / 1e6:.1f} MB on disk "
+              f"({metadata['database_bytes'] / metadata['backup_bytes']:.1f}x)")
+        timed("verify_backup (quick)", lambda: verify_backup(snapshot, quick=True))
+        timed("verify_backup (full)", lambda: verify_backup(snapshot))
+        timed("restore_backup", lambda: restore_backup(snapshot, os.path.join(tmp, "restored.db"), snapshot_first=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark NDJSON dump and restore throughput in rows/sec.
+
+Usage: python benchmarks/bench_dump_restore.py [--logs 200000] [--compression gz]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to sys.path to resolve module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert
+from db.database_setup import create_db_engine
+from db.dump import dump_database, restore_database
+from db.models import Base, Log, User
+
+def populate(engine, logs):
+    """Insert one user and the requested number of audit log rows."""
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "username": "bench", "password_hash": "x", "role": "admin"}])
+        batch = 10000
+        for offset in range(0, logs, batch):
+            conn.execute(insert(Log), [{"user_id": 1, "action": f"Benchmark action {i}"} for i in range(offset, min(offset + batch, logs))])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--compression", choices=["none", "gz", "br"], default="none")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = create_db_engine(f"sqlite:///{os.path.join(tmp, 'source.db')}")
+        Base.metadata.create_all(bind=source)
+        populate(source, args.logs)
+
+        path = os.path.join(tmp, "dump.ndjson" + ("" if args.compression == "none" else f".{args.compression}"))
+        start = time.perf_counter()
+        counts = dump_database(path, engine=source, chunk_size=args.chunk_size)
+        dump_elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+
+        target = create_db_engine(f"sqlite:///{os.path.join(tmp, 'target.db')}")
+        start = time.perf_counter()
+        restore_database(path, engine=target)
+        restore_elapsed = time.perf_counter() - start
+
+        print(f"rows    : {total}")
+        print(f"size    : {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"dump    : {total / dump_elapsed:10.0f} rows/sec ({dump_elapsed:.2f}s)")
+        print(f"restore : {total / restore_elapsed:10.0f} rows/sec ({restore_elapsed:.2f}s)")
+        source.dispose()
+        target.dispose()
+
+if __name__ == "__main__":
+    main()
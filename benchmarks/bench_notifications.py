@@ -0,0 +1,61 @@
+"""Benchmark email throughput in messages/sec: a connection per message vs. the pooled dispatcher.
+
+Runs against the local stand-in server from tests/fake_smtp.py. --handshake-delay
+simulates the network round trips of connect, STARTTLS and login on a real server.
+
+Usage: python benchmarks/bench_notifications.py [--messages 500] [--handshake-delay 0.02] [--pool-size 4]
+"""
+import argparse
+import os
+import smtplib
+import sys
+import time
+
+# Add the project root to sys.path to resolve module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scripts.notifications import NotificationDispatcher, build_message
+from tests.fake_smtp import FakeSMTPServer
+
+def bench_per_message(port, messages):
+    """Connect, log in and send for every message, as the old send_email did."""
+    start = time.perf_counter()
+    for i in range(messages):
+        with smtplib.SMTP("127.0.0.1", port) as server:
+            server.login("notifier", "secret")
+            server.send_message(build_message(f"approver{i}@example.com", f"Plan {i} changed", "Please review."))
+    return time.perf_counter() - start
+
+def bench_dispatcher(port, messages, pool_size, batch_size):
+    """Queue every message on a pooled dispatcher and wait for delivery."""
+    dispatcher = NotificationDispatcher(host="127.0.0.1", port=port, username="notifier", password="secret",
+                                        starttls=False, pool_size=pool_size, batch_size=batch_size)
+    start = time.perf_counter()
+    for i in range(messages):
+        dispatcher.submit(f"approver{i}@example.com", f"Plan {i} changed", "Please review.")
+    queued = time.perf_counter() - start
+    dispatcher.flush()
+    elapsed = time.perf_counter() - start
+    dispatcher.close()
+    return queued, elapsed, dispatcher.connections
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--handshake-delay", type=float, default=0.02, help="Seconds added to the greeting and to AUTH")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with FakeSMTPServer(handshake_delay=args.handshake_delay) as server:
+        per_message = bench_per_message(server.port, args.messages)
+        queued, pooled, connections = bench_dispatcher(server.port, args.messages, args.pool_size, args.batch_size)
+
+    print(f"messages        : {args.messages}")
+    print(f"per-message     : {args.messages / per_message:10.0f} msg/sec ({per_message:.2f}s, {args.messages} connections)")
+    print(f"pooled          : {args.messages / pooled:10.0f} msg/sec ({pooled:.2f}s, {connections} connections)")
+    print(f"caller blocked  : {queued * 1000:10.1f} ms to queue everything")
+    print(f"speedup         : {per_message / pooled:10.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark CLI startup cost: `main.py --help` wall time and import-time breakdown.
+
+Usage: python benchmarks/bench_startup.py [--runs 20] [--top 15]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def time_help(runs):
+    """Return wall-clock seconds for each `python main.py --help` run."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", "--help"], cwd=PROJECT_ROOT, capture_output=True, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def import_breakdown(top):
+    """Return the slowest imports of main.py and its direct dependencies as (cumulative_us, module) pairs."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match and len(match.group(2)) <= 3:
+            rows.append((int(match.group(1)), match.group(3)))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = time_help(args.runs)
+    print(f"main.py --help over {args.runs} runs: "
+          f"mean {statistics.mean(timings) * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms")
+    print("\nSlowest imports of main.py (cumulative):")
+    for cumulative, module in import_breakdown(args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+if __name__ == "__main__":
+    main()
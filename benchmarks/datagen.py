@@ -0,0 +1,118 @@
+"""Seeded synthetic data generator for benchmarks.
+
+Creates N users, M plans with K versions each (rendered from the master
+templates, edited a few lines per version) and L audit logs spread over the
+year before EPOCH. Every value comes from the seed and the fixed EPOCH (only
+the salt of the shared password hash differs), so the same seed always
+produces the same database and timings from different runs and machines
+compare like for like. Age-based commands such as ``archive-logs
+--older-than`` count days from today, so pick ages relative to EPOCH.
+
+Usage: python benchmarks/datagen.py DB_PATH [--users 100] [--plans 1000] [--versions 10] [--logs 100000] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the project root to sys.path to resolve module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert
+from db.database_setup import create_db_engine, ensure_schema
+from db.models import Log, Plan, PlanSection, PlanVersion, User
+from db.retention import rebuild_rollups
+from db.search import rebuild_index
+from db.sections import section_rows
+from db.versioning import encode_version
+from scripts.auth import hash_password
+from scripts.template_engine import load_template
+
+# Every generated user has this password (hashed once, see generate)
+BENCH_PASSWORD = "BenchPass123!"
+ROLES = ("admin", "approver", "editor", "viewer")
+SYSTEMS = ("Payroll", "CRM", "Billing", "Email", "Data Warehouse", "VPN", "HR Portal", "ERP", "Wiki", "Ticketing")
+ACTIONS = ("Logged in", "Created plan", "Updated plan", "Exported plan", "Viewed plan", "Deleted plan")
+BATCH = 5000
+# Reference time for every generated timestamp (never datetime.now(), which would change the data per run)
+EPOCH = datetime(2025, 1, 1)
+
+def _edit(content, rng, number):
+    """Return content with one random line rewritten, as a small edit between versions would."""
+    lines = content.splitlines(keepends=True)
+    index = rng.randrange(len(lines))
+    lines[index] = f"- Revision {number}: reviewed by {rng.choice(SYSTEMS)} owner\n"
+    return "".join(lines)
+
+def generate(engine, users=100, plans=1000, versions=10, logs=100000, seed=42):
+    """Populate an empty database; return a dict of row counts."""
+    rng = random.Random(seed)
+    ensure_schema(engine, force=True)
+    password_hash = hash_password(BENCH_PASSWORD)
+    counts = {"users": users, "plans": plans, "plan_versions": plans * versions, "logs": logs}
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i:05d}", "password_hash": password_hash,
+             "role": ROLES[0] if i == 1 else rng.choice(ROLES), "created_at": EPOCH}
+            for i in range(1, users + 1)
+        ])
+
+        plan_rows, version_rows, section_batch = [], [], []
+        for plan_id in range(1, plans + 1):
+            plan_type = rng.choice(("drp", "irp"))
+            system = f"{rng.choice(SYSTEMS)} {plan_id}"
+            plan_rows.append({"id": plan_id, "title": f"{system} {plan_type.upper()}", "plan_type": plan_type,
+                              "owner_id": rng.randint(1, users), "created_at": EPOCH, "updated_at": EPOCH})
+            content = previous = None
+            for number in range(1, versions + 1):
+                if content is None:
+                    content = load_template(plan_type).render({"System A": system})
+                else:
+                    content = _edit(content, rng, number)
+                version_rows.append({"plan_id": plan_id, **encode_version(number, content, previous), "created_at": EPOCH})
+                previous = content
+            section_batch.extend(section_rows(plan_id, content))
+
+            if len(version_rows) >= BATCH:
+                conn.execute(insert(Plan), plan_rows)
+                conn.execute(insert(PlanVersion), version_rows)
+                conn.execute(insert(PlanSection), section_batch)
+                plan_rows, version_rows, section_batch = [], [], []
+        if plan_rows:
+            conn.execute(insert(Plan), plan_rows)
+            conn.execute(insert(PlanVersion), version_rows)
+            conn.execute(insert(PlanSection), section_batch)
+
+        timestamps = sorted(EPOCH - timedelta(seconds=rng.randrange(365 * 24 * 3600)) for _ in range(logs))
+        for offset in range(0, logs, BATCH):
+            conn.execute(insert(Log), [
+                {"user_id": rng.randint(1, users), "action": f"{rng.choice(ACTIONS)} {rng.randint(1, max(plans, 1))}",
+                 "timestamp": timestamp}
+                for timestamp in timestamps[offset:offset + BATCH]
+            ])
+
+        rebuild_index(conn)
+        rebuild_rollups(conn)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--plans", type=int, default=1000)
+    parser.add_argument("--versions", type=int, default=10)
+    parser.add_argument("--logs", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_db_engine(f"sqlite:///{os.path.abspath(args.db_path)}")
+    start = time.perf_counter()
+    counts = generate(engine, args.users, args.plans, args.versions, args.logs, args.seed)
+    print(", ".join(f"{count} {table}" for table, count in counts.items()) + f" in {time.perf_counter() - start:.1f}s")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
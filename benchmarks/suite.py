@@ -0,0 +1,214 @@
+"""Benchmark suite: time the query layer and CLI commands at several data scales.
+
+Each scale runs in its own process against a fresh SQLite database filled by
+benchmarks/datagen.py with a fixed seed. Results (median and min milliseconds
+per call) are written as JSON. With --compare, every benchmark whose median is
+slower than the baseline by more than --threshold is reported as a regression
+and the exit status is 1.
+
+Usage:
+    python benchmarks/suite.py [--scales small,medium] [--output results.json]
+    python benchmarks/suite.py --compare baseline.json [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, UTC
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# name: (users, plans, versions per plan, logs)
+SCALES = {
+    "small": (10, 100, 5, 10000),
+    "medium": (100, 1000, 10, 100000),
+    "large": (1000, 10000, 20, 1000000),
+}
+
+
+# Worker (runs inside the per-scale process)
+def _time(function, runs):
+    """Call function runs times (after one warm-up call); return timings in milliseconds."""
+    function()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def run_scale(scale, runs, seed):
+    """Generate the data for one scale and time every benchmark; return {name: stats}."""
+    import logging
+    logging.disable(logging.INFO)  # Per-row INFO logging would dominate listing timings
+
+    sys.path.append(PROJECT_ROOT)
+    from click.testing import CliRunner
+    from benchmarks.datagen import BENCH_PASSWORD, generate
+    from db.database_setup import get_engine
+    from db import query
+    from db.content_cache import get_cache
+    from db.models import PlanDiff
+    from scripts.plan_diff import clear_diff_cache
+    from main import cli
+
+    users, plans, versions, logs = SCALES[scale]
+    generate(get_engine(), users, plans, versions, logs, seed)
+    runner = CliRunner()
+    plan_id = plans // 2 or 1
+    username = "user00001"
+    runner.invoke(cli, ["login", username, BENCH_PASSWORD])
+
+    def invoke(*args):
+        result = runner.invoke(cli, list(args))
+        if result.exit_code != 0:
+            raise RuntimeError(f"CLI {' '.join(args)} failed: {result.output}")
+
+    def content_cold():
+        get_cache().clear()
+        query.get_plan_content(plan_id, html=True)
+
+    def diff_cold():
+        clear_diff_cache()
+        query.session.query(PlanDiff).delete()
+        query.session.commit()
+        query.diff_plan_versions(plan_id, 1, versions)
+
+    benchmarks = {
+        "query.authenticate_user": lambda: query.authenticate_user(username, BENCH_PASSWORD),
+        "query.authenticate_session": lambda: query.authenticate_session(username),
+        "query.list_plans": lambda: query.list_plans(),
+        "query.plan_catalog_page": lambda: list(query.plan_catalog(sort_by="title", limit=50)),
+        "query.get_plan_content_latest": lambda: query.get_plan_content(plan_id),
+        "query.get_plan_content_first": lambda: query.get_plan_content(plan_id, 1),
+        "query.get_plan_html_latest": lambda: query.get_plan_content(plan_id, html=True),
+        "query.get_plan_html_cold": content_cold,
+        "query.get_plan_section": lambda: query.get_plan_section(plan_id, "Scope"),
+        "query.save_plan_version": lambda: query.save_plan_version(plan_id, query.get_plan_content(plan_id) + "- Benchmark edit\n"),
+        "query.update_plan_section": lambda: query.update_plan_section(plan_id, "Scope", "- Benchmark scope\n"),
+        "query.rollback_plan": lambda: query.rollback_plan(plan_id, 1),
+        "query.diff_plan_versions_cold": diff_cold,
+        "query.search_plans": lambda: query.search_plans("payroll recovery", limit=20),
+        "query.plan_coverage_cached": lambda: query.plan_coverage(framework="nist"),
+        "query.log_action": lambda: query.log_action(1, "Benchmark action"),
+        "query.view_logs_user_page": lambda: list(query.view_logs(user_id=1, limit=100)),
+        "query.view_logs_recent_scan": lambda: list(query.view_logs(action_prefix="Exported plan", limit=100)),
+        "query.log_report_year": lambda: query.log_report(group_by=("user", "action")),
+        "cli.list-plans-cli": lambda: invoke("list-plans-cli", "--limit", "50"),
+        "cli.list-plan-versions-cli": lambda: invoke("list-plan-versions-cli", str(plan_id)),
+        "cli.get-section": lambda: invoke("get-section", str(plan_id), "Scope"),
+        "cli.search": lambda: invoke("search", "payroll"),
+        "cli.view-logs-cli": lambda: invoke("view-logs-cli", username, "--limit", "100"),
+        "cli.log-report": lambda: invoke("log-report", username),
+    }
+    results = {}
+    for name, function in benchmarks.items():
+        timings = _time(function, runs)
+        results[name] = {
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "runs": runs,
+        }
+    return results
+
+
+# Driver
+def run_suite(scales, runs, seed):
+    """Run every scale in a fresh process and database; return the results document."""
+    document = {
+        "meta": {
+            "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+            "seed": seed,
+            "runs": runs,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "scales": {},
+    }
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                "DRIR_CONFIG_DIR": os.path.join(tmp, "config"),
+                "AUDIT_LOG_MODE": "sync",
+            }
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", scale, "--runs", str(runs), "--seed", str(seed)],
+                cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise RuntimeError(f"Scale '{scale}' failed:\n{result.stderr}")
+            document["scales"][scale] = {
+                "size": dict(zip(("users", "plans", "versions", "logs"), SCALES[scale])),
+                "results": json.loads(result.stdout),
+            }
+            print(f"{scale}: done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return document
+
+def compare(current, baseline, threshold):
+    """Return (scale, name, baseline_ms, current_ms, ratio) for every regression past threshold."""
+    regressions = []
+    for scale, data in current["scales"].items():
+        previous = baseline.get("scales", {}).get(scale, {}).get("results", {})
+        for name, stats in data["results"].items():
+            if name not in previous:
+                continue
+            before, after = previous[name]["median_ms"], stats["median_ms"]
+            ratio = after / before if before else float("inf")
+            if ratio > 1 + threshold:
+                regressions.append((scale, name, before, after, ratio))
+    return regressions
+
+def print_results(document):
+    """Print a per-scale table of median timings."""
+    for scale, data in document["scales"].items():
+        print(f"\n{scale} ({', '.join(f'{value} {key}' for key, value in data['size'].items())})")
+        for name, stats in data["results"].items():
+            print(f"  {name:32} {stats['median_ms']:10.3f} ms  (min {stats['min_ms']:.3f})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="small,medium", help=f"Comma-separated scales ({', '.join(SCALES)})")
+    parser.add_argument("--runs", type=int, default=5, help="Timed calls per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Write the results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", default=None, help="Flag regressions against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        json.dump(run_scale(args.worker, args.runs, args.seed), sys.stdout)
+        return
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale '{unknown[0]}'. Use any of: {', '.join(SCALES)}.")
+
+    document = run_suite(scales, args.runs, args.seed)
+    print_results(document)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(document, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for scale, name, before, after, ratio in regressions:
+                print(f"  [{scale}] {name}: {before:.3f} -> {after:.3f} ms ({ratio:.2f}x)")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Buffered, group-committing writer for the audit log.
+
+In ``async`` mode audit events are queued in memory and a background thread
+bulk-inserts them into the ``logs`` table, one transaction per flush. A flush
+happens when ``batch_size`` events are waiting, when ``flush_interval`` seconds
+have passed since the oldest buffered event, on an explicit ``flush()`` and at
+interpreter exit. In ``sync`` mode (the default) every event is committed
+before ``log_action`` returns.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, UTC
+
+from sqlalchemy import insert
+
+from db.changes import record_changes
+from db.models import Log
+from db.retention import record_rollups
+
+# Audit durability: "sync" commits each event, "async" group-commits in the background
+AUDIT_LOG_MODE = os.getenv("AUDIT_LOG_MODE", "sync").lower()
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+
+_STOP = object()
+_FLUSH = object()
+
+
+class AuditWriter:
+    """Background writer that bulk-inserts queued audit events."""
+
+    def __init__(self, session_factory, queue_size=AUDIT_QUEUE_SIZE, batch_size=AUDIT_BATCH_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the background thread if it is not already running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, user_id, action, timestamp=None):
+        """Queue an audit event, blocking when the buffer is full."""
+        self.start()
+        self._queue.put({"user_id": user_id, "action": action, "timestamp": timestamp or datetime.now(UTC)})
+
+    def flush(self):
+        """Block until every event submitted so far has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self):
+        """Flush pending events and stop the background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """Drain the queue, writing one transaction per batch."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            if item is _FLUSH:
+                self._queue.task_done()
+                continue
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP or item is _FLUSH:
+                    self._queue.task_done()
+                    stopping = item is _STOP
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        """Bulk-insert a batch of events and their rollup counts in a single transaction."""
+        session = self.session_factory()
+        try:
+            log_ids = session.scalars(insert(Log).returning(Log.id, sort_by_parameter_order=True), batch).all()
+            record_changes(session, "logs", log_ids, "insert")
+            record_rollups(session, batch)
+            session.commit()
+            self.written += len(batch)
+        except Exception as e:
+            session.rollback()
+            self.failed += len(batch)
+            logging.error(f"Failed to write {len(batch)} audit log entries: {e}")
+        finally:
+            session.close()
+
+
+_writer = None
+
+def get_audit_writer():
+    """Return the process-wide audit writer, creating it on first use."""
+    global _writer
+    if _writer is None:
+        from db.database_setup import SessionFactory
+        _writer = AuditWriter(SessionFactory)
+        atexit.register(_writer.close)
+    return _writer
+
+def set_audit_mode(mode):
+    """Switch audit durability between "sync" and "async" at runtime."""
+    global AUDIT_LOG_MODE
+    mode = mode.lower()
+    if mode not in ("sync", "async"):
+        raise ValueError(f"Unknown audit log mode '{mode}'. Use 'sync' or 'async'.")
+    if mode == "sync" and _writer is not None:
+        _writer.flush()
+    AUDIT_LOG_MODE = mode
+
+def flush_audit_log():
+    """Write out any buffered audit events."""
+    if _writer is not None:
+        _writer.flush()
@@ -0,0 +1,298 @@
+"""Online snapshots of the SQLite database with retention, verification and restore.
+
+Snapshots are taken with SQLite's online backup API from a separate read-only
+connection, ``BACKUP_PAGES_PER_STEP`` pages at a time with a short pause
+between steps, so writers are never locked out for the whole copy (in WAL mode
+readers never block writers at all). The backup API restarts whenever another
+connection writes to the source mid-copy; after ``BACKUP_MAX_RESTARTS``
+restarts the copy finishes in a single step, which reads one consistent
+snapshot. The copy is then streamed through gzip or Brotli into
+``BACKUP_DIR`` next to a JSON sidecar holding its SHA-256, page count and
+schema version.
+
+``prune_backups`` keeps the newest ``BACKUP_KEEP_LAST`` snapshots plus the
+newest snapshot of each of the last ``BACKUP_KEEP_DAILY`` days.
+``verify_backup`` decompresses a snapshot, checks its hash and runs SQLite's
+integrity check; ``restore_backup`` verifies and then copies it into the live
+database with the backup API, so open WAL files stay consistent.
+"""
+import glob
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy.engine import make_url
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join("outputs", "backups"))
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "gz")  # gz, br or none
+# gzip level (1-9) or Brotli quality (0-11); low levels keep compression near disk speed
+BACKUP_COMPRESSION_LEVEL = int(os.getenv("BACKUP_COMPRESSION_LEVEL", "1"))
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "1024"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.002"))
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))
+BACKUP_KEEP_LAST = int(os.getenv("BACKUP_KEEP_LAST", "7"))
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY", "14"))
+
+SNAPSHOT_PREFIX = "snapshot-"
+_EXTENSIONS = {"gz": ".db.gz", "br": ".db.br", "none": ".db"}
+_CHUNK_SIZE = 1 << 20
+
+
+class _Restarted(Exception):
+    """Raised from the progress callback to abandon an incremental copy that keeps restarting."""
+
+
+def database_path(url=None):
+    """Return the SQLite file behind url (DATABASE_URL by default), or raise for other backends."""
+    from db.database_setup import DATABASE_URL
+    url = make_url(url or DATABASE_URL)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise NotImplementedError("Online backups need a file-based SQLite database; use `dump` for other backends.")
+    return url.database
+
+
+# Compressed streams
+def _open_writer(path, compression, level=BACKUP_COMPRESSION_LEVEL):
+    """Open a binary writer that compresses with gzip, Brotli or not at all."""
+    if compression == "gz":
+        return gzip.open(path, "wb", compresslevel=level)
+    if compression == "br":
+        from db.dump import _BrotliWriter
+        return io.BufferedWriter(_BrotliWriter(path, quality=level), _CHUNK_SIZE)
+    return open(path, "wb")
+
+def _read_chunks(path):
+    """Yield the decompressed bytes of a snapshot file, one chunk at a time."""
+    if path.endswith(".br"):
+        import brotli
+        decompressor = brotli.Decompressor()
+        with open(path, "rb") as file:
+            for data in iter(lambda: file.read(_CHUNK_SIZE), b""):
+                yield decompressor.process(data)
+        return
+    with (gzip.open if path.endswith(".gz") else open)(path, "rb") as file:
+        yield from iter(lambda: file.read(_CHUNK_SIZE), b"")
+
+def _compression_of(path):
+    return "gz" if path.endswith(".gz") else "br" if path.endswith(".br") else "none"
+
+
+# Copying
+def copy_database(source_path, target_path, pages=BACKUP_PAGES_PER_STEP, step_sleep=BACKUP_STEP_SLEEP,
+                  max_restarts=BACKUP_MAX_RESTARTS):
+    """Copy a live SQLite database to target_path with the online backup API; return the steps taken."""
+    source = sqlite3.connect(f"file:{os.path.abspath(source_path)}?mode=ro", uri=True)
+    progress = {"steps": 0, "remaining": None, "restarts": 0}
+
+    def on_step(status, remaining, total):
+        progress["steps"] += 1
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if progress["restarts"] > max_restarts:
+                raise _Restarted()
+        progress["remaining"] = remaining
+        if remaining and step_sleep:
+            time.sleep(step_sleep)  # Let writers in between steps
+
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target, pages=pages, progress=on_step)
+            return progress["steps"]
+        except _Restarted:
+            logging.info(f"Backup of {source_path} restarted {progress['restarts']} times under writes; copying in one step.")
+        finally:
+            target.close()
+
+        # A single step reads one consistent snapshot, so it cannot restart
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target, pages=-1)
+            return progress["steps"] + 1
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+def _describe(path):
+    """Return page count, page size and schema version of a SQLite file."""
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        return {
+            "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+            "page_size": conn.execute("PRAGMA page_size").fetchone()[0],
+            "schema_version": conn.execute("PRAGMA user_version").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+# Snapshots
+def create_backup(source_path=None, backup_dir=None, compression=None, pages=BACKUP_PAGES_PER_STEP,
+                  step_sleep=BACKUP_STEP_SLEEP):
+    """Take a compressed snapshot of the database and return its metadata (the sidecar contents)."""
+    source_path = source_path or database_path()
+    backup_dir = backup_dir or BACKUP_DIR
+    compression = compression or BACKUP_COMPRESSION
+    if compression not in _EXTENSIONS:
+        raise ValueError(f"Unknown backup compression '{compression}'. Use gz, br or none.")
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Database {source_path} does not exist.")
+    os.makedirs(backup_dir, exist_ok=True)
+
+    created_at = datetime.now(UTC)
+    name = f"{SNAPSHOT_PREFIX}{created_at.strftime('%Y%m%dT%H%M%S%f')[:-3]}Z{_EXTENSIONS[compression]}"
+    path = os.path.join(backup_dir, name)
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(dir=backup_dir) as tmp:
+        copy_path = os.path.join(tmp, "copy.db")
+        steps = copy_database(source_path, copy_path, pages, step_sleep)
+        copied = time.perf_counter()
+        metadata = {"file": name, "created_at": created_at.isoformat(), "source": os.path.abspath(source_path),
+                    "compression": compression, "steps": steps, **_describe(copy_path)}
+
+        digest = hashlib.sha256()
+        size = 0
+        with open(copy_path, "rb") as file, _open_writer(f"{path}.tmp", compression) as out:
+            for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        os.replace(f"{path}.tmp", path)
+
+    metadata.update(
+        sha256=digest.hexdigest(),
+        database_bytes=size,
+        backup_bytes=os.path.getsize(path),
+        copy_seconds=round(copied - start, 3),
+        total_seconds=round(time.perf_counter() - start, 3),
+    )
+    with open(f"{path}.json", "w", encoding="utf-8") as file:
+        json.dump(metadata, file, indent=2)
+    logging.info(f"Backed up {source_path} to {path} ({size} -> {metadata['backup_bytes']} bytes) "
+                 f"in {metadata['total_seconds']:.2f}s.")
+    return metadata
+
+def list_backups(backup_dir=None):
+    """Return the metadata of every snapshot in backup_dir, oldest first."""
+    backups = []
+    for sidecar in sorted(glob.glob(os.path.join(backup_dir or BACKUP_DIR, f"{SNAPSHOT_PREFIX}*.json"))):
+        with open(sidecar, encoding="utf-8") as file:
+            metadata = json.load(file)
+        metadata["path"] = sidecar[:-len(".json")]
+        backups.append(metadata)
+    return sorted(backups, key=lambda metadata: metadata["created_at"])
+
+def prune_backups(backup_dir=None, keep_last=BACKUP_KEEP_LAST, keep_daily=BACKUP_KEEP_DAILY, now=None):
+    """Delete snapshots outside the retention policy; return the paths removed."""
+    backups = list_backups(backup_dir)
+    keep = {metadata["path"] for metadata in backups[-keep_last:]} if keep_last else set()
+    cutoff = ((now or datetime.now(UTC)) - timedelta(days=keep_daily)).date()
+    newest_per_day = {}
+    for metadata in backups:
+        day = datetime.fromisoformat(metadata["created_at"]).date()
+        if day > cutoff:
+            newest_per_day[day] = metadata["path"]
+    keep.update(newest_per_day.values())
+
+    removed = []
+    for metadata in backups:
+        if metadata["path"] not in keep:
+            for path in (metadata["path"], f"{metadata['path']}.json"):
+                if os.path.exists(path):
+                    os.remove(path)
+            removed.append(metadata["path"])
+    if removed:
+        logging.info(f"Pruned {len(removed)} snapshots.")
+    return removed
+
+
+# Verify and restore
+def _load_metadata(path):
+    sidecar = f"{path}.json"
+    if not os.path.exists(sidecar):
+        return None
+    with open(sidecar, encoding="utf-8") as file:
+        return json.load(file)
+
+def _decompress(path, target_path):
+    """Write the decompressed snapshot to target_path and return its SHA-256."""
+    digest = hashlib.sha256()
+    with open(target_path, "wb") as out:
+        for chunk in _read_chunks(path):
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+def _check(path, expected_sha256, copy_path, quick=False):
+    """Return a list of problems with a snapshot decompressed to copy_path."""
+    problems = []
+    try:
+        actual = _decompress(path, copy_path)
+    except (OSError, EOFError, ValueError) as e:
+        return [f"cannot decompress: {e}"]
+    if expected_sha256 and actual != expected_sha256:
+        problems.append("checksum mismatch")
+    try:
+        conn = sqlite3.connect(f"file:{os.path.abspath(copy_path)}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        return problems + [f"not a SQLite database: {e}"]
+    if rows != [("ok",)]:
+        problems.extend(row[0] for row in rows[:10])
+    return problems
+
+def verify_backup(path, quick=False):
+    """Decompress a snapshot and check its hash and integrity; return a list of problems (empty if sound)."""
+    metadata = _load_metadata(path)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp:
+        return _check(path, metadata and metadata.get("sha256"), os.path.join(tmp, "verify.db"), quick)
+
+def restore_backup(path, target_path=None, snapshot_first=True, backup_dir=None):
+    """Verify a snapshot and copy it over the database; return the safety snapshot's metadata, if one was taken.
+
+    The copy runs through the backup API on a connection to the live file, so
+    other processes see either the old or the new database, never a mix.
+    """
+    target_path = target_path or database_path()
+    metadata = _load_metadata(path)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp:
+        copy_path = os.path.join(tmp, "restore.db")
+        problems = _check(path, metadata and metadata.get("sha256"), copy_path, quick=True)
+        if problems:
+            raise ValueError(f"Snapshot {path} failed verification: {'; '.join(problems)}")
+
+        safety = None
+        if snapshot_first and os.path.exists(target_path):
+            safety = create_backup(target_path, backup_dir or os.path.dirname(os.path.abspath(path)),
+                                   _compression_of(path))
+        source = sqlite3.connect(copy_path)
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    logging.info(f"Restored {target_path} from {path}.")
+    return safety
+
+def copy_file(source_path, target_path):
+    """Copy a file, using the online backup API when it is a SQLite database."""
+    with open(source_path, "rb") as file:
+        is_sqlite = file.read(16) == b"SQLite format 3\x00"
+    if is_sqlite:
+        copy_database(source_path, target_path)
+    else:
+        shutil.copy(source_path, target_path)
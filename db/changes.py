@@ -0,0 +1,307 @@
+"""Change feed for incremental sync of downstream replicas.
+
+Every flush that inserts, updates or deletes a User, Plan, PlanVersion or Log
+row appends one ``changes`` row per written row in the same transaction. The
+rows are collected from mapper events, which also fire for cascaded deletes
+and for foreign keys nulled by a delete, and written with one executemany in
+``after_flush``. Bulk Core statements skip those events, so the bulk paths
+(import_users, create_plans_bulk, the async audit writer and log archiving)
+call record_changes themselves. CHANGE_FEED_TABLES limits the tracked tables;
+set it empty to turn the feed off.
+
+A change's id is the feed cursor (SQLite AUTOINCREMENT, so ids are never
+reused). read_changes returns the changes after a cursor collapsed to one entry
+per row with the row's current values, or a delete if the row is gone, so a
+row written many times is sent once per batch. apply_changes upserts them into
+another database in foreign-key order, one transaction per batch together with
+the replica's cursor, and updates the derived tables (search index, plan
+sections, log rollups) for the rows it touches. Sync cost therefore follows
+the number of changes, not the size of the database.
+
+With SQLite's single writer, changes commit in id order. On backends with
+concurrent writers a transaction can commit a lower id after a reader has
+passed it, so readers there should lag the feed slightly.
+"""
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import bindparam, delete, event, func, insert, select, text
+from sqlalchemy.orm import Session, object_session
+
+from db.dump import _decoders, _encoders, _open_writer, _read_lines
+from db.models import Base, Change, Log, Plan, PlanSection, PlanVersion, SyncCursor, User
+
+TRACKED_MODELS = {model.__tablename__: model for model in (User, Plan, PlanVersion, Log)}
+CHANGE_FEED_TABLES = [
+    name for name in (item.strip() for item in os.getenv("CHANGE_FEED_TABLES", ",".join(TRACKED_MODELS)).split(","))
+    if name in TRACKED_MODELS
+]
+CHANGE_BATCH_SIZE = int(os.getenv("CHANGE_BATCH_SIZE", "1000"))
+
+CHANGES_FORMAT = "dr_ir_generation-changes"
+CHANGES_VERSION = 1
+
+
+# Capture
+def _track(operation):
+    """Return a mapper event listener that queues a change for the session's next after_flush."""
+    def listener(mapper, connection, target):
+        session = object_session(target)
+        if session is None:
+            return
+        if operation == "update" and not session.is_modified(target, include_collections=False):
+            return
+        session.info.setdefault("pending_changes", []).append(
+            {"table_name": mapper.local_table.name, "row_id": target.id, "operation": operation}
+        )
+    return listener
+
+for _name in CHANGE_FEED_TABLES:
+    for _operation in ("insert", "update", "delete"):
+        event.listen(TRACKED_MODELS[_name], f"after_{_operation}", _track(_operation))
+
+@event.listens_for(Session, "before_flush")
+def _reset_pending(session, flush_context, instances):
+    # Drop changes queued by a flush that failed part way through
+    session.info.pop("pending_changes", None)
+
+@event.listens_for(Session, "after_flush")
+def _write_pending(session, flush_context):
+    rows = session.info.pop("pending_changes", None)
+    if rows:
+        session.connection().execute(insert(Change), rows)
+
+def record_changes(session_or_conn, table_name, row_ids, operation):
+    """Append changes for rows written by bulk statements, which bypass the flush events."""
+    if table_name not in CHANGE_FEED_TABLES or not row_ids:
+        return
+    session_or_conn.execute(insert(Change), [
+        {"table_name": table_name, "row_id": row_id, "operation": operation} for row_id in row_ids
+    ])
+
+
+# Reading the feed
+def latest_change_id(session_or_conn):
+    """Return the id of the newest change (0 if the feed is empty)."""
+    return session_or_conn.execute(select(func.max(Change.id))).scalar() or 0
+
+def read_changes(session_or_conn, since=0, limit=None, tables=None):
+    """Return (cursor, changes) for up to limit changes after the since cursor.
+
+    Changes are collapsed to one dict per row, ordered by the row's last change:
+    seq (that change's id), table, id, op and row, the row's current column
+    values encoded as in db.dump. op is insert if the row was created after
+    since, delete if it no longer exists (row is None) and update otherwise.
+    Pass the returned cursor as since to read the next batch.
+    """
+    stmt = select(Change.id, Change.table_name, Change.row_id, Change.operation).where(Change.id > since)
+    if tables:
+        stmt = stmt.where(Change.table_name.in_(tables))
+    changes = session_or_conn.execute(stmt.order_by(Change.id).limit(limit or CHANGE_BATCH_SIZE)).all()
+    if not changes:
+        return since, []
+
+    latest = {}
+    for change in changes:
+        if change.table_name not in TRACKED_MODELS:
+            continue
+        key = (change.table_name, change.row_id)
+        first = latest.pop(key, None)
+        latest[key] = (change.id, first[1] if first else change.operation)
+
+    current = {}
+    for table_name in {table_name for table_name, _ in latest}:
+        table = Base.metadata.tables[table_name]
+        columns = [column.name for column in table.columns]
+        encoders = _encoders(table)
+        row_ids = [row_id for name, row_id in latest if name == table_name]
+        for row in session_or_conn.execute(select(table).where(table.c.id.in_(row_ids))):
+            current[(table_name, row.id)] = {
+                name: encoder(value) if encoder else value for name, encoder, value in zip(columns, encoders, row)
+            }
+
+    result = []
+    for (table_name, row_id), (seq, first_operation) in latest.items():
+        row = current.get((table_name, row_id))
+        operation = "delete" if row is None else ("insert" if first_operation == "insert" else "update")
+        result.append({"seq": seq, "table": table_name, "id": row_id, "op": operation, "row": row})
+    return changes[-1].id, result
+
+def iter_changes(session_or_conn, since=0, batch_size=None, tables=None):
+    """Yield (cursor, changes) batches after the since cursor until the feed is exhausted."""
+    while True:
+        cursor, changes = read_changes(session_or_conn, since, batch_size, tables)
+        if not changes:
+            return
+        yield cursor, changes
+        since = cursor
+
+def write_changes(path, batches, since=0, source=None):
+    """Write change batches as NDJSON (compressed for .gz/.br); return (cursor, change_count)."""
+    cursor, count = since, 0
+    with _open_writer(path) as out:
+        out.write(json.dumps({"format": CHANGES_FORMAT, "version": CHANGES_VERSION, "source": source, "since": since}) + "\n")
+        for cursor, changes in batches:
+            out.write(json.dumps({"cursor": cursor, "changes": changes}, separators=(",", ":")) + "\n")
+            count += len(changes)
+    return cursor, count
+
+def read_change_file(path):
+    """Return (header, batches) for a file written by write_changes."""
+    lines = _read_lines(path)
+    header = json.loads(next(lines, "{}"))
+    if header.get("format") != CHANGES_FORMAT:
+        raise ValueError(f"{path} is not a {CHANGES_FORMAT} file.")
+
+    def batches():
+        for line in lines:
+            if line:
+                record = json.loads(line)
+                yield record["cursor"], record["changes"]
+    return header, batches()
+
+
+# Applying the feed to a replica
+def _upsert(bind, table):
+    """Return an INSERT that overwrites an existing row with the same primary key."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key.columns],
+        set_={column.name: stmt.excluded[column.name] for column in table.columns if not column.primary_key},
+    )
+
+def apply_batch(conn, changes):
+    """Apply one batch from read_changes to conn's database (the caller commits); return {table: rows}.
+
+    Deletes run child tables first and upserts parent tables first. The search
+    index, plan sections and log rollups are updated for the rows touched.
+    """
+    from db.retention import record_rollups
+    from db.search import SEARCH_TABLE, index_versions, search_enabled
+    from db.sections import sync_sections
+    from db.versioning import latest_version_number, reconstruct
+
+    order = [table for table in Base.metadata.sorted_tables if table.name in TRACKED_MODELS]
+    deletes, upserts = {}, {}
+    for change in changes:
+        (deletes if change["op"] == "delete" else upserts).setdefault(change["table"], []).append(change)
+
+    counts = {}
+    deleted_versions = [change["id"] for change in deletes.get("plan_versions", [])]
+    if deleted_versions and search_enabled(conn):
+        conn.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+                     {"ids": deleted_versions})
+    if "plans" in deletes:
+        conn.execute(delete(PlanSection).where(PlanSection.plan_id.in_([change["id"] for change in deletes["plans"]])))
+    for table in reversed(order):
+        if table.name in deletes:
+            row_ids = [change["id"] for change in deletes[table.name]]
+            conn.execute(delete(table).where(table.c.id.in_(row_ids)))
+            counts[table.name] = counts.get(table.name, 0) + len(row_ids)
+
+    for table in order:
+        if table.name not in upserts:
+            continue
+        columns = [name for name in upserts[table.name][0]["row"] if name in table.columns]
+        decoders = _decoders(table, columns)
+        params = [
+            {name: decoder(change["row"][name]) if decoder else change["row"][name] for name, decoder in zip(columns, decoders)}
+            for change in upserts[table.name]
+        ]
+        stmt = _upsert(conn, table)
+        if stmt is None:
+            conn.execute(delete(table).where(table.c.id.in_([change["id"] for change in upserts[table.name]])))
+            stmt = insert(table)
+        conn.execute(stmt, params)
+        counts[table.name] = counts.get(table.name, 0) + len(params)
+
+    versions = upserts.get("plan_versions", [])
+    if versions:
+        session = Session(bind=conn)
+        try:
+            plan_ids = sorted({change["row"]["plan_id"] for change in versions})
+            titles = dict(session.execute(select(Plan.id, Plan.title).where(Plan.id.in_(plan_ids))).all())
+            index_versions(session, [
+                (change["id"], titles.get(change["row"]["plan_id"]),
+                 reconstruct(session, change["row"]["plan_id"], change["row"]["version_number"]))
+                for change in versions
+            ])
+            for plan_id in plan_ids:
+                latest = latest_version_number(session, plan_id)
+                if latest:
+                    sync_sections(session, plan_id, reconstruct(session, plan_id, latest))
+            session.flush()
+        finally:
+            session.close()
+
+    new_logs = [change["row"] for change in upserts.get("logs", []) if change["op"] == "insert"]
+    record_rollups(conn, [
+        {"user_id": row["user_id"], "action": row["action"], "timestamp": datetime.fromisoformat(row["timestamp"])}
+        for row in new_logs if row["timestamp"]
+    ])
+    return counts
+
+def replica_cursor(conn, source, since=None):
+    """Return the last change from source applied to conn's database.
+
+    A replica without a cursor for source starts at since, or at 0 (the whole
+    feed). Its own change ids say nothing about the source's, so a replica
+    cloned from source (e.g. restored from a backup) must be given since.
+    """
+    cursor = conn.execute(select(SyncCursor.last_change_id).where(SyncCursor.source == source)).scalar()
+    return (since or 0) if cursor is None else cursor
+
+def _set_replica_cursor(conn, source, cursor):
+    updated = conn.execute(
+        SyncCursor.__table__.update().where(SyncCursor.source == source).values(last_change_id=cursor)
+    ).rowcount
+    if not updated:
+        conn.execute(insert(SyncCursor), {"source": source, "last_change_id": cursor})
+
+def apply_changes(target_engine, source, batches, since=None):
+    """Apply change batches to target, each in one transaction with the replica cursor.
+
+    Batches and changes at or before the replica's cursor for source (since,
+    if it has none yet) are skipped, so replaying a file or an overlapping
+    range is harmless. Returns (cursor, {table: rows}).
+    """
+    from db.database_setup import ensure_schema
+    ensure_schema(target_engine)
+    with target_engine.connect() as conn:
+        cursor = replica_cursor(conn, source, since)
+
+    counts = {}
+    for batch_cursor, changes in batches:
+        if batch_cursor <= cursor:
+            continue
+        with target_engine.begin() as conn:
+            for table, count in apply_batch(conn, [change for change in changes if change["seq"] > cursor]).items():
+                counts[table] = counts.get(table, 0) + count
+            _set_replica_cursor(conn, source, batch_cursor)
+        cursor = batch_cursor
+    return cursor, counts
+
+def source_name(engine):
+    """Identify a source database in replica cursors (its URL without the password)."""
+    return engine.url.render_as_string(hide_password=True)
+
+def sync_replica(target_engine, source_engine=None, batch_size=None, since=None):
+    """Apply every change from source (the app database by default) that target has not seen yet.
+
+    since is where a target without a cursor for source starts (default: the whole feed).
+    """
+    from db.database_setup import ensure_schema, get_engine
+    source_engine = source_engine or get_engine()
+    source = source_name(source_engine)
+    ensure_schema(target_engine)
+    with target_engine.connect() as conn:
+        since = replica_cursor(conn, source, since)
+    with source_engine.connect() as conn:
+        return apply_changes(target_engine, source, iter_changes(conn, since, batch_size), since)
@@ -0,0 +1,287 @@
+"""Compliance control catalogs and plan coverage checking.
+
+Each framework has a JSON catalog in ``CONTROL_CATALOG_DIR`` (default
+``templates/controls``) listing controls with the keywords and section
+headings that count as evidence for them. A catalog may ``extend`` another,
+adding controls or evidence to the parent's. ``load_index`` compiles a catalog
+once per process into a ControlIndex: a single alternation regex over every
+keyword plus a heading lookup table, so scanning a plan is one pass over its
+text whatever the number of controls.
+
+Scan results depend only on the content and the catalog, so they are stored
+in ``control_coverage`` keyed by the version's content hash, the framework and
+a fingerprint of the catalog. ``coverage_matrix`` streams the latest version of
+every plan, looks up a batch of hashes at a time and only loads (from the
+section rows) and scans content it has not seen; editing a catalog changes its fingerprint and
+rescans everything against it.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from itertools import groupby, islice
+from operator import itemgetter
+
+from sqlalchemy import delete, insert, select
+
+from db.models import ControlCoverage, PlanSection
+from db.versioning import content_hash
+
+CONTROL_CATALOG_DIR = os.getenv("CONTROL_CATALOG_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "controls")
+
+# Bump when matching rules change so cached results from the old matcher are not reused
+MATCHER_VERSION = 1
+
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.+?)\s*$", re.MULTILINE)
+
+
+def _normalize(phrase):
+    """Lower-case a keyword or heading and collapse its whitespace (and any "1." numbering)."""
+    return re.sub(r"^\d+[.)]\s*", "", " ".join(phrase.split())).lower()
+
+
+def _trie_pattern(phrases):
+    """Build a regex matching any of the (normalized) phrases, longest first, as a prefix trie."""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [(r"\s+" if char == " " else re.escape(char)) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+# Catalogs
+def catalog_frameworks(catalog_dir=None):
+    """Return the frameworks with a catalog file, sorted by name."""
+    catalog_dir = catalog_dir or CONTROL_CATALOG_DIR
+    if not os.path.isdir(catalog_dir):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(catalog_dir) if name.endswith(".json"))
+
+def load_catalog(framework, catalog_dir=None):
+    """Load a framework's catalog, merged with the catalogs it extends.
+
+    Controls are returned in catalog order, parent controls first. A child
+    entry with an existing control ID adds its keywords and headings to the
+    parent's and may override the title and plan types.
+    """
+    catalog_dir = catalog_dir or CONTROL_CATALOG_DIR
+    path = os.path.join(catalog_dir, f"{framework.lower()}.json")
+    if not os.path.exists(path):
+        available = ", ".join(catalog_frameworks(catalog_dir)) or "none"
+        raise ValueError(f"No control catalog for framework '{framework}' (available: {available}).")
+    with open(path, encoding="utf-8") as file:
+        catalog = json.load(file)
+
+    controls = {}
+    if catalog.get("extends"):
+        controls = {control["id"]: control for control in load_catalog(catalog["extends"], catalog_dir)["controls"]}
+    for entry in catalog.get("controls", []):
+        control = controls.get(entry["id"], {"id": entry["id"], "title": entry["id"], "plan_types": [], "keywords": [], "headings": []})
+        controls[entry["id"]] = {
+            "id": entry["id"],
+            "title": entry.get("title", control["title"]),
+            "plan_types": entry.get("plan_types", control["plan_types"]),
+            "keywords": control["keywords"] + [k for k in entry.get("keywords", []) if k not in control["keywords"]],
+            "headings": control["headings"] + [h for h in entry.get("headings", []) if h not in control["headings"]],
+        }
+    return {"framework": framework.lower(), "name": catalog.get("name", framework), "controls": list(controls.values())}
+
+
+class ControlIndex:
+    """A catalog compiled for single-pass scanning of plan content."""
+
+    def __init__(self, catalog):
+        self.framework = catalog["framework"]
+        self.name = catalog["name"]
+        self.controls = catalog["controls"]
+        fingerprint = json.dumps([MATCHER_VERSION, self.controls], sort_keys=True)
+        self.catalog_hash = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+        self.keywords = {}
+        self.headings = {}
+        for control in self.controls:
+            for keyword in control["keywords"]:
+                self.keywords.setdefault(_normalize(keyword), []).append(control["id"])
+            for heading in control["headings"]:
+                self.headings.setdefault(_normalize(heading), []).append(control["id"])
+        # One trie-shaped alternation (shared prefixes matched once) over the lower-cased text
+        self.pattern = re.compile(rf"(?<!\w){_trie_pattern(self.keywords)}(?!\w)") if self.keywords else None
+
+    def applicable(self, plan_type):
+        """Return the IDs of the controls that apply to a plan type."""
+        return [control["id"] for control in self.controls if not control["plan_types"] or plan_type in control["plan_types"]]
+
+    def scan(self, content):
+        """Return {control_id: evidence count} for every control matched in content."""
+        hits = {}
+        if self.pattern:
+            for match in self.pattern.finditer(content.lower()):
+                keyword = match.group(0)
+                for control_id in self.keywords.get(keyword) or self.keywords[" ".join(keyword.split())]:
+                    hits[control_id] = hits.get(control_id, 0) + 1
+        for match in HEADING_PATTERN.finditer(content):
+            for control_id in self.headings.get(_normalize(match.group(1)), ()):
+                hits[control_id] = hits.get(control_id, 0) + 1
+        return hits
+
+@lru_cache(maxsize=None)
+def load_index(framework, catalog_dir=None):
+    """Compile a framework's catalog (cached per process)."""
+    return ControlIndex(load_catalog(framework, catalog_dir))
+
+
+# Session-level API
+def _latest_contents(session, versions):
+    """Return {plan_id: content} for latest versions, composed from their section rows in one query.
+
+    Plans whose sections are missing or do not hash to the version's content
+    hash fall back to reconstructing the version.
+    """
+    from db.content_cache import plan_content
+    contents = {}
+    if not versions:
+        return contents
+    rows = session.execute(
+        select(PlanSection.plan_id, PlanSection.content)
+        .where(PlanSection.plan_id.in_({version.plan_id for version in versions}))
+        .order_by(PlanSection.plan_id, PlanSection.position)
+    )
+    for plan_id, sections in groupby(rows, key=itemgetter(0)):
+        contents[plan_id] = "".join(content for _, content in sections)
+    for version in versions:
+        if contents.get(version.plan_id) is None or content_hash(contents[version.plan_id]) != version.content_hash:
+            contents[version.plan_id] = plan_content(session, version.plan_id, version.version_number, version.content_hash).content
+    return contents
+
+def cached_hits(session, index, content_hashes):
+    """Return {content_hash: hits} for the hashes already scanned with this catalog."""
+    rows = session.execute(
+        select(ControlCoverage.content_hash, ControlCoverage.hits).where(
+            ControlCoverage.framework == index.framework,
+            ControlCoverage.catalog_hash == index.catalog_hash,
+            ControlCoverage.content_hash.in_(content_hashes),
+        )
+    )
+    return {content_hash: json.loads(hits) for content_hash, hits in rows}
+
+def clear_coverage(session, framework=None, stale_only=False):
+    """Delete cached scan results (for one framework, or only those from older catalogs)."""
+    stmt = delete(ControlCoverage)
+    if framework:
+        stmt = stmt.where(ControlCoverage.framework == framework)
+        if stale_only:
+            stmt = stmt.where(ControlCoverage.catalog_hash != load_index(framework).catalog_hash)
+    return session.execute(stmt).rowcount
+
+def coverage_matrix(session, versions, framework=None, force=False, batch_size=500):
+    """Check the given latest versions against their frameworks' controls (the caller commits).
+
+    versions yields rows with plan_id, title, plan_type, framework,
+    version_number and content_hash (see query.latest_plan_versions). With
+    framework set every plan is checked against that catalog instead of its
+    own. Plans without a framework, or with one that has no catalog, are
+    skipped. force drops the cached results of each framework used first, so
+    every plan is rescanned.
+
+    Returns a dict with the controls of each framework used, one entry per
+    plan (hits per control, applicable and missing control IDs) and counts of
+    scanned, cached and skipped plans.
+    """
+    report = {"controls": {}, "plans": [], "scanned": 0, "cached": 0, "skipped": []}
+    indexes = {}
+    versions = iter(versions)
+    while batch := list(islice(versions, batch_size)):
+        by_framework = {}
+        for version in batch:
+            name = (framework or version.framework or "").lower()
+            if name and name not in indexes:
+                try:
+                    indexes[name] = load_index(name)
+                except ValueError as e:
+                    logging.warning(str(e))
+                    indexes[name] = None
+                if indexes[name]:
+                    clear_coverage(session, name, stale_only=not force)
+                    report["controls"][name] = indexes[name].controls
+            if not name or indexes[name] is None:
+                report["skipped"].append(version.plan_id)
+                continue
+            by_framework.setdefault(name, []).append(version)
+
+        known = {name: cached_hits(session, indexes[name], {version.content_hash for version in group})
+                 for name, group in by_framework.items()}
+        contents = _latest_contents(session, [
+            version for name, group in by_framework.items() for version in group if version.content_hash not in known[name]
+        ])
+        for name, group in by_framework.items():
+            index = indexes[name]
+            new_rows = []
+            for version in group:
+                hits = known[name].get(version.content_hash)
+                if hits is None:
+                    hits = known[name][version.content_hash] = index.scan(contents[version.plan_id])
+                    new_rows.append({"content_hash": version.content_hash, "framework": name,
+                                     "catalog_hash": index.catalog_hash, "hits": json.dumps(hits)})
+                    report["scanned"] += 1
+                else:
+                    report["cached"] += 1
+                applicable = index.applicable(version.plan_type)
+                report["plans"].append({
+                    "plan_id": version.plan_id,
+                    "title": version.title,
+                    "plan_type": version.plan_type,
+                    "framework": name,
+                    "version_number": version.version_number,
+                    "content_hash": version.content_hash,
+                    "hits": {control_id: hits[control_id] for control_id in applicable if control_id in hits},
+                    "applicable": applicable,
+                    "missing": [control_id for control_id in applicable if control_id not in hits],
+                })
+            if new_rows:
+                session.execute(insert(ControlCoverage), new_rows)
+    report["plans"].sort(key=lambda plan: plan["plan_id"])
+    return report
+
+def write_matrix(report, path):
+    """Write a coverage report as a plan x control CSV matrix, or as JSON for a .json path.
+
+    CSV cells hold the evidence count for each applicable control (0 when
+    missing) and are empty for controls that do not apply to the plan. With
+    several frameworks the control columns are named "framework:ID".
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        return path
+
+    prefix = len(report["controls"]) > 1
+    columns = [(name, control["id"]) for name, controls in report["controls"].items() for control in controls]
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["plan_id", "title", "plan_type", "framework", "version", "covered", "applicable"]
+                        + [f"{name}:{control_id}" if prefix else control_id for name, control_id in columns])
+        for plan in report["plans"]:
+            applicable = set(plan["applicable"])
+            cells = [
+                plan["hits"].get(control_id, 0) if name == plan["framework"] and control_id in applicable else ""
+                for name, control_id in columns
+            ]
+            writer.writerow([plan["plan_id"], plan["title"], plan["plan_type"], plan["framework"], plan["version_number"],
+                             len(plan["hits"]), len(plan["applicable"])] + cells)
+    return path
@@ -0,0 +1,262 @@
+"""Read-through LRU cache of plan version content and its rendered HTML.
+
+Reconstructing a version replays its delta chain and rendering it runs the
+markdown converter, yet a plan's versions never change once written. Entries
+are keyed by ``(plan_id, version_number)`` and remember the version's content
+hash, which every lookup checks, so an entry can never be served for a
+different version that reused the key (plan IDs are reused after deletes).
+
+"Latest version" lookups always ask the database which version is current
+(one indexed query for its number and content hash) and serve the content from
+the cache, so versions written by other processes are seen at once, even by a
+long-lived ``shell`` or API server. Session listeners drop every entry of a
+deleted plan to free the memory early.
+
+The cache is bounded by ``CONTENT_CACHE_SIZE`` entries and
+``CONTENT_CACHE_MAX_BYTES`` of text and evicts the least recently used entry.
+With ``CONTENT_CACHE_PATH`` set it is loaded from and saved to that file
+(gzipped JSON) so it survives between CLI runs.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from db.models import Plan, PlanVersion
+from db.versioning import reconstruct
+
+CONTENT_CACHE_SIZE = int(os.getenv("CONTENT_CACHE_SIZE", "256"))
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CONTENT_CACHE_PATH = os.getenv("CONTENT_CACHE_PATH") or None
+
+# Bump when the on-disk layout changes; older files are ignored
+CACHE_FILE_VERSION = 1
+
+
+class CacheEntry:
+    """Content (and, once rendered, HTML) of one plan version."""
+
+    __slots__ = ("plan_id", "version_number", "content_hash", "content", "html")
+
+    def __init__(self, plan_id, version_number, content_hash, content, html=None):
+        self.plan_id = plan_id
+        self.version_number = version_number
+        self.content_hash = content_hash
+        self.content = content
+        self.html = html
+
+    @property
+    def size(self):
+        return len(self.content) + len(self.html or "")
+
+
+class ContentCache:
+    """Size-bounded LRU map of (plan_id, version_number) to CacheEntry, with hit/miss counters."""
+
+    def __init__(self, max_entries=CONTENT_CACHE_SIZE, max_bytes=CONTENT_CACHE_MAX_BYTES, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.html_hits = 0
+        self.html_misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Lookups
+    def get(self, plan_id, version_number, content_hash):
+        """Return the entry for a version if it is cached with this content hash, counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get((plan_id, version_number))
+            if entry is not None and entry.content_hash != content_hash:
+                self._discard((plan_id, version_number))
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((plan_id, version_number))
+            self.hits += 1
+            return entry
+
+    def put(self, plan_id, version_number, content_hash, content, html=None):
+        """Cache a version's content and return its entry."""
+        entry = CacheEntry(plan_id, version_number, content_hash, content, html)
+        with self._lock:
+            self._discard((plan_id, version_number))
+            self._entries[(plan_id, version_number)] = entry
+            self._bytes += entry.size
+            self._dirty = True
+            self._evict()
+        return entry
+
+    def set_html(self, entry, html):
+        """Attach rendered HTML to a cached entry."""
+        with self._lock:
+            if self._entries.get((entry.plan_id, entry.version_number)) is entry:
+                self._bytes += len(html) - len(entry.html or "")
+                self._dirty = True
+            entry.html = html
+            self._evict()
+
+    # Invalidation
+    def invalidate(self, plan_id):
+        """Drop every cached version of a plan."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == plan_id]:
+                self._discard(key)
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry (the counters are kept)."""
+        with self._lock:
+            self._dirty = self._dirty or bool(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._dirty = True
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def stats(self):
+        """Return entry count, cached bytes and the hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "html_hits": self.html_hits,
+                "html_misses": self.html_misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # Persistence
+    def load(self):
+        """Load entries saved by a previous run from self.path; return how many were loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as file:
+                document = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable content cache {self.path}: {e}")
+            return 0
+        if document.get("format") != CACHE_FILE_VERSION:
+            return 0
+        with self._lock:
+            for plan_id, version_number, content_hash, content, html in document["entries"]:
+                self.put(plan_id, version_number, content_hash, content, html)
+            self._dirty = False
+            return len(self._entries)
+
+    def save(self):
+        """Atomically write the entries (least recently used first) to self.path if they changed."""
+        if not self.path or not self._dirty:
+            return False
+        with self._lock:
+            entries = [
+                [entry.plan_id, entry.version_number, entry.content_hash, entry.content, entry.html]
+                for entry in self._entries.values()
+            ]
+            self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=5) as file:
+            json.dump({"format": CACHE_FILE_VERSION, "entries": entries}, file)
+        os.replace(temp_path, self.path)
+        return True
+
+
+_cache = None
+
+def get_cache():
+    """Return the process-wide cache, loading CONTENT_CACHE_PATH on first use."""
+    global _cache
+    if _cache is None:
+        _cache = ContentCache(path=CONTENT_CACHE_PATH)
+        if _cache.path:
+            _cache.load()
+            atexit.register(_cache.save)
+    return _cache
+
+
+# Read-through access
+def plan_content(session, plan_id, version_number=None, content_hash=None, html=False):
+    """Return the CacheEntry of a plan version (latest by default), or None if it does not exist.
+
+    The content is reconstructed only on a miss; with html=True the rendered
+    HTML is filled in too, rendering only if it is not cached yet. Callers that
+    already know the version's content_hash can pass it to skip the lookup query.
+    """
+    cache = get_cache()
+    if content_hash is None or version_number is None:
+        stmt = select(PlanVersion.version_number, PlanVersion.content_hash).where(PlanVersion.plan_id == plan_id)
+        if version_number is None:
+            stmt = stmt.order_by(PlanVersion.version_number.desc()).limit(1)
+        else:
+            stmt = stmt.where(PlanVersion.version_number == version_number)
+        row = session.execute(stmt).first()
+        if row is None:
+            return None
+        version_number, content_hash = row
+
+    entry = cache.get(plan_id, version_number, content_hash)
+    if entry is None:
+        content = reconstruct(session, plan_id, version_number)
+        if content is None:
+            return None
+        entry = cache.put(plan_id, version_number, content_hash, content)
+
+    if html:
+        if entry.html is None:
+            from scripts.export import markdown_to_html
+            cache.html_misses += 1
+            cache.set_html(entry, markdown_to_html(entry.content))
+        else:
+            cache.html_hits += 1
+    return entry
+
+
+# Invalidation through session events
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed(session, flush_context):
+    """Drop the cached versions of deleted plans."""
+    if _cache is None:
+        return
+    for obj in session.deleted:
+        if isinstance(obj, Plan):
+            _cache.invalidate(obj.id)
+        elif isinstance(obj, PlanVersion):
+            _cache.invalidate(obj.plan_id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk(orm_execute_state):
+    """Bulk DELETE statements on plans or versions bypass the flush, so drop every entry."""
+    if _cache is None or not orm_execute_state.is_delete:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Plan, PlanVersion):
+        _cache.clear()
@@ -1,23 +1,346 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+from contextlib import contextmanager
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, event, func, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.orm import sessionmaker, scoped_session
 from db.models import Base
 
+# Load settings from .env when python-dotenv is available
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+DEFAULT_SQLITE_PATH = "dr_ir_generation.db"
+
+def get_database_url():
+    """Build the database URL from DATABASE_URL or the DB_* settings."""
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+
+    driver = os.getenv("DB_DRIVER") or ("postgresql" if os.getenv("DB_HOST") else "sqlite")
+    if driver.startswith("sqlite"):
+        return f"sqlite:///{os.getenv('DB_NAME') or DEFAULT_SQLITE_PATH}"
+
+    port = os.getenv("DB_PORT")
+    return URL.create(
+        driver,
+        username=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(port) if port else None,
+        database=os.getenv("DB_NAME"),
+    ).render_as_string(hide_password=False)
+
 # Define the database URL
-DATABASE_URL = "sqlite:///dr_ir_generation.db"  # Update to your database URL (PostgreSQL, SQLite, etc.)
+DATABASE_URL = get_database_url()
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent readers and writers."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))}")
+    cursor.execute(f"PRAGMA journal_mode={os.getenv('SQLITE_JOURNAL_MODE', 'WAL')}")
+    cursor.execute(f"PRAGMA synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+    cursor.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}")
+    cursor.close()
+
+def create_db_engine(url=None, **overrides):
+    """Create an engine with pool sizing from DB_POOL_* settings and SQLite tuning."""
+    url = make_url(url or DATABASE_URL)
+    options = {"echo": os.getenv("DB_ECHO", "").lower() in ("1", "true", "yes")}
+
+    if url.get_backend_name() == "sqlite":
+        # Connections are shared between threads through the pool and scoped sessions
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            return create_engine(url, **{**options, **overrides})
+    else:
+        options["pool_pre_ping"] = True
+
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+    options.update(overrides)
+    engine = create_engine(url, **options)
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+# Async drivers used by the HTTP API (see api/) for each synchronous backend
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def create_async_db_engine(url=None, **overrides):
+    """Create an AsyncEngine for the same database, with the same pool sizing and SQLite tuning."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    url = make_url(url or DATABASE_URL)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS and not url.get_dialect().is_async:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    options = {"echo": os.getenv("DB_ECHO", "").lower() in ("1", "true", "yes")}
+
+    if backend == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return create_async_engine(url, **{**options, **overrides})
+        options["poolclass"] = AsyncAdaptedQueuePool
+    else:
+        options["pool_pre_ping"] = True
+
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+    options.update(overrides)
+    engine = create_async_engine(url, **options)
+    if backend == "sqlite":
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+# Bump whenever tables or indexes are added so existing databases pick them up
+SCHEMA_VERSION = 11
+
+# One-row record of the schema version, kept out of Base so dumps and the change feed skip it
+schema_info = Table(
+    "schema_info", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+_engine = None
+
+def ensure_schema(engine, force=False):
+    """Create missing tables unless the database already reports SCHEMA_VERSION.
+
+    The version lives in the one-row schema_info table on every backend, so
+    the common case costs a single primary-key read.
+    """
+    with engine.connect() as conn:
+        ensure_schema_on(conn, force)
+        conn.commit()
 
-# Create an engine to connect to the database
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})  # For SQLite
+def ensure_schema_on(conn, force=False):
+    """ensure_schema for an open connection (the caller commits); usable from AsyncConnection.run_sync."""
+    if not force and stored_schema_version(conn) == SCHEMA_VERSION:
+        return
+    Base.metadata.create_all(bind=conn)
+    _upgrade_schema(conn)
+    schema_info.create(bind=conn, checkfirst=True)
+    if not conn.execute(update(schema_info).where(schema_info.c.id == 1).values(version=SCHEMA_VERSION)).rowcount:
+        conn.execute(schema_info.insert().values(id=1, version=SCHEMA_VERSION))
+    if conn.dialect.name == "sqlite":
+        # Snapshots report it from the file header (see db/backup.py)
+        conn.exec_driver_sql(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+def stored_schema_version(conn):
+    """Return the schema version recorded in the database, or None if it has none yet."""
+    stmt = select(schema_info.c.version).where(schema_info.c.id == 1)
+    try:
+        if conn.dialect.name == "sqlite":
+            return conn.execute(stmt).scalar()
+        # A savepoint keeps a missing table from aborting the caller's transaction (e.g. PostgreSQL)
+        with conn.begin_nested():
+            return conn.execute(stmt).scalar()
+    except DBAPIError:
+        return None
+
+def _upgrade_schema(conn):
+    """Bring tables created by older versions up to date (create_all only adds missing tables)."""
+    import logging
+    from sqlalchemy import inspect
+    from db.models import LogSegment, PlanVersion
+    inspector = inspect(conn)
+    plan_columns = {column["name"] for column in inspector.get_columns("plans")}
+    if "lock_version" not in plan_columns:
+        conn.exec_driver_sql("ALTER TABLE plans ADD COLUMN lock_version INTEGER NOT NULL DEFAULT 1")
+    if "framework" not in plan_columns:
+        conn.exec_driver_sql("ALTER TABLE plans ADD COLUMN framework VARCHAR(20)")
+
+    # Plan versions stored plain markdown in a content column before delta storage
+    version_columns = {column["name"] for column in inspector.get_columns("plan_versions")}
+    if "content" in version_columns:
+        _convert_plain_versions(conn, version_columns)
+
+    # Logs became AUTOINCREMENT in schema version 10 so archived ids are never reused
+    if conn.dialect.name == "sqlite":
+        logs_sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'logs'").scalar()
+        if "AUTOINCREMENT" not in logs_sql.upper():
+            _rebuild_logs_table(conn)
+
+    # Segment paths were stored relative to the working directory before schema version 10
+    for segment_id, path in conn.execute(select(LogSegment.id, LogSegment.path)).all():
+        if os.path.isabs(path):
+            continue
+        if os.path.exists(path):
+            conn.execute(LogSegment.__table__.update().where(LogSegment.id == segment_id).values(path=os.path.abspath(path)))
+        else:
+            logging.warning(f"Log segment '{path}' not found from {os.getcwd()}; set its log_segments.path to an absolute path.")
+
+    # Version numbers became unique per plan in schema version 5
+    index = next(index for index in PlanVersion.__table__.indexes if index.name == "ix_plan_versions_plan_id_version_number")
+    existing = {item["name"]: item for item in inspector.get_indexes("plan_versions")}.get(index.name)
+    if existing is None or not existing["unique"]:
+        duplicate = conn.execute(
+            select(PlanVersion.plan_id, PlanVersion.version_number)
+            .group_by(PlanVersion.plan_id, PlanVersion.version_number)
+            .having(func.count() > 1)
+            .limit(1)
+        ).first()
+        if duplicate:
+            logging.error(f"Plan {duplicate.plan_id} has duplicate version {duplicate.version_number}; "
+                          f"version numbers stay non-unique until the duplicates are removed.")
+        else:
+            if existing is not None:
+                conn.exec_driver_sql(f"DROP INDEX {index.name}")
+            index.create(conn)
+
+    # Indexes added to tables that already existed (create_all only indexes the tables it creates)
+    for table in Base.metadata.sorted_tables:
+        for table_index in table.indexes:
+            if table_index is not index:
+                table_index.create(conn, checkfirst=True)
+
+def _rebuild_logs_table(conn):
+    """Recreate the SQLite logs table with AUTOINCREMENT, starting above every id already handed out."""
+    from sqlalchemy import MetaData, text
+    from db.models import Change, Log, LogSegment, User
+    for name in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'logs' AND sql IS NOT NULL"
+    ).scalars().all():
+        conn.exec_driver_sql(f"DROP INDEX {name}")
+    metadata = MetaData()
+    User.__table__.to_metadata(metadata)
+    Log.__table__.to_metadata(metadata, name="logs_rebuilt").create(conn)
+    conn.exec_driver_sql("INSERT INTO logs_rebuilt (id, user_id, action, timestamp) SELECT id, user_id, action, timestamp FROM logs")
+    conn.exec_driver_sql("DROP TABLE logs")
+    conn.exec_driver_sql("ALTER TABLE logs_rebuilt RENAME TO logs")
+
+    highest = max(
+        conn.execute(select(func.max(Log.id))).scalar() or 0,
+        conn.execute(select(func.max(LogSegment.last_log_id))).scalar() or 0,
+        conn.execute(select(func.max(Change.row_id)).where(Change.table_name == "logs")).scalar() or 0,
+    )
+    conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'logs'")
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('logs', :seq)"), {"seq": highest})
+
+def _convert_plain_versions(conn, columns, batch_size=500):
+    """Re-encode every row of a plain-content plan_versions table as a keyframe and drop the old column."""
+    import logging
+    from sqlalchemy import LargeBinary, text
+    from db.search import rebuild_index
+    from db.versioning import encode_version
+    added = {
+        "storage": "VARCHAR(8) NOT NULL DEFAULT 'full'",
+        "codec": "VARCHAR(8) NOT NULL DEFAULT 'raw'",
+        "payload": LargeBinary().compile(dialect=conn.dialect),
+        "content_hash": "VARCHAR(64)",
+        "content_length": "INTEGER",
+    }
+    for name, ddl in added.items():
+        if name not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE plan_versions ADD COLUMN {name} {ddl}")
+
+    select_batch = text("SELECT id, version_number, content FROM plan_versions WHERE payload IS NULL ORDER BY id LIMIT :limit")
+    update = text(
+        "UPDATE plan_versions SET storage = :storage, codec = :codec, payload = :payload, "
+        "content_hash = :content_hash, content_length = :content_length WHERE id = :id"
+    )
+    converted = 0
+    while rows := conn.execute(select_batch, {"limit": batch_size}).all():
+        params = []
+        for row in rows:
+            encoded = encode_version(row.version_number, row.content or "")
+            del encoded["version_number"]
+            params.append({"id": row.id, **encoded})
+        conn.execute(update, params)
+        converted += len(rows)
+    conn.exec_driver_sql("ALTER TABLE plan_versions DROP COLUMN content")
+    rebuild_index(conn)
+    logging.info(f"Converted {converted} plan versions to keyframe storage.")
+
+def get_engine():
+    """Return the shared engine, creating it (and checking the schema) on first use."""
+    global _engine
+    if _engine is None:
+        _engine = create_db_engine()
+        ensure_schema(_engine)
+    return _engine
+
+def __getattr__(name):
+    """Resolve the module-level ``engine`` lazily."""
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazySessionmaker(sessionmaker):
+    """sessionmaker that binds to the shared engine the first time a session is made."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
 
 # Create a sessionmaker instance to handle database transactions
-Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionFactory = LazySessionmaker(autocommit=False, autoflush=False)
+
+# Thread-local sessions: every thread gets its own session from the shared pool
+Session = scoped_session(SessionFactory)
+
+# Session proxy for use in query.py (resolves to the calling thread's session)
+session = Session
+
+@contextmanager
+def session_scope():
+    """Provide a dedicated session as a unit of work: commit on success, roll back on error."""
+    unit = SessionFactory()
+    try:
+        yield unit
+        unit.commit()
+    except Exception:
+        unit.rollback()
+        raise
+    finally:
+        unit.close()
 
-# Create the tables in the database
-Base.metadata.create_all(bind=engine)
+@contextmanager
+def single_transaction():
+    """Run everything done through the shared session inside one database transaction.
 
-# Create a session instance for use in query.py
-session = Session()
+    The session (and session_scope) is bound to one connection holding an outer
+    transaction and joins it with savepoints, so each command's session.commit()
+    only releases a savepoint and a rollback undoes just that command. The outer
+    transaction commits when the block exits and rolls back if it raises. Work
+    done on other connections (e.g. ``get_engine().begin()``) is not included.
+    """
+    Session.remove()
+    previous = dict(SessionFactory.kw)
+    connection = get_engine().connect()
+    transaction = connection.begin()
+    if connection.dialect.name == "sqlite":
+        # pysqlite defers BEGIN, and a SAVEPOINT outside a transaction would commit on release
+        connection.exec_driver_sql("BEGIN")
+    SessionFactory.configure(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield connection
+        Session.remove()
+        transaction.commit()
+    except BaseException:
+        Session.remove()
+        transaction.rollback()
+        raise
+    finally:
+        SessionFactory.kw = previous
+        connection.close()
 
 def init_db():
     """Initialize the database (called once during app initialization)."""
-    Base.metadata.create_all(bind=engine)
+    ensure_schema(get_engine(), force=True)
     print("Database initialized successfully.")
@@ -0,0 +1,202 @@
+"""Streaming NDJSON dump and restore of the whole database.
+
+A dump is a header line followed, for every table in foreign-key order, by one
+``{"table": ..., "columns": [...]}`` line and then chunks of rows, one JSON
+line per chunk. Rows are read with server-side streaming and written chunk by
+chunk, and restores insert each chunk with a single executemany, so memory
+stays flat regardless of database size. Files ending in ``.gz`` or ``.br`` are
+gzip- or Brotli-compressed on the fly.
+"""
+import base64
+import gzip
+import io
+import json
+import logging
+import time
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, LargeBinary, delete, func, insert, select
+
+from db.models import Base
+from db.search import rebuild_index
+
+DUMP_FORMAT = "dr_ir_generation-dump"
+DUMP_VERSION = 1
+DEFAULT_CHUNK_SIZE = 1000
+
+
+# Compressed streams
+class _BrotliWriter(io.RawIOBase):
+    """Write-only binary stream that Brotli-compresses into another file."""
+
+    def __init__(self, path, quality=5):
+        import brotli
+        self._file = open(path, "wb")
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._file.write(self._compressor.process(bytes(data)))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._file.write(self._compressor.finish())
+            self._file.close()
+        super().close()
+
+def _brotli_lines(path, chunk_size=1 << 20):
+    """Yield decoded text lines from a Brotli-compressed file, one chunk at a time."""
+    import brotli
+    decompressor = brotli.Decompressor()
+    pending = b""
+    with open(path, "rb") as file:
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            pending += decompressor.process(data)
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8")
+    if pending:
+        yield pending.decode("utf-8")
+
+def _open_writer(path):
+    """Open a text writer, compressing according to the file extension."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    if path.endswith(".br"):
+        return io.TextIOWrapper(io.BufferedWriter(_BrotliWriter(path)), encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+def _read_lines(path):
+    """Iterate the lines of a dump, decompressing according to the file extension."""
+    if path.endswith(".br"):
+        yield from _brotli_lines(path)
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield line.rstrip("\n")
+
+
+# Value encoding
+def _encoders(table):
+    """Return per-column functions turning database values into JSON values."""
+    def encode(column):
+        if isinstance(column.type, (Date, DateTime)):
+            return lambda value: value.isoformat() if value is not None else None
+        if isinstance(column.type, LargeBinary):
+            return lambda value: base64.b64encode(value).decode("ascii") if value is not None else None
+        return None
+    return [encode(column) for column in table.columns]
+
+def _decoders(table, columns):
+    """Return per-column functions turning JSON values back into database values."""
+    def decode(column):
+        if isinstance(column.type, DateTime):
+            return lambda value: datetime.fromisoformat(value) if value is not None else None
+        if isinstance(column.type, Date):
+            return lambda value: date.fromisoformat(value) if value is not None else None
+        if isinstance(column.type, LargeBinary):
+            return lambda value: base64.b64decode(value) if value is not None else None
+        return None
+    return [decode(table.columns[name]) for name in columns]
+
+
+# Dump and restore
+def dump_database(path, engine=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream every table to an NDJSON dump file and return {table: row_count}."""
+    from db.database_setup import SCHEMA_VERSION, get_engine
+    engine = engine or get_engine()
+    counts = {}
+    start = time.perf_counter()
+
+    with engine.connect() as conn, _open_writer(path) as out:
+        out.write(json.dumps({"format": DUMP_FORMAT, "version": DUMP_VERSION, "schema_version": SCHEMA_VERSION}) + "\n")
+        for table in Base.metadata.sorted_tables:
+            columns = [column.name for column in table.columns]
+            encoders = _encoders(table)
+            out.write(json.dumps({"table": table.name, "columns": columns}) + "\n")
+
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                select(table).order_by(*table.primary_key.columns)
+            )
+            counts[table.name] = 0
+            for partition in result.partitions():
+                rows = [
+                    [encoder(value) if encoder else value for encoder, value in zip(encoders, row)]
+                    for row in partition
+                ]
+                out.write(json.dumps({"rows": rows}, separators=(",", ":")) + "\n")
+                counts[table.name] += len(rows)
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    logging.info(f"Dumped {total} rows to {path} in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/sec).")
+    return counts
+
+def restore_database(path, engine=None, replace=False):
+    """Load an NDJSON dump in one transaction and return {table: row_count}.
+
+    The target tables must be empty unless replace is True, in which case their
+    existing rows are deleted first.
+    """
+    from db.database_setup import SCHEMA_VERSION, ensure_schema, get_engine
+    engine = engine or get_engine()
+    ensure_schema(engine)
+    tables = Base.metadata.tables
+    counts = {}
+    start = time.perf_counter()
+
+    lines = _read_lines(path)
+    header = json.loads(next(lines, "{}"))
+    if header.get("format") != DUMP_FORMAT:
+        raise ValueError(f"{path} is not a {DUMP_FORMAT} file.")
+    if header.get("schema_version") != SCHEMA_VERSION:
+        raise ValueError(f"{path} was dumped at schema version {header.get('schema_version')}, "
+                         f"but this database is at version {SCHEMA_VERSION}.")
+
+    with engine.begin() as conn:
+        existing = {name: conn.execute(select(func.count()).select_from(table)).scalar() for name, table in tables.items()}
+        if any(existing.values()):
+            if not replace:
+                non_empty = ", ".join(name for name, count in existing.items() if count)
+                raise ValueError(f"Target database is not empty ({non_empty}). Use replace=True to overwrite it.")
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(delete(table))
+
+        table = columns = decoders = None
+        for line in lines:
+            if not line:
+                continue
+            record = json.loads(line)
+            if "table" in record:
+                if record["table"] not in tables:
+                    raise ValueError(f"Dump contains unknown table '{record['table']}'.")
+                table = tables[record["table"]]
+                columns = record["columns"]
+                unknown = [name for name in columns if name not in table.columns]
+                if unknown:
+                    raise ValueError(f"Dump contains unknown columns in '{table.name}': {', '.join(unknown)}.")
+                decoders = _decoders(table, columns)
+                counts[table.name] = 0
+                continue
+
+            params = [
+                {name: decoder(value) if decoder else value for name, decoder, value in zip(columns, decoders, row)}
+                for row in record["rows"]
+            ]
+            conn.execute(insert(table), params)
+            counts[table.name] += len(params)
+
+        # The full-text index is derived data, so it is rebuilt rather than dumped
+        rebuild_index(conn)
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    logging.info(f"Restored {total} rows from {path} in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/sec).")
+    return counts
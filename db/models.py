@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, ForeignKey, Text, LargeBinary, Index, DDL, event
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from datetime import datetime, UTC  # ✅ Import timezone-aware datetime
 
@@ -21,12 +21,21 @@ class Plan(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String(255), nullable=False)
     plan_type = Column(String(10), nullable=False)  # drp or irp
+    framework = Column(String(20))  # Control catalog the plan is checked against (nist, stig, fedramp, fisma)
     owner_id = Column(Integer, ForeignKey('users.id'))
     created_at = Column(DateTime, default=lambda: datetime.now(UTC))  # ✅ Fixed
     updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))  # ✅ Fixed
+    lock_version = Column(Integer, nullable=False, default=1, server_default="1")  # Optimistic lock, bumped on every change
     
     owner = relationship("User", back_populates="plans")
 
+    __table_args__ = (
+        Index("ix_plans_owner_id", "owner_id"),
+        Index("ix_plans_plan_type", "plan_type"),
+    )
+    # UPDATEs check the lock_version that was read and raise StaleDataError if another writer changed the plan
+    __mapper_args__ = {"version_id_col": lock_version}
+
 # User-to-Plan Relationship
 User.plans = relationship("Plan", order_by=Plan.id, back_populates="owner")
 
@@ -37,12 +46,70 @@ class PlanVersion(Base):
     id = Column(Integer, primary_key=True)
     plan_id = Column(Integer, ForeignKey('plans.id'))
     version_number = Column(Integer, nullable=False)
-    content = Column(Text, nullable=False)  # Markdown content
+    storage = Column(String(8), nullable=False, default="full")  # full (keyframe) or delta
+    codec = Column(String(8), nullable=False, default="raw")  # raw or br (Brotli)
+    payload = Column(LargeBinary, nullable=False)  # Encoded markdown content, see db/versioning.py
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of the reconstructed markdown
+    content_length = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(UTC))  # ✅ Fixed
     
     plan = relationship("Plan", back_populates="versions")
 
-Plan.versions = relationship("PlanVersion", order_by=PlanVersion.id, back_populates="plan")
+    __table_args__ = (
+        Index("ix_plan_versions_plan_id_version_number", "plan_id", "version_number", unique=True),
+    )
+
+Plan.versions = relationship("PlanVersion", order_by=PlanVersion.id, back_populates="plan", cascade="all, delete-orphan")
+
+# Plan Sections (latest content split by heading path, see db/sections.py)
+class PlanSection(Base):
+    __tablename__ = 'plan_sections'
+
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(Integer, ForeignKey('plans.id'), nullable=False)
+    position = Column(Integer, nullable=False)  # Order of the section in the composed document
+    path = Column(String(512), nullable=False)  # "" for the preamble, "Parent/Child" for ### headings
+    level = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)  # Heading line included
+    content_hash = Column(String(64), nullable=False)
+
+    plan = relationship("Plan", back_populates="sections")
+
+    __table_args__ = (
+        Index("ix_plan_sections_plan_id_path", "plan_id", "path", unique=True),
+    )
+
+Plan.sections = relationship("PlanSection", order_by=PlanSection.position, back_populates="plan", cascade="all, delete-orphan")
+
+# Control Coverage Cache (controls matched in one plan content hash, see db/compliance.py)
+class ControlCoverage(Base):
+    __tablename__ = 'control_coverage'
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False)  # plan_versions.content_hash that was scanned
+    framework = Column(String(20), nullable=False)
+    catalog_hash = Column(String(16), nullable=False)  # Fingerprint of the catalog (and matcher) used
+    hits = Column(Text, nullable=False)  # JSON mapping of control ID to match count
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        Index("ix_control_coverage_content_hash_framework", "content_hash", "framework", "catalog_hash", unique=True),
+    )
+
+# Plan Diff Cache (section diffs between two plan content hashes, see scripts/plan_diff.py)
+class PlanDiff(Base):
+    __tablename__ = 'plan_diffs'
+
+    id = Column(Integer, primary_key=True)
+    old_hash = Column(String(64), nullable=False)  # plan_versions.content_hash of the older side
+    new_hash = Column(String(64), nullable=False)
+    context = Column(Integer, nullable=False)  # Unchanged lines around each change
+    diffs = Column(Text, nullable=False)  # JSON list of [path, status, lines]
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        Index("ix_plan_diffs_hashes_context", "old_hash", "new_hash", "context", unique=True),
+    )
 
 # Logs Table (Audit Trail)
 class Log(Base):
@@ -55,4 +122,74 @@ class Log(Base):
     
     user = relationship("User", back_populates="logs")
 
+    __table_args__ = (
+        Index("ix_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_logs_timestamp", "timestamp"),
+        {"sqlite_autoincrement": True},  # Ids of archived (deleted) logs must never be handed out again
+    )
+
 User.logs = relationship("Log", order_by=Log.id, back_populates="user")
+
+# Archived Log Segments (compressed NDJSON files of old logs, see db/retention.py)
+class LogSegment(Base):
+    __tablename__ = 'log_segments'
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String(512), unique=True, nullable=False)  # Absolute path of the segment file
+    first_log_id = Column(Integer, nullable=False)
+    last_log_id = Column(Integer, nullable=False)
+    start_time = Column(DateTime, nullable=False)  # Oldest timestamp in the segment
+    end_time = Column(DateTime, nullable=False)  # Newest timestamp in the segment
+    row_count = Column(Integer, nullable=False)
+    user_ids = Column(Text, nullable=False)  # JSON list of the user IDs present
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        Index("ix_log_segments_time", "start_time", "end_time"),
+    )
+
+# Daily Log Rollups (event counts per day, user and action, kept current on every write)
+class LogRollup(Base):
+    __tablename__ = 'log_rollups'
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    action = Column(String(255), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_log_rollups_day_user_id_action", "day", "user_id", "action", unique=True),
+        Index("ix_log_rollups_user_id_day", "user_id", "day"),
+    )
+
+# Change Feed (one row per written user, plan, version or log row, see db/changes.py)
+class Change(Base):
+    __tablename__ = 'changes'
+
+    id = Column(Integer, primary_key=True)  # Feed cursor: increases with every change and is never reused
+    table_name = Column(String(32), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    operation = Column(String(8), nullable=False)  # insert, update or delete
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        {"sqlite_autoincrement": True},
+    )
+
+# Replica Sync Cursors (last change applied from each source database, kept in the replica)
+class SyncCursor(Base):
+    __tablename__ = 'sync_cursors'
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String(255), unique=True, nullable=False)
+    last_change_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
+
+# Full-text index over plan versions (rowid = plan_versions.id), SQLite FTS5 only; see db/search.py
+PLAN_SEARCH_TABLE = "plan_search"
+PLAN_SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {PLAN_SEARCH_TABLE} "
+    "USING fts5(title, content, tokenize='porter unicode61')"
+)
+event.listen(Base.metadata, "after_create", DDL(PLAN_SEARCH_DDL).execute_if(dialect="sqlite"))
@@ -0,0 +1,151 @@
+"""Query-count and latency instrumentation built on SQLAlchemy engine events.
+
+A ``QueryProfiler`` listens on every ``Engine`` (including ones created after it
+starts, such as the lazily created shared engine). It counts statements,
+commits and rollbacks, adds up time spent inside the database driver, keeps
+the slowest statements and groups identical SQL text so that statements
+repeated with different parameters, the usual sign of an N+1 lazy-load loop,
+stand out. Used by ``main.py --profile``.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements repeated at least this many times are reported as possible N+1 patterns
+REPEAT_THRESHOLD = 5
+SLOWEST_COUNT = 5
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryProfiler:
+    """Collect statement counts and timings from every engine while running."""
+
+    def __init__(self, slowest=SLOWEST_COUNT, repeat_threshold=REPEAT_THRESHOLD):
+        self.slowest_count = slowest
+        self.repeat_threshold = repeat_threshold
+        self.statements = 0
+        self.rows_sent = 0
+        self.db_time = 0.0
+        self.commits = 0
+        self.rollbacks = 0
+        self.wall_time = 0.0
+        self._slowest = []
+        self._sequence = itertools.count()
+        self._counts = Counter()
+        self._times = defaultdict(float)
+        self._lock = threading.Lock()
+        self._started = None
+
+    # Event hooks
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profiler_start"].pop()
+        sql = _WHITESPACE.sub(" ", statement).strip()
+        with self._lock:
+            self.statements += 1
+            self.rows_sent += len(parameters) if executemany else 1
+            self.db_time += elapsed
+            self._counts[sql] += 1
+            self._times[sql] += elapsed
+            entry = (elapsed, next(self._sequence), sql)
+            if len(self._slowest) < self.slowest_count:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+
+    def _on_commit(self, conn):
+        with self._lock:
+            self.commits += 1
+
+    def _on_rollback(self, conn):
+        with self._lock:
+            self.rollbacks += 1
+
+    def _listeners(self):
+        return (
+            ("before_cursor_execute", self._before_execute),
+            ("after_cursor_execute", self._after_execute),
+            ("commit", self._on_commit),
+            ("rollback", self._on_rollback),
+        )
+
+    # Control
+    def start(self):
+        """Begin listening on all engines."""
+        for name, listener in self._listeners():
+            event.listen(Engine, name, listener)
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        """Stop listening and record the elapsed wall time."""
+        if self._started is None:
+            return self
+        for name, listener in self._listeners():
+            event.remove(Engine, name, listener)
+        self.wall_time += time.perf_counter() - self._started
+        self._started = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Reporting
+    def summary(self):
+        """Return the collected numbers as a JSON-serializable dict."""
+        with self._lock:
+            repeated = [
+                {"count": count, "total_ms": round(self._times[sql] * 1000, 3), "statement": sql}
+                for sql, count in self._counts.most_common()
+                if count >= self.repeat_threshold
+            ]
+            slowest = [
+                {"ms": round(elapsed * 1000, 3), "statement": sql}
+                for elapsed, _, sql in sorted(self._slowest, reverse=True)
+            ]
+            return {
+                "wall_ms": round(self.wall_time * 1000, 3),
+                "db_ms": round(self.db_time * 1000, 3),
+                "statements": self.statements,
+                "distinct_statements": len(self._counts),
+                "rows_sent": self.rows_sent,
+                "commits": self.commits,
+                "rollbacks": self.rollbacks,
+                "slowest": slowest,
+                "repeated": repeated,
+            }
+
+    def format_summary(self, width=120):
+        """Return a human-readable multi-line summary."""
+        data = self.summary()
+        outside = data["wall_ms"] - data["db_ms"]
+        lines = [
+            f"Profile: {data['wall_ms']:.1f} ms wall, {data['db_ms']:.1f} ms in the database, {outside:.1f} ms elsewhere",
+            f"  {data['statements']} statements ({data['distinct_statements']} distinct), "
+            f"{data['commits']} commits, {data['rollbacks']} rollbacks",
+        ]
+        if data["slowest"]:
+            lines.append("  Slowest statements:")
+            lines.extend(f"    {item['ms']:8.3f} ms  {_shorten(item['statement'], width)}" for item in data["slowest"])
+        if data["repeated"]:
+            lines.append(f"  Repeated statements (possible N+1, >= {self.repeat_threshold} runs):")
+            lines.extend(
+                f"    {item['count']:6d}x {item['total_ms']:8.3f} ms  {_shorten(item['statement'], width)}"
+                for item in data["repeated"]
+            )
+        return "\n".join(lines)
+
+def _shorten(sql, width):
+    return sql if len(sql) <= width else sql[:width - 3] + "..."
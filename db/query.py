@@ -1,8 +1,25 @@
 import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, UTC
+from sqlalchemy import func, insert, select
 from sqlalchemy.exc import IntegrityError
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import load_only
 from db.database_setup import session
-from db.models import User, Plan, Log, PlanVersion
+from db.models import User, Plan, Log, PlanDiff, PlanVersion, PlanSection
+from db import audit
+from db.changes import record_changes
+from db.compliance import coverage_matrix, load_index
+from db.content_cache import plan_content
+from db.versioning import VersionConflict, append_edit, append_version, decode_chain, is_write_conflict, reconstruct
+from db.search import index_versions, search_plans as search_index, unindex_plan
+from db.retention import archive_logs, iter_logs, rebuild_rollups, record_rollups, rollup_report
+from db.sections import load_sections, read_section, replace_section, section_rows
+from scripts.auth import ROLE_HIERARCHY, check_permission, hash_password, verify_password
+from scripts import login_tokens
+from scripts.plan_diff import MergeConflict, cached_diff, diff_sections, dump_diffs, load_diffs
 
 # Ensure logging is configured
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -15,7 +32,7 @@ def create_user(username, password, role):
         logging.warning(f"User '{username}' already exists. Skipping creation.")
         return existing_user  # Avoid duplicate users
 
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     new_user = User(username=username, password_hash=hashed_password, role=role)
     session.add(new_user)
 
@@ -32,11 +49,80 @@ def create_user(username, password, role):
         logging.error(f"Failed to create user '{username}': {e}")
         return None
 
+def _hash_passwords(passwords, workers=None):
+    """Hash passwords across a process pool (hashing is CPU-bound)."""
+    if workers == 1 or len(passwords) < 2:
+        return [hash_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_password, passwords, chunksize=max(1, len(passwords) // (4 * (workers or os.cpu_count() or 1)))))
+
+def import_users(records, chunk_size=500, workers=None):
+    """Create many users with set-based existence checks and bulk inserts.
+
+    Each record needs username and password and may set role (default viewer).
+    Invalid, duplicate or existing users are reported without aborting the batch.
+    Returns {"created": [usernames], "failed": [(row_number, username, reason)]}.
+    """
+    report = {"created": [], "failed": []}
+    seen = set()
+    valid = []
+    for row_number, record in enumerate(records, start=1):
+        username = str(record.get("username") or "").strip()
+        password = record.get("password") or ""
+        role = str(record.get("role") or "viewer").strip().lower()
+        if not username or not password:
+            report["failed"].append((row_number, username, "missing username or password"))
+        elif role not in ROLE_HIERARCHY:
+            report["failed"].append((row_number, username, f"unknown role '{role}'"))
+        elif username in seen:
+            report["failed"].append((row_number, username, "duplicate username in import"))
+        else:
+            seen.add(username)
+            valid.append((row_number, username, password, role))
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        existing = set(session.scalars(select(User.username).where(User.username.in_([row[1] for row in chunk]))))
+        pending = []
+        for row_number, username, password, role in chunk:
+            if username in existing:
+                report["failed"].append((row_number, username, "user already exists"))
+            else:
+                pending.append((row_number, username, password, role))
+        if not pending:
+            continue
+
+        hashes = _hash_passwords([row[2] for row in pending], workers)
+        rows = [
+            {"username": username, "password_hash": password_hash, "role": role}
+            for (_, username, _, role), password_hash in zip(pending, hashes)
+        ]
+        try:
+            user_ids = session.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), rows).all()
+            record_changes(session, "users", user_ids, "insert")
+            session.commit()
+            report["created"].extend(row["username"] for row in rows)
+        except IntegrityError:
+            # A concurrent writer created some of these users: insert row by row to isolate them
+            session.rollback()
+            for (row_number, username, _, _), row in zip(pending, rows):
+                try:
+                    with session.begin_nested():
+                        user_id = session.execute(insert(User).returning(User.id), [row]).scalar_one()
+                        record_changes(session, "users", [user_id], "insert")
+                    report["created"].append(username)
+                except IntegrityError:
+                    report["failed"].append((row_number, username, "user already exists"))
+            session.commit()
+
+    logging.info(f"Imported {len(report['created'])} users, {len(report['failed'])} failed.")
+    return report
+
 def authenticate_user(username, password):
     """Authenticate user by verifying password."""
     try:
         user = session.query(User).filter_by(username=username).first()
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(password, user.password_hash):
             logging.info(f"User '{username}' authenticated successfully. Role: {user.role}")
             return user
         else:
@@ -46,6 +132,62 @@ def authenticate_user(username, password):
         logging.error(f"Authentication error: {e}")
         return None
 
+def get_user_by_username(username):
+    """Return the user with the given username, or None."""
+    return session.query(User).filter_by(username=username).first()
+
+def has_users():
+    """Return True if the database has at least one user (a new database has none)."""
+    return session.query(User.id).first() is not None
+
+def delete_user(username):
+    """Delete a user by username."""
+    try:
+        user = session.query(User).filter_by(username=username).first()
+        if not user:
+            logging.warning(f"User '{username}' not found. Nothing to delete.")
+            return False
+
+        session.delete(user)
+        session.commit()
+        logging.info(f"User '{username}' deleted successfully.")
+        return True
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Failed to delete user '{username}': {e}")
+        return False
+
+def login_user(username, password):
+    """Verify a password once and store a signed local login session."""
+    user = authenticate_user(username, password)
+    if user:
+        claims = login_tokens.issue_session(user)
+        logging.info(f"Session for '{username}' valid until {claims['exp']} (epoch seconds).")
+    return user
+
+def authenticate_session(username, password=None):
+    """Authenticate via the stored login session, or by a full password check when a password is given.
+
+    Without a password, a valid session for this username is accepted and no password
+    hash is computed. A given password is always verified against the stored hash.
+    """
+    if password is not None:
+        return authenticate_user(username, password)
+    claims = login_tokens.load_session()
+    if claims and claims["usr"] == username:
+        user = session.get(User, claims["uid"])
+        if user and login_tokens.session_matches(claims, user.password_hash):
+            return user
+    logging.warning(f"No valid login session for '{username}'. Run 'login' first or pass a password.")
+    return None
+
+def logout_user(all_sessions=False):
+    """Revoke the stored login session (or every session when all_sessions is True)."""
+    claims = login_tokens.revoke_session(all_sessions)
+    if claims:
+        logging.info(f"User '{claims['usr']}' logged out.")
+    return claims
+
 # Plan Management
 def create_plan(title, plan_type, username, framework):
     """Create a DRP or IRP plan associated with a user."""
@@ -55,7 +197,7 @@ def create_plan(title, plan_type, username, framework):
             logging.error(f"User '{username}' not found. Cannot create plan.")
             return None
 
-        new_plan = Plan(title=title, plan_type=plan_type, owner_id=user.id)
+        new_plan = Plan(title=title, plan_type=plan_type, owner_id=user.id, framework=framework.lower() if framework else None)
         session.add(new_plan)
         session.commit()
         logging.info(f"Plan '{title}' ({plan_type}) created successfully.")
@@ -65,27 +207,407 @@ def create_plan(title, plan_type, username, framework):
         logging.error(f"Plan creation failed: {e}")
         return None
 
-def list_plans():
-    """List all plans with error handling."""
+def create_plans_bulk(plans):
+    """Insert many rendered plans and their first versions in one transaction.
+
+    Each item needs title, plan_type, owner (username) and version (the encoded
+    columns from db.versioning.encode_version), and may set framework. Items with an unknown owner are
+    skipped. Returns the list of new plan IDs.
+    """
     try:
-        plans = session.query(Plan).all()
-        for plan in plans:
-            owner_name = plan.owner.username if plan.owner else "[None]"
-            logging.info(f"Plan ID: {plan.id}, Title: {plan.title}, Type: {plan.plan_type}, Owner: {owner_name}")
-        return plans
+        usernames = {plan["owner"] for plan in plans}
+        owners = dict(session.query(User.username, User.id).filter(User.username.in_(usernames)).all())
+        for missing in sorted(usernames - owners.keys(), key=str):
+            logging.error(f"User '{missing}' not found. Skipping their plans.")
+        plans = [plan for plan in plans if plan["owner"] in owners]
+        if not plans:
+            return []
+
+        plan_ids = session.scalars(
+            insert(Plan).returning(Plan.id, sort_by_parameter_order=True),
+            [{"title": plan["title"], "plan_type": plan["plan_type"], "owner_id": owners[plan["owner"]],
+              "framework": plan["framework"].lower() if plan.get("framework") else None} for plan in plans],
+        ).all()
+        version_ids = session.scalars(
+            insert(PlanVersion).returning(PlanVersion.id, sort_by_parameter_order=True),
+            [{"plan_id": plan_id, **plan["version"]} for plan_id, plan in zip(plan_ids, plans)],
+        ).all()
+        record_changes(session, "plans", plan_ids, "insert")
+        record_changes(session, "plan_versions", version_ids, "insert")
+        contents = [
+            decode_chain([(plan["version"]["storage"], plan["version"]["codec"], plan["version"]["payload"])])
+            for plan in plans
+        ]
+        index_versions(session, [
+            (version_id, plan["title"], content)
+            for version_id, plan, content in zip(version_ids, plans, contents)
+        ])
+        session.execute(insert(PlanSection), [
+            row for plan_id, content in zip(plan_ids, contents) for row in section_rows(plan_id, content)
+        ])
+        session.commit()
+        logging.info(f"Created {len(plan_ids)} plans in bulk.")
+        return plan_ids
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Bulk plan creation failed: {e}")
+        return []
+
+# Sortable columns for plan_catalog
+CATALOG_SORT_KEYS = ("id", "title", "type", "owner", "latest_version", "updated_at")
+
+def catalog_statement(plan_type=None, owner=None, sort_by="id", descending=False, limit=None, offset=0):
+    """Build the plan summary SELECT used by plan_catalog (and the HTTP API)."""
+    if sort_by not in CATALOG_SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort_by}'. Use one of: {', '.join(CATALOG_SORT_KEYS)}.")
+
+    latest_version = (
+        select(func.max(PlanVersion.version_number))
+        .where(PlanVersion.plan_id == Plan.id)
+        .correlate(Plan)
+        .scalar_subquery()
+        .label("latest_version")
+    )
+    stmt = (
+        select(Plan.id, Plan.title, Plan.plan_type, User.username.label("owner"), latest_version, Plan.updated_at)
+        .outerjoin(User, Plan.owner_id == User.id)
+    )
+    if plan_type:
+        stmt = stmt.where(Plan.plan_type == plan_type)
+    if owner:
+        stmt = stmt.where(User.username == owner)
+
+    sort_column = {
+        "id": Plan.id,
+        "title": Plan.title,
+        "type": Plan.plan_type,
+        "owner": User.username,
+        "latest_version": latest_version,
+        "updated_at": Plan.updated_at,
+    }[sort_by]
+    order = [sort_column.desc() if descending else sort_column.asc()]
+    if sort_by != "id":
+        order.append(Plan.id.desc() if descending else Plan.id.asc())
+    stmt = stmt.order_by(*order)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if offset:
+        stmt = stmt.offset(offset)
+    return stmt
+
+def plan_catalog(plan_type=None, owner=None, sort_by="id", descending=False, limit=None, offset=0, batch_size=1000):
+    """Stream lightweight plan summary rows from a single query.
+
+    Each row has id, title, plan_type, owner, latest_version and updated_at.
+    The owner name comes from a join and the latest version number from an
+    indexed correlated subquery, so no ORM objects are loaded per plan.
+    """
+    stmt = catalog_statement(plan_type, owner, sort_by, descending, limit, offset)
+    try:
+        yield from session.execute(stmt.execution_options(yield_per=batch_size))
     except Exception as e:
         session.rollback()
         logging.error(f"Error retrieving plans: {e}")
+
+def latest_plan_versions(plan_ids=None, batch_size=1000):
+    """Stream (plan_id, title, plan_type, framework, version_number, content_hash) for each plan's latest version."""
+    latest = (
+        select(PlanVersion.plan_id, func.max(PlanVersion.version_number).label("version_number"))
+        .group_by(PlanVersion.plan_id)
+        .subquery()
+    )
+    stmt = (
+        select(Plan.id.label("plan_id"), Plan.title, Plan.plan_type, Plan.framework, PlanVersion.version_number,
+               PlanVersion.content_hash)
+        .join(latest, latest.c.plan_id == Plan.id)
+        .join(PlanVersion, (PlanVersion.plan_id == Plan.id) & (PlanVersion.version_number == latest.c.version_number))
+        .order_by(Plan.id)
+    )
+    if plan_ids:
+        stmt = stmt.where(Plan.id.in_(plan_ids))
+
+    try:
+        yield from session.execute(stmt.execution_options(yield_per=batch_size))
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error retrieving latest plan versions: {e}")
+
+def list_plans(**filters):
+    """List plan summaries (see plan_catalog for the accepted filters)."""
+    plans = list(plan_catalog(**filters))
+    for plan in plans:
+        logging.info(f"Plan ID: {plan.id}, Title: {plan.title}, Type: {plan.plan_type}, Owner: {plan.owner or '[None]'}")
+    return plans
+
+def delete_plan(plan_id):
+    """Delete a plan and its version history."""
+    try:
+        plan = session.get(Plan, plan_id)
+        if not plan:
+            logging.warning(f"Plan {plan_id} not found. Nothing to delete.")
+            return False
+
+        unindex_plan(session, plan_id)
+        session.delete(plan)
+        session.commit()
+        logging.info(f"Plan {plan_id} deleted.")
+        return True
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Failed to delete plan {plan_id}: {e}")
+        return False
+
+# Plan Versioning
+# Saves that lose a race with another writer are retried this many times, with jittered exponential backoff
+PLAN_SAVE_RETRIES = int(os.getenv("PLAN_SAVE_RETRIES", "10"))
+PLAN_SAVE_BACKOFF = float(os.getenv("PLAN_SAVE_BACKOFF", "0.01"))
+
+def _save_with_retries(write):
+    """Run write() and commit, retrying from a fresh transaction when another writer saved the plan first."""
+    for attempt in range(PLAN_SAVE_RETRIES + 1):
+        try:
+            result = write()
+            session.commit()
+            return result
+        except Exception as e:
+            session.rollback()
+            if attempt == PLAN_SAVE_RETRIES or not is_write_conflict(e):
+                raise
+            logging.info(f"Write conflict ({type(e).__name__}), retrying (attempt {attempt + 2}).")
+            time.sleep(random.uniform(0, PLAN_SAVE_BACKOFF * 2 ** attempt))
+
+def save_plan_version(plan_id, content, base_version=None, merge=None):
+    """Save new content for a plan as its next version.
+
+    base_version is the version the edit started from. If another editor has
+    saved since, merge(base, latest, content) (e.g. plan_diff.merge_sections)
+    combines the edits, or the save is refused when no merge hook is given.
+    """
+    try:
+        if not session.get(Plan, plan_id):
+            logging.error(f"Plan {plan_id} not found. Cannot save version.")
+            return None
+
+        version = _save_with_retries(lambda: append_edit(session, plan_id, content, base_version, merge))
+        logging.info(f"Saved version {version.version_number} of plan {plan_id} ({version.storage}).")
+        return version
+    except (VersionConflict, MergeConflict) as e:
+        session.rollback()
+        logging.error(f"Version not saved: {e}")
+        return None
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Failed to save version for plan {plan_id}: {e}")
+        return None
+
+def list_plan_versions(plan_id):
+    """List the version history of a plan without loading version content."""
+    try:
+        versions = (
+            session.query(PlanVersion)
+            .options(load_only(
+                PlanVersion.id, PlanVersion.plan_id, PlanVersion.version_number, PlanVersion.storage,
+                PlanVersion.content_length, PlanVersion.content_hash, PlanVersion.created_at,
+            ))
+            .filter(PlanVersion.plan_id == plan_id)
+            .order_by(PlanVersion.version_number)
+            .all()
+        )
+        for version in versions:
+            logging.info(f"Plan {plan_id} Version: {version.version_number}, Created: {version.created_at}, Size: {version.content_length}")
+        return versions
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error retrieving versions for plan {plan_id}: {e}")
         return []
 
+def get_plan_content(plan_id, version_number=None, html=False):
+    """Return the markdown content of a plan version (latest by default), or its HTML with html=True.
+
+    Served from the content cache; versions are only reconstructed and rendered on a miss.
+    """
+    try:
+        entry = plan_content(session, plan_id, version_number, html=html)
+        if entry is None:
+            return None
+        return entry.html if html else entry.content
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error reading version {version_number} of plan {plan_id}: {e}")
+        return None
+
+def rollback_plan(plan_id, version_number):
+    """Restore an earlier version by saving its content as the newest version."""
+    try:
+        content = reconstruct(session, plan_id, version_number)
+        if content is None:
+            logging.error(f"Version {version_number} of plan {plan_id} not found. Cannot roll back.")
+            return None
+
+        version = _save_with_retries(lambda: append_version(session, plan_id, content))
+        logging.info(f"Plan {plan_id} rolled back to version {version_number} (saved as version {version.version_number}).")
+        return version
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Rollback of plan {plan_id} failed: {e}")
+        return None
+
+def list_plan_sections(plan_id):
+    """List the heading paths of a plan's latest content in document order."""
+    try:
+        return [(section.path, section.level, len(section.content)) for section in load_sections(session, plan_id)]
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error listing sections of plan {plan_id}: {e}")
+        return []
+
+def get_plan_section(plan_id, path):
+    """Return the latest content of one section of a plan, or None if it does not exist."""
+    try:
+        section = read_section(session, plan_id, path)
+        return section.content if section else None
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error reading section '{path}' of plan {plan_id}: {e}")
+        return None
+
+def update_plan_section(plan_id, path, body):
+    """Replace the body of one section, saving the result as the plan's next version."""
+    try:
+        version = _save_with_retries(lambda: replace_section(session, plan_id, path, body))
+        if version is None:
+            logging.error(f"Plan {plan_id} has no section '{path}'. Cannot update it.")
+            return None
+        logging.info(f"Updated section '{path}' of plan {plan_id} (version {version.version_number}).")
+        return version
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Failed to update section '{path}' of plan {plan_id}: {e}")
+        return None
+
+def _stored_diff(old_hash, new_hash, context, load_contents):
+    """Return the saved diff of two content hashes, computing and saving it on a miss."""
+    key = {"old_hash": old_hash, "new_hash": new_hash, "context": context}
+    stored = session.execute(select(PlanDiff.diffs).filter_by(**key)).scalar()
+    if stored is not None:
+        return load_diffs(stored)
+
+    diffs = diff_sections(*load_contents(), context)
+    try:
+        session.add(PlanDiff(**key, diffs=dump_diffs(diffs)))
+        session.commit()
+    except IntegrityError:
+        session.rollback()  # Another process saved the same pair first
+    return diffs
+
+def diff_plan_versions(plan_id, from_version, to_version, context=3):
+    """Section-by-section diff between two versions of a plan (saved per content pair, see plan_diffs)."""
+    try:
+        hashes = dict(
+            session.query(PlanVersion.version_number, PlanVersion.content_hash)
+            .filter(PlanVersion.plan_id == plan_id, PlanVersion.version_number.in_([from_version, to_version]))
+            .all()
+        )
+        if from_version not in hashes or to_version not in hashes:
+            logging.error(f"Plan {plan_id} has no version {from_version if from_version not in hashes else to_version}.")
+            return None
+
+        def load_contents():
+            return (plan_content(session, plan_id, from_version, hashes[from_version]).content,
+                    plan_content(session, plan_id, to_version, hashes[to_version]).content)
+
+        old_hash, new_hash = hashes[from_version], hashes[to_version]
+        return cached_diff(old_hash, new_hash, lambda: _stored_diff(old_hash, new_hash, context, load_contents), context)
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Diff of plan {plan_id} versions {from_version}..{to_version} failed: {e}")
+        return None
+
+def search_plans(query, plan_type=None, latest_only=False, limit=20, raw=False):
+    """Full-text search over plan titles and version content, best matches first."""
+    try:
+        return search_index(session, query, plan_type=plan_type, latest_only=latest_only, limit=limit, raw=raw)
+    except NotImplementedError:
+        raise
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Search for '{query}' failed: {e}")
+        return []
+
+# Compliance Coverage
+def plan_coverage(framework=None, plan_ids=None, force=False):
+    """Check the latest version of each plan against its framework's control catalog.
+
+    Only content not scanned before with the current catalog is reconstructed
+    and scanned (see db.compliance.coverage_matrix for the report layout).
+    Returns None if the check fails.
+    """
+    try:
+        if framework:
+            load_index(framework)
+        report = coverage_matrix(session, latest_plan_versions(plan_ids), framework=framework, force=force)
+        session.commit()
+        logging.info(f"Coverage checked for {len(report['plans'])} plans ({report['scanned']} scanned, {report['cached']} cached).")
+        return report
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Coverage check failed: {e}")
+        return None
+
 # Logging Actions
 def log_action(user_id, action):
-    """Log user actions."""
+    """Log user actions (buffered when AUDIT_LOG_MODE is "async")."""
+    if audit.AUDIT_LOG_MODE == "async":
+        audit.get_audit_writer().submit(user_id, action)
+        return
+
     try:
-        new_log = Log(user_id=user_id, action=action)
+        new_log = Log(user_id=user_id, action=action, timestamp=datetime.now(UTC))
         session.add(new_log)
+        record_rollups(session, [{"user_id": user_id, "action": action, "timestamp": new_log.timestamp}])
         session.commit()
         logging.info(f"Logged action: {action}")
     except Exception as e:
         session.rollback()
         logging.error(f"Failed to log action: {e}")
+
+def view_logs(user_id=None, action_prefix=None, since=None, until=None, after_id=None, limit=None, batch_size=500,
+              include_archive=True):
+    """Stream audit logs in id order using keyset pagination.
+
+    Rows are fetched ``batch_size`` at a time with ``WHERE id > last_id`` so memory
+    use stays flat however large the log is. Filters: user, action prefix and a
+    [since, until) timestamp range. Pass the last id seen as after_id to resume.
+    Archived segments (see db.retention) are merged in unless include_archive is False.
+    """
+    try:
+        yield from iter_logs(session, user_id=user_id, action_prefix=action_prefix, since=since, until=until,
+                             after_id=after_id, limit=limit, batch_size=batch_size, include_archive=include_archive)
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error retrieving logs: {e}")
+
+# Log Retention
+def archive_old_logs(older_than_days=None, archive_dir=None):
+    """Move logs past the retention age into compressed archive segments."""
+    try:
+        session.commit()  # End the open read transaction so later queries see the archived state
+        return archive_logs(older_than_days=older_than_days, archive_dir=archive_dir)
+    except Exception as e:
+        logging.error(f"Log archival failed: {e}")
+        return None
+
+def log_report(since=None, until=None, user_id=None, action_prefix=None, group_by=("day", "user", "action"), rebuild=False):
+    """Return activity totals from the daily rollups, optionally recomputing them first."""
+    try:
+        if rebuild:
+            rebuilt = rebuild_rollups(session.connection())
+            session.commit()
+            logging.info(f"Rebuilt log rollups from {rebuilt} events.")
+        return rollup_report(session, since=since, until=until, user_id=user_id, action_prefix=action_prefix, group_by=group_by)
+    except ValueError:
+        raise
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Log report failed: {e}")
+        return []
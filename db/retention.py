@@ -0,0 +1,275 @@
+"""Audit log retention: archived segments and daily rollups.
+
+Logs older than ``LOG_RETENTION_DAYS`` are moved out of the ``logs`` table into
+append-only, gzip-compressed NDJSON segment files under ``LOG_ARCHIVE_DIR``.
+Each segment is recorded in ``log_segments`` with its absolute path, id range,
+time range and the users it contains, so readers only open the segments that
+can match. ``view_logs`` merges hot rows and archived rows back into one
+id-ordered stream; log ids are AUTOINCREMENT so archived ids are never reused.
+
+``log_rollups`` holds per-day, per-user, per-action event counts. They are
+updated in the same transaction as every log write, so activity reports read a
+few aggregate rows instead of scanning (or un-archiving) the raw events.
+"""
+import gzip
+import heapq
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta, UTC
+from itertools import islice
+from operator import attrgetter
+
+from sqlalchemy import delete, func, insert, select
+
+from db.changes import record_changes
+from db.models import Log, LogRollup, LogSegment, User
+
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "90"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", os.path.join("outputs", "log_archive"))
+LOG_SEGMENT_SIZE = int(os.getenv("LOG_SEGMENT_SIZE", "50000"))
+
+# Columns a rollup report can be grouped by
+ROLLUP_GROUPS = {
+    "day": LogRollup.day,
+    "user": User.username,
+    "action": LogRollup.action,
+}
+
+
+# Rollups
+def _day(timestamp):
+    """Return the UTC calendar day of a log timestamp."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(UTC)
+    return timestamp.date()
+
+def _upsert(bind):
+    """Return an INSERT for LogRollup that adds to the count of an existing row."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(LogRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=["day", "user_id", "action"],
+        set_={"count": LogRollup.count + stmt.excluded["count"]},
+    )
+
+def record_rollups(session_or_conn, events):
+    """Add a batch of log events (dicts with user_id, action, timestamp) to the daily rollups."""
+    counts = Counter((_day(event["timestamp"]), event["user_id"], event["action"]) for event in events)
+    if not counts:
+        return
+    rows = [{"day": day, "user_id": user_id, "action": action, "count": count}
+            for (day, user_id, action), count in counts.items()]
+    bind = session_or_conn.get_bind() if hasattr(session_or_conn, "get_bind") else session_or_conn
+    stmt = _upsert(bind)
+    if stmt is not None:
+        session_or_conn.execute(stmt, rows)
+        return
+
+    # Dialects without ON CONFLICT: update in place, insert what is missing
+    for row in rows:
+        updated = session_or_conn.execute(
+            LogRollup.__table__.update()
+            .where(LogRollup.day == row["day"], LogRollup.user_id == row["user_id"], LogRollup.action == row["action"])
+            .values(count=LogRollup.count + row["count"])
+        ).rowcount
+        if not updated:
+            session_or_conn.execute(insert(LogRollup), row)
+
+def rollup_report(session, since=None, until=None, user_id=None, action_prefix=None, group_by=("day", "user", "action")):
+    """Return event totals from the rollups for the [since, until) day range, grouped by group_by."""
+    unknown = [key for key in group_by if key not in ROLLUP_GROUPS]
+    if unknown:
+        raise ValueError(f"Unknown rollup group '{unknown[0]}'. Use any of: {', '.join(ROLLUP_GROUPS)}.")
+
+    columns = [ROLLUP_GROUPS[key].label(key) for key in group_by]
+    stmt = select(*columns, func.sum(LogRollup.count).label("total")).outerjoin(User, LogRollup.user_id == User.id)
+    if since is not None:
+        stmt = stmt.where(LogRollup.day >= since)
+    if until is not None:
+        stmt = stmt.where(LogRollup.day < until)
+    if user_id is not None:
+        stmt = stmt.where(LogRollup.user_id == user_id)
+    if action_prefix:
+        stmt = stmt.where(LogRollup.action.startswith(action_prefix, autoescape=True))
+    if columns:
+        stmt = stmt.group_by(*columns).order_by(*columns)
+    return session.execute(stmt).all()
+
+def rebuild_rollups(conn):
+    """Recompute every rollup from the hot logs and the archived segments; return the event count."""
+    conn.execute(delete(LogRollup))
+    total = 0
+    batch = []
+    for row in conn.execution_options(stream_results=True, yield_per=5000).execute(
+        select(Log.user_id, Log.action, Log.timestamp)
+    ):
+        batch.append({"user_id": row.user_id, "action": row.action, "timestamp": row.timestamp})
+        if len(batch) >= 5000:
+            record_rollups(conn, batch)
+            total += len(batch)
+            batch = []
+    for segment in conn.execute(select(LogSegment.path)).scalars().all():
+        for log in read_segment(segment):
+            batch.append({"user_id": log.user_id, "action": log.action, "timestamp": log.timestamp})
+            if len(batch) >= 5000:
+                record_rollups(conn, batch)
+                total += len(batch)
+                batch = []
+    record_rollups(conn, batch)
+    return total + len(batch)
+
+
+# Archive segments
+def read_segment(path):
+    """Yield the archived rows of one segment file as detached Log objects, in id order."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            log_id, user_id, action, timestamp = json.loads(line)
+            yield Log(id=log_id, user_id=user_id, action=action, timestamp=datetime.fromisoformat(timestamp))
+
+def _write_segment(path, rows):
+    """Write rows to a new segment file atomically (temporary file, fsync, link).
+
+    Raises FileExistsError rather than replace an existing segment.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as file:
+        for row in rows:
+            file.write((json.dumps([row.id, row.user_id, row.action, row.timestamp.isoformat()]) + "\n").encode("utf-8"))
+        file.flush()
+        raw.flush()
+        os.fsync(raw.fileno())
+    try:
+        os.link(temporary, path)
+    finally:
+        os.remove(temporary)
+
+def archive_logs(older_than_days=None, archive_dir=None, segment_size=None, engine=None):
+    """Move logs older than the retention age into segment files; return (segments, rows) archived.
+
+    Each segment is written to disk before its rows are deleted, and the delete
+    and the segment record commit together, so an interrupted run never loses
+    events. At worst it leaves a segment file with no record, which the next run
+    renames aside before writing the range again. Recorded segments are never
+    overwritten.
+    """
+    from db.database_setup import get_engine
+    engine = engine or get_engine()
+    days = LOG_RETENTION_DAYS if older_than_days is None else older_than_days
+    archive_dir = archive_dir or LOG_ARCHIVE_DIR
+    segment_size = segment_size or LOG_SEGMENT_SIZE
+    cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=days)
+    archive_dir = os.path.abspath(archive_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    segments = archived = 0
+    last_id = 0
+    start = time.perf_counter()
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(Log.id, Log.user_id, Log.action, Log.timestamp)
+                .where(Log.timestamp < cutoff, Log.id > last_id)
+                .order_by(Log.id)
+                .limit(segment_size)
+            ).all()
+            if not rows:
+                break
+
+            first_id, last_id = rows[0].id, rows[-1].id
+            path = os.path.join(archive_dir, f"logs-{first_id:010d}-{last_id:010d}.ndjson.gz")
+            if os.path.exists(path) and not conn.execute(select(LogSegment.id).where(LogSegment.path == path)).first():
+                orphan = f"{path}.orphaned-{int(time.time())}"
+                logging.warning(f"Segment {path} has no record (interrupted run?); moving it to {orphan}.")
+                os.replace(path, orphan)
+            _write_segment(path, rows)
+            conn.execute(insert(LogSegment), {
+                "path": path,
+                "first_log_id": first_id,
+                "last_log_id": last_id,
+                "start_time": min(row.timestamp for row in rows),
+                "end_time": max(row.timestamp for row in rows),
+                "row_count": len(rows),
+                "user_ids": json.dumps(sorted({row.user_id for row in rows if row.user_id is not None})),
+            })
+            conn.execute(delete(Log).where(Log.id.between(first_id, last_id), Log.timestamp < cutoff))
+            record_changes(conn, "logs", [row.id for row in rows], "delete")
+        segments += 1
+        archived += len(rows)
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"Archived {archived} logs older than {days} days into {segments} segments in {elapsed:.2f}s.")
+    return segments, archived
+
+def archived_logs(session, user_id=None, action_prefix=None, since=None, until=None, after_id=None):
+    """Yield archived logs matching the view_logs filters, merged into id order."""
+    query = session.query(LogSegment).filter(LogSegment.last_log_id > (after_id or 0))
+    if since is not None:
+        query = query.filter(LogSegment.end_time >= since)
+    if until is not None:
+        query = query.filter(LogSegment.start_time < until)
+    segments = [
+        segment for segment in query.order_by(LogSegment.first_log_id)
+        if user_id is None or user_id in json.loads(segment.user_ids)
+    ]
+
+    def matching(path):
+        for log in read_segment(path):
+            if after_id is not None and log.id <= after_id:
+                continue
+            if user_id is not None and log.user_id != user_id:
+                continue
+            if action_prefix and not log.action.startswith(action_prefix):
+                continue
+            if since is not None and log.timestamp < since:
+                continue
+            if until is not None and log.timestamp >= until:
+                continue
+            yield log
+
+    return heapq.merge(*(matching(segment.path) for segment in segments), key=attrgetter("id"))
+
+
+# Reading
+def hot_logs(session, user_id=None, action_prefix=None, since=None, until=None, after_id=None, limit=None, batch_size=500):
+    """Keyset-paginate the logs table itself, batch_size rows per query."""
+    last_id = after_id or 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        query = session.query(Log).filter(Log.id > last_id)
+        if user_id is not None:
+            query = query.filter(Log.user_id == user_id)
+        if action_prefix:
+            query = query.filter(Log.action.startswith(action_prefix, autoescape=True))
+        if since is not None:
+            query = query.filter(Log.timestamp >= since)
+        if until is not None:
+            query = query.filter(Log.timestamp < until)
+
+        page_size = batch_size if remaining is None else min(batch_size, remaining)
+        rows = query.order_by(Log.id).limit(page_size).all()
+        if not rows:
+            return
+
+        yield from rows
+        last_id = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < page_size:
+            return
+
+def iter_logs(session, user_id=None, action_prefix=None, since=None, until=None, after_id=None, limit=None,
+              batch_size=500, include_archive=True):
+    """Yield hot and (optionally) archived logs matching the filters, in id order."""
+    rows = hot_logs(session, user_id, action_prefix, since, until, after_id, limit, batch_size)
+    if include_archive:
+        rows = heapq.merge(archived_logs(session, user_id, action_prefix, since, until, after_id), rows, key=attrgetter("id"))
+    return islice(rows, limit)
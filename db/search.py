@@ -0,0 +1,118 @@
+"""Full-text search over plan titles and version content (SQLite FTS5).
+
+``plan_search`` is an FTS5 table, created with the schema (see db/models.py),
+whose rowid is the ``plan_versions.id`` it indexes. Results therefore join
+straight back to versions and plans for filtering by plan type or "latest
+version only". Versions are indexed in the same transaction that saves them
+(see db.versioning.append_version). Inserts use OR REPLACE so a reused
+version id never collides with a stale index entry.
+"""
+import logging
+
+from sqlalchemy import text
+
+from db.models import PLAN_SEARCH_DDL, PLAN_SEARCH_TABLE as SEARCH_TABLE
+from db.versioning import apply_version
+
+def search_enabled(session_or_conn):
+    """Return True if the bound database supports the FTS5 index."""
+    bind = session_or_conn.get_bind() if hasattr(session_or_conn, "get_bind") else session_or_conn
+    return bind.dialect.name == "sqlite"
+
+
+# Index maintenance
+def index_version(session, version_id, title, content):
+    """Add one plan version to the search index."""
+    if not search_enabled(session):
+        return
+    session.execute(
+        text(f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, content) VALUES (:id, :title, :content)"),
+        {"id": version_id, "title": title, "content": content},
+    )
+
+def index_versions(session, rows):
+    """Add many (version_id, title, content) rows to the search index."""
+    if not rows or not search_enabled(session):
+        return
+    session.execute(
+        text(f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, content) VALUES (:id, :title, :content)"),
+        [{"id": version_id, "title": title, "content": content} for version_id, title, content in rows],
+    )
+
+def unindex_plan(session, plan_id):
+    """Remove every version of a plan from the search index."""
+    if not search_enabled(session):
+        return
+    session.execute(
+        text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM plan_versions WHERE plan_id = :plan_id)"),
+        {"plan_id": plan_id},
+    )
+
+def rebuild_index(conn, batch_size=500):
+    """Re-index every stored version, decoding each plan's delta chain once in order."""
+    if not search_enabled(conn):
+        return 0
+    conn.exec_driver_sql(PLAN_SEARCH_DDL)
+    conn.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE}")
+    rows = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(
+        "SELECT pv.id, pv.plan_id, pv.storage, pv.codec, pv.payload, p.title "
+        "FROM plan_versions pv JOIN plans p ON p.id = pv.plan_id "
+        "ORDER BY pv.plan_id, pv.version_number"
+    ))
+    insert_sql = text(f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, content) VALUES (:id, :title, :content)")
+    batch = []
+    count = 0
+    current_plan = content = None
+    for version_id, plan_id, storage, codec, payload, title in rows:
+        try:
+            content = apply_version(content if plan_id == current_plan else None, storage, codec, payload)
+        except ValueError:
+            logging.warning(f"Skipping version {version_id}: delta without a keyframe.")
+            continue
+        current_plan = plan_id
+        batch.append({"id": version_id, "title": title, "content": content})
+        if len(batch) >= batch_size:
+            conn.execute(insert_sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert_sql, batch)
+        count += len(batch)
+    return count
+
+
+# Queries
+def _quote_terms(query):
+    """Turn free text into an FTS5 query of quoted terms (all must match)."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def search_plans(session, query, plan_type=None, latest_only=False, limit=20, raw=False):
+    """Rank plan versions matching query by BM25 (title weighted above content).
+
+    Returns rows with plan_id, title, plan_type, version_number, snippet and rank.
+    Pass raw=True to use FTS5 query syntax (phrases, OR, NEAR, prefix*) directly.
+    """
+    if not search_enabled(session):
+        raise NotImplementedError("Full-text search requires SQLite with FTS5.")
+
+    conditions = [f"{SEARCH_TABLE} MATCH :query"]
+    params = {"query": query if raw else _quote_terms(query), "limit": limit}
+    if plan_type:
+        conditions.append("p.plan_type = :plan_type")
+        params["plan_type"] = plan_type
+    if latest_only:
+        conditions.append(
+            "pv.version_number = (SELECT MAX(latest.version_number) FROM plan_versions latest WHERE latest.plan_id = pv.plan_id)"
+        )
+
+    sql = (
+        "SELECT pv.plan_id, p.title, p.plan_type, pv.version_number, "
+        f"snippet({SEARCH_TABLE}, 1, '[', ']', '...', 12) AS snippet, "
+        f"bm25({SEARCH_TABLE}, 5.0, 1.0) AS rank "
+        f"FROM {SEARCH_TABLE} "
+        f"JOIN plan_versions pv ON pv.id = {SEARCH_TABLE}.rowid "
+        "JOIN plans p ON p.id = pv.plan_id "
+        f"WHERE {' AND '.join(conditions)} "
+        "ORDER BY rank LIMIT :limit"
+    )
+    return session.execute(text(sql), params).all()
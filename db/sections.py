@@ -0,0 +1,97 @@
+"""Section-addressed storage of the latest plan content.
+
+``plan_sections`` holds the newest version of every plan split on its ``##`` /
+``###`` headings (see scripts.plan_diff.split_sections), one row per heading
+path in document order. Reading one section is a single indexed lookup and the
+full document is composed by concatenating the rows. Updating a section
+rewrites only that row; the version history still gets a new version, encoded
+as a line delta against the composed previous document, so no delta chain has
+to be replayed. Every append_version keeps the rows in sync, writing only the
+sections whose hash changed.
+"""
+from sqlalchemy import insert
+
+from db.models import PlanSection
+from scripts.plan_diff import SECTION_HEADING, split_sections
+
+
+def section_rows(plan_id, content):
+    """Return insert parameters for every section of a document."""
+    return [
+        {"plan_id": plan_id, "position": position, "path": section.path, "level": section.level,
+         "content": section.text, "content_hash": section.hash}
+        for position, section in enumerate(split_sections(content))
+    ]
+
+def compose(sections):
+    """Join section rows back into the full markdown document."""
+    return "".join(section.content for section in sections)
+
+
+# Session-level API
+def load_sections(session, plan_id):
+    """Return a plan's section rows in document order, backfilling them from the latest version."""
+    sections = session.query(PlanSection).filter(PlanSection.plan_id == plan_id).order_by(PlanSection.position).all()
+    if sections:
+        return sections
+
+    from db.versioning import latest_version_number, reconstruct
+    latest = latest_version_number(session, plan_id)
+    if not latest:
+        return []
+    sync_sections(session, plan_id, reconstruct(session, plan_id, latest))
+    return session.query(PlanSection).filter(PlanSection.plan_id == plan_id).order_by(PlanSection.position).all()
+
+def read_section(session, plan_id, path):
+    """Return the stored row for one section, or None if the plan has no such section."""
+    section = session.query(PlanSection).filter(PlanSection.plan_id == plan_id, PlanSection.path == path).first()
+    if section is None and not session.query(PlanSection.id).filter(PlanSection.plan_id == plan_id).first():
+        section = next((row for row in load_sections(session, plan_id) if row.path == path), None)
+    return section
+
+def sync_sections(session, plan_id, content):
+    """Make the section rows match content, touching only sections that changed."""
+    stored = {row.path: row for row in session.query(PlanSection).filter(PlanSection.plan_id == plan_id)}
+    new_rows = []
+    for row in section_rows(plan_id, content):
+        current = stored.pop(row["path"], None)
+        if current is None:
+            new_rows.append(row)
+            continue
+        if current.content_hash != row["content_hash"]:
+            current.content = row["content"]
+            current.content_hash = row["content_hash"]
+        if current.position != row["position"]:
+            current.position = row["position"]
+        if current.level != row["level"]:
+            current.level = row["level"]
+    for row in stored.values():
+        session.delete(row)
+    session.flush()
+    if new_rows:
+        session.execute(insert(PlanSection), new_rows)
+
+def replace_section(session, plan_id, path, body):
+    """Replace the body of one section and record the result as the plan's next version.
+
+    The section's heading line is kept; body must not contain ``##``/``###``
+    headings of its own. Returns the new PlanVersion, or None if the section
+    does not exist (the caller commits).
+    """
+    from db.versioning import append_version, content_hash
+
+    if any(SECTION_HEADING.match(line) for line in body.splitlines()):
+        raise ValueError("Section body must not contain ## or ### headings; update each section separately.")
+
+    sections = load_sections(session, plan_id)
+    target = next((row for row in sections if row.path == path), None)
+    if target is None:
+        return None
+
+    heading = target.content.splitlines(keepends=True)[0] if path else ""
+    if body and not body.endswith("\n"):
+        body += "\n"
+    previous_content = compose(sections)
+    target.content = heading + body
+    target.content_hash = content_hash(target.content)
+    return append_version(session, plan_id, compose(sections), previous_content=previous_content)
@@ -0,0 +1,237 @@
+"""Delta-compressed storage for plan version history.
+
+Every ``KEYFRAME_INTERVAL``-th version of a plan is stored as a full keyframe;
+the versions in between store a line-level delta against their predecessor.
+Reconstructing any version therefore replays at most ``KEYFRAME_INTERVAL - 1``
+deltas on top of the nearest keyframe. Payloads are Brotli-compressed when the
+``brotli`` package is available and compression actually saves space.
+"""
+import difflib
+import hashlib
+import json
+from datetime import datetime, UTC
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from db.models import Plan, PlanVersion
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, fall back to uncompressed payloads
+    brotli = None
+
+# Maximum distance between two full keyframes (bounds reconstruction cost)
+KEYFRAME_INTERVAL = 20
+
+# Brotli quality used for payloads (0-11); above ~5 costs far more CPU for little gain on markdown
+BROTLI_QUALITY = 5
+
+
+# Payload encoding
+def _compress(raw):
+    """Return (codec, payload) for raw bytes, compressing only when it pays off."""
+    if brotli is not None:
+        compressed = brotli.compress(raw, quality=BROTLI_QUALITY)
+        if len(compressed) < len(raw):
+            return "br", compressed
+    return "raw", raw
+
+def _decompress(codec, payload):
+    """Decode a stored payload back into raw bytes."""
+    if codec == "raw":
+        return bytes(payload)
+    if codec == "br":
+        if brotli is None:
+            raise RuntimeError("Plan version is Brotli-compressed but the 'brotli' package is not installed.")
+        return brotli.decompress(payload)
+    raise ValueError(f"Unknown plan version codec '{codec}'.")
+
+def content_hash(content):
+    """Return the SHA-256 hex digest used to identify a version's content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# Line-level deltas
+def make_delta(old_content, new_content):
+    """Compute a compact line delta turning old_content into new_content.
+
+    The delta is a list of operations: ``["=", n]`` keeps n lines, ``["-", n]``
+    drops n lines and ``["+", [lines]]`` inserts lines.
+    """
+    old_lines = old_content.splitlines(keepends=True)
+    new_lines = new_content.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i2 - i1])
+            continue
+        if tag in ("delete", "replace"):
+            ops.append(["-", i2 - i1])
+        if tag in ("insert", "replace"):
+            ops.append(["+", new_lines[j1:j2]])
+    return ops
+
+def apply_delta(old_content, ops):
+    """Apply a delta produced by make_delta to old_content."""
+    old_lines = old_content.splitlines(keepends=True)
+    result = []
+    position = 0
+    for op, arg in ops:
+        if op == "=":
+            result.extend(old_lines[position:position + arg])
+            position += arg
+        elif op == "-":
+            position += arg
+        elif op == "+":
+            result.extend(arg)
+        else:
+            raise ValueError(f"Unknown delta operation '{op}'.")
+    return "".join(result)
+
+def is_keyframe(version_number):
+    """Return True if the given version number is stored as a full keyframe."""
+    return (version_number - 1) % KEYFRAME_INTERVAL == 0
+
+def encode_version(version_number, content, previous_content=None):
+    """Build the storage columns for a new version.
+
+    A keyframe is written on the periodic schedule, when there is no previous
+    version, or when the delta would not be smaller than the full content.
+    """
+    raw_full = content.encode("utf-8")
+    storage, raw = "full", raw_full
+    if previous_content is not None and not is_keyframe(version_number):
+        raw_delta = json.dumps(make_delta(previous_content, content), separators=(",", ":")).encode("utf-8")
+        if len(raw_delta) < len(raw_full):
+            storage, raw = "delta", raw_delta
+    codec, payload = _compress(raw)
+    return {
+        "version_number": version_number,
+        "storage": storage,
+        "codec": codec,
+        "payload": payload,
+        "content_hash": content_hash(content),
+        "content_length": len(content),
+    }
+
+def apply_version(content, storage, codec, payload):
+    """Return the content of a stored version given its predecessor's content."""
+    raw = _decompress(codec, payload).decode("utf-8")
+    if storage == "full":
+        return raw
+    if content is None:
+        raise ValueError("Delta chain does not start with a keyframe.")
+    return apply_delta(content, json.loads(raw))
+
+def decode_chain(rows):
+    """Reconstruct content from a keyframe row followed by its delta rows."""
+    content = None
+    for storage, codec, payload in rows:
+        content = apply_version(content, storage, codec, payload)
+    return content
+
+
+# Concurrency
+class VersionConflict(Exception):
+    """A save was based on an older version than the plan's latest one."""
+
+    def __init__(self, plan_id, base_version, latest_version):
+        super().__init__(f"Plan {plan_id} is at version {latest_version}, but the edit was based on version {base_version}.")
+        self.plan_id = plan_id
+        self.base_version = base_version
+        self.latest_version = latest_version
+
+def is_write_conflict(error):
+    """Return True if error means another writer got in first and the save can simply be retried."""
+    if isinstance(error, (StaleDataError, IntegrityError)):
+        return True
+    return isinstance(error, OperationalError) and "database is locked" in str(error)
+
+
+# Session-level API
+def latest_version_number(session, plan_id):
+    """Return the highest version number stored for a plan (0 if none)."""
+    latest = session.query(func.max(PlanVersion.version_number)).filter(PlanVersion.plan_id == plan_id).scalar()
+    return latest or 0
+
+def reconstruct(session, plan_id, version_number):
+    """Return the markdown content of a plan version, or None if it does not exist.
+
+    Loads the nearest keyframe at or before version_number plus the deltas up to
+    it in a single range query, so the replay cost is bounded by KEYFRAME_INTERVAL.
+    """
+    keyframe = (
+        session.query(func.max(PlanVersion.version_number))
+        .filter(
+            PlanVersion.plan_id == plan_id,
+            PlanVersion.storage == "full",
+            PlanVersion.version_number <= version_number,
+        )
+        .scalar()
+    )
+    if keyframe is None:
+        return None
+    rows = (
+        session.query(PlanVersion.version_number, PlanVersion.storage, PlanVersion.codec, PlanVersion.payload)
+        .filter(
+            PlanVersion.plan_id == plan_id,
+            PlanVersion.version_number >= keyframe,
+            PlanVersion.version_number <= version_number,
+        )
+        .order_by(PlanVersion.version_number)
+        .all()
+    )
+    if not rows or rows[-1].version_number != version_number:
+        return None
+    return decode_chain((row.storage, row.codec, row.payload) for row in rows)
+
+def append_version(session, plan_id, content, previous_content=None):
+    """Add the next version of a plan to the session (the caller commits).
+
+    Pass previous_content when the latest content is already known to skip
+    replaying the delta chain. The plan's lock_version is bumped in the same
+    flush, guarded by the value read here, so if another writer saved first
+    the flush raises StaleDataError (or the unique version number index
+    raises IntegrityError) instead of silently duplicating a version.
+    """
+    plan = session.get(Plan, plan_id)
+    if plan is None:
+        raise ValueError(f"Plan {plan_id} not found.")
+    previous_number = latest_version_number(session, plan_id)
+    version_number = previous_number + 1
+    if not previous_number or is_keyframe(version_number):
+        previous_content = None
+    elif previous_content is None:
+        previous_content = reconstruct(session, plan_id, previous_number)
+
+    version = PlanVersion(plan_id=plan_id, **encode_version(version_number, content, previous_content))
+    session.add(version)
+    plan.updated_at = datetime.now(UTC)
+    session.flush()
+
+    from db.search import index_version
+    from db.sections import sync_sections
+    index_version(session, version.id, plan.title, content)
+    sync_sections(session, plan_id, content)
+    return version
+
+def append_edit(session, plan_id, content, base_version=None, merge=None):
+    """append_version for an edit made against base_version (the caller commits).
+
+    If the plan has moved past base_version since the editor loaded it,
+    merge(base_content, latest_content, content) produces the content to save
+    (see scripts.plan_diff.merge_sections); without a merge hook the save is
+    refused with VersionConflict.
+    """
+    if base_version is not None:
+        latest = latest_version_number(session, plan_id)
+        if latest != base_version:
+            if merge is None or latest < base_version:
+                raise VersionConflict(plan_id, base_version, latest)
+            latest_content = reconstruct(session, plan_id, latest)
+            content = merge(reconstruct(session, plan_id, base_version), latest_content, content)
+            return append_version(session, plan_id, content, previous_content=latest_content)
+    return append_version(session, plan_id, content)
@@ -2,18 +2,138 @@ import click
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
-from db.query import create_user, authenticate_user, check_permission, list_plans, delete_plan, save_plan_version, list_plan_versions, rollback_plan, view_logs, delete_user
 
-from db.database_setup import init_db
+# Heavy modules (SQLAlchemy, werkzeug, bcrypt) and the database engine are only
+# loaded inside the commands that need them, so `--help` and argument errors stay fast.
+
+# Mirrors db.query.CATALOG_SORT_KEYS without importing the query layer
+PLAN_SORT_KEYS = ("id", "title", "type", "owner", "latest_version", "updated_at")
 
 @click.group()
-def cli():
+@click.option('--profile', type=click.Choice(['text', 'json']), default=None,
+              help="Print statement counts, database time and N+1 suspects to stderr after the command")
+@click.option('--profile-output', type=click.Path(dir_okay=False, writable=True), default=None,
+              help="Write the profile summary as JSON to this file")
+@click.option('--cprofile', 'cprofile_output', type=click.Path(dir_okay=False, writable=True), default=None,
+              help="Also capture a cProfile trace to this file (view with pstats or snakeviz)")
+@click.pass_context
+def cli(ctx, profile, profile_output, cprofile_output):
     """Command-line interface for managing DRP/IRP plans."""
-    pass
+    if profile or profile_output or cprofile_output:
+        _start_profiling(ctx, profile, profile_output, cprofile_output)
+
+def _start_profiling(ctx, profile, profile_output, cprofile_output):
+    """Instrument the rest of the command and report when it finishes."""
+    import json
+    from db.profiling import QueryProfiler
+
+    profiler = QueryProfiler().start()
+    trace = None
+    if cprofile_output:
+        import cProfile
+        trace = cProfile.Profile()
+        trace.enable()
+
+    def report():
+        if trace is not None:
+            trace.disable()
+            trace.dump_stats(cprofile_output)
+        profiler.stop()
+        summary = {"command": ctx.invoked_subcommand, **profiler.summary()}
+        if profile == 'json':
+            click.echo(json.dumps(summary, indent=2), err=True)
+        elif profile == 'text':
+            click.echo(profiler.format_summary(), err=True)
+        if profile_output:
+            with open(profile_output, "w", encoding="utf-8") as file:
+                json.dump(summary, file, indent=2)
+
+    ctx.call_on_close(report)
+
+# Commands that make no sense inside shell or run-batch
+_NESTED_COMMANDS = ("shell", "run-batch", "serve")
+
+# Commands that work on their own database connections or files, outside run-batch --transaction
+_OWN_CONNECTION_COMMANDS = ("init", "dump", "restore", "changes", "apply-changes", "backup", "restore-backup", "archive-logs")
+
+# Stands in for a PASSWORD left out on the command line (argv can never contain a NUL)
+_NO_PASSWORD = "\0"
+
+class _SessionCommand(click.Command):
+    """A command taking USERNAME [PASSWORD] ...: without PASSWORD the saved login session is used.
+
+    Click cannot skip a positional argument in the middle, so when exactly one
+    positional value is missing, PASSWORD is taken to be the one left out.
+    """
+
+    def parse_args(self, ctx, args):
+        params = self.get_params(ctx)
+        takes_value = {name for param in params if isinstance(param, click.Option) and not param.is_flag and not param.count
+                       for name in param.opts + param.secondary_opts}
+        positions, skip, only_positional = [], False, False
+        for index, token in enumerate(args):
+            if skip:
+                skip = False
+            elif not only_positional and token == "--":
+                only_positional = True
+            elif not only_positional and token.startswith("-") and token != "-":
+                skip = token in takes_value
+            else:
+                positions.append(index)
+        arguments = [param for param in params if isinstance(param, click.Argument)]
+        if len(positions) == len(arguments) - 1 and positions:
+            args = [*args[:positions[0] + 1], _NO_PASSWORD, *args[positions[0] + 1:]]
+        rest = super().parse_args(ctx, args)
+        if ctx.params.get("password") == _NO_PASSWORD:
+            ctx.params["password"] = None
+        return rest
+
+def _fail(message):
+    """Print why a command failed and exit with status 1, so scripts, shell and run-batch can tell."""
+    click.echo(message)
+    raise click.exceptions.Exit(1)
+
+def _run_command(args):
+    """Run one command line in this process, reusing its engine and session; return (ok, seconds)."""
+    import time
+    from db.database_setup import session
+    if args[0] in _NESTED_COMMANDS:
+        click.echo(f"'{args[0]}' cannot be run from a shell or batch.")
+        return False, 0.0
+
+    start = time.perf_counter()
+    ok = True
+    try:
+        ok = cli.main(args=args, prog_name="main.py", standalone_mode=False) in (None, 0)
+    except click.ClickException as e:
+        e.show()
+        ok = False
+    except click.Abort:
+        click.echo("Aborted!")
+        ok = False
+    except Exception as e:
+        session.rollback()
+        click.echo(f"Error: {e}")
+        ok = False
+    return ok, time.perf_counter() - start
+
+def _parse_command_lines(lines):
+    """Split command lines shell-style, skipping blanks and # comments; return [(line_number, args)]."""
+    import shlex
+    commands = []
+    for line_number, line in enumerate(lines, 1):
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as e:
+            raise click.UsageError(f"Line {line_number}: {e}")
+        if args:
+            commands.append((line_number, args))
+    return commands
 
 @cli.command()
 def init():
     """Initialize the database."""
+    from db.database_setup import init_db
     init_db()
     click.echo("Database initialized.")
 
@@ -23,84 +143,800 @@ def init():
 @click.option('--role', default='viewer', help="Role of the user (admin, approver, editor, viewer)")
 def add_user(username, password, role):
     """Add a new user with a specific role."""
-    create_user(username, password, role)
+    from db.query import create_user
+    if not create_user(username, password, role):
+        _fail(f"Creating user '{username}' failed.")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('users_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', type=int, default=None, help="Hashing processes (default: one per CPU)")
+@click.option('--chunk-size', type=int, default=500, show_default=True, help="Users inserted per statement")
+def import_users(username, password, users_file, workers, chunk_size):
+    """Create users in bulk from a CSV/JSON/YAML file (username, password, role)."""
+    import time
+    from db.query import authenticate_session, check_permission, import_users as import_user_records
+    from scripts.utils import load_records
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can import users.")
+
+    start = time.perf_counter()
+    report = import_user_records(load_records(users_file, list_key="users"), chunk_size=chunk_size, workers=workers)
+    elapsed = time.perf_counter() - start
+    for row_number, failed_user, reason in report["failed"]:
+        click.echo(f"Row {row_number} ({failed_user or '-'}): {reason}")
+    click.echo(f"Imported {len(report['created'])} users, {len(report['failed'])} failed, in {elapsed:.2f}s.")
 
 @cli.command()
 @click.argument('username')
 @click.argument('password')
 def login(username, password):
-    """Authenticate a user."""
-    user = authenticate_user(username, password)
+    """Authenticate a user and start a local login session."""
+    from db.query import login_user
+    user = login_user(username, password)
     if user:
         click.echo(f"Logged in as {user.username} (Role: {user.role})")
     else:
-        click.echo("Login failed. Invalid credentials.")
+        _fail("Login failed. Invalid credentials.")
 
 @cli.command()
+@click.option('--all', 'all_sessions', is_flag=True, help="Invalidate every session issued on this machine")
+def logout(all_sessions):
+    """End the local login session."""
+    from db.query import logout_user
+    claims = logout_user(all_sessions)
+    click.echo(f"Logged out {claims['usr']}." if claims else "No active session.")
+
+@cli.command(cls=_SessionCommand)
 @click.argument('username')
+@click.argument('password', required=False)
 @click.argument('title')
 @click.argument('plan_type')
 @click.argument('framework')
-def create_plan_cli(username, title, plan_type, framework):
+def create_plan_cli(username, password, title, plan_type, framework):
     """Create a new DRP or IRP plan."""
-    user = authenticate_user(username, "fake")  # Simulating login
+    from db.query import authenticate_session, check_permission, create_plan
+    user = authenticate_session(username, password)
     if not user:
-        click.echo("Authentication failed.")
-        return
+        _fail("Authentication failed.")
 
     if not check_permission(user, "editor"):
-        click.echo("Access denied: You do not have permission to create plans.")
-        return
+        _fail("Access denied: You do not have permission to create plans.")
+
+    if not create_plan(title, plan_type, username, framework):
+        _fail("Creating plan failed.")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('inventory', type=click.Path(exists=True, dir_okay=False))
+@click.option('--plan-type', type=click.Choice(['drp', 'irp']), default=None, help="Plan type for rows that do not set one")
+@click.option('--owner', default=None, help="Owner for rows that do not set one (defaults to USERNAME)")
+@click.option('--workers', type=int, default=None, help="Render processes (default: one per CPU)")
+def generate_bulk(username, password, inventory, plan_type, owner, workers):
+    """Generate and store plans for every system in a CSV/JSON/YAML inventory."""
+    import time
+    from db.query import authenticate_session, check_permission, create_plans_bulk
+    from scripts.template_engine import render_inventory, validate_inventory
+    from scripts.utils import load_records
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "editor"):
+        _fail("Access denied: You do not have permission to create plans.")
 
-    create_plan(title, plan_type, username, framework)
+    start = time.perf_counter()
+    rows = load_records(inventory, list_key="systems")
+    defaults = {"owner": owner or username}
+    if plan_type:
+        defaults["plan_type"] = plan_type
+    valid, failed = validate_inventory(rows, defaults)
+    for row_number, system_name, reason in failed:
+        click.echo(f"Row {row_number} ({system_name or '-'}): {reason}")
+    plan_ids = create_plans_bulk(render_inventory(valid, defaults, workers=workers)) if valid else []
+    elapsed = time.perf_counter() - start
+    click.echo(f"Generated {len(plan_ids)} of {len(rows)} plans, {len(failed)} failed, in {elapsed:.2f}s.")
 
 @cli.command()
-def list_plans_cli():
+@click.option('--type', 'plan_type', default=None, help="Only show plans of this type (drp, irp)")
+@click.option('--owner', default=None, help="Only show plans owned by this username")
+@click.option('--sort', 'sort_by', type=click.Choice(PLAN_SORT_KEYS), default='id', help="Column to sort by")
+@click.option('--desc', 'descending', is_flag=True, help="Sort in descending order")
+@click.option('--limit', type=int, default=None, help="Maximum number of plans to show")
+@click.option('--offset', type=int, default=0, help="Number of plans to skip")
+def list_plans_cli(plan_type, owner, sort_by, descending, limit, offset):
     """List all plans."""
-    list_plans()
+    from db.query import plan_catalog
+    shown = 0
+    for plan in plan_catalog(plan_type=plan_type, owner=owner, sort_by=sort_by, descending=descending, limit=limit, offset=offset):
+        click.echo(
+            f"Plan ID: {plan.id}, Title: {plan.title}, Type: {plan.plan_type}, Owner: {plan.owner or '[None]'}, "
+            f"Latest Version: {plan.latest_version or '-'}, Updated: {plan.updated_at}"
+        )
+        shown += 1
+    if not shown:
+        click.echo("No plans found.")
 
-@cli.command()
+@cli.command(cls=_SessionCommand)
 @click.argument('username')
+@click.argument('password', required=False)
 @click.argument('plan_id', type=int)
-def delete_plan_cli(username, plan_id):
+def delete_plan_cli(username, password, plan_id):
     """Delete a plan."""
-    user = authenticate_user(username, "fake")  # Simulating login
+    from db.query import authenticate_session, check_permission, delete_plan
+    user = authenticate_session(username, password)
     if not user:
-        click.echo("Authentication failed.")
-        return
+        _fail("Authentication failed.")
 
     if not check_permission(user, "admin"):
-        click.echo("Access denied: Only admins can delete plans.")
+        _fail("Access denied: Only admins can delete plans.")
+
+    if not delete_plan(plan_id):
+        _fail(f"Deleting plan {plan_id} failed.")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('plan_id', type=int)
+@click.argument('content')
+@click.option('--base-version', type=int, default=None, help="Version the edit started from; refuse to save if the plan has moved on")
+@click.option('--merge', is_flag=True, help="With --base-version, merge section by section with edits saved since")
+def save_plan_version_cli(username, password, plan_id, content, base_version, merge):
+    """Save new content as the next version of a plan."""
+    from db.query import authenticate_session, check_permission, save_plan_version
+    from scripts.plan_diff import merge_sections
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "editor"):
+        _fail("Access denied: You do not have permission to edit plans.")
+
+    version = save_plan_version(plan_id, content, base_version, merge_sections if merge else None)
+    if version:
+        click.echo(f"Saved version {version.version_number} of plan {plan_id}.")
+    else:
+        _fail("Saving version failed.")
+
+@cli.command()
+@click.argument('plan_id', type=int)
+def list_plan_versions_cli(plan_id):
+    """List all versions of a plan."""
+    from db.query import list_plan_versions
+    versions = list_plan_versions(plan_id)
+    if versions:
+        for version in versions:
+            click.echo(f"Version {version.version_number} - {version.created_at} ({version.content_length} chars)")
+    else:
+        click.echo("No versions found.")
+
+@cli.command()
+@click.argument('plan_id', type=int)
+@click.option('--version', 'version_number', type=int, default=None, help="Version to show (default: latest)")
+@click.option('--html', is_flag=True, help="Print the rendered HTML instead of the markdown")
+@click.option('--cache-stats', is_flag=True, help="Print content cache hits and misses to stderr")
+def view_plan(plan_id, version_number, html, cache_stats):
+    """Print the content of a plan version."""
+    from db.content_cache import get_cache
+    from db.query import get_plan_content
+    content = get_plan_content(plan_id, version_number, html=html)
+    if cache_stats:
+        stats = get_cache().stats()
+        click.echo(", ".join(f"{key}={value}" for key, value in stats.items()), err=True)
+    if content is None:
+        _fail("Plan version not found.")
+    click.echo(content, nl=False)
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('plan_id', type=int)
+@click.argument('version_number', type=int)
+def rollback_plan_cli(username, password, plan_id, version_number):
+    """Roll a plan back to an earlier version."""
+    from db.query import authenticate_session, check_permission, rollback_plan
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "editor"):
+        _fail("Access denied: You do not have permission to roll back plans.")
+
+    version = rollback_plan(plan_id, version_number)
+    if version:
+        click.echo(f"Plan {plan_id} rolled back to version {version_number} (now version {version.version_number}).")
+    else:
+        _fail("Rollback failed.")
+
+@cli.command()
+@click.option('--format', 'formats', multiple=True, type=click.Choice(['md', 'html', 'json', 'pdf']),
+              default=('md', 'html', 'pdf'), show_default=True, help="Output format (repeatable)")
+@click.option('--plan-id', 'plan_ids', multiple=True, type=int, help="Only export these plans (repeatable)")
+@click.option('--output-dir', default='outputs', show_default=True, help="Directory for exported files and the manifest")
+@click.option('--workers', type=int, default=None, help="PDF render processes (default: one per CPU)")
+@click.option('--force', is_flag=True, help="Rebuild every plan even if its latest version is unchanged")
+def export_plans_cli(formats, plan_ids, output_dir, workers, force):
+    """Export the latest version of each plan, rebuilding only changed plans."""
+    from scripts.export import export_plans
+    summary = export_plans(output_dir, formats, plan_ids=list(plan_ids) or None, workers=workers, force=force)
+    click.echo(f"Exported {len(summary['exported'])} plans, {len(summary['skipped'])} unchanged, "
+               f"{len(summary['errors'])} PDF errors.")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help="Rows per NDJSON line")
+def dump(username, password, output, chunk_size):
+    """Dump every table to NDJSON (compressed if OUTPUT ends in .gz or .br)."""
+    import time
+    from db.query import authenticate_session, check_permission
+    from db.dump import dump_database
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can dump the database.")
+
+    start = time.perf_counter()
+    counts = dump_database(output, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    click.echo(f"Dumped {total} rows to {output} in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/sec).")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('dump_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True, help="Delete existing rows before restoring")
+def restore(username, password, dump_file, replace):
+    """Restore the database from an NDJSON dump.
+
+    Requires an admin, except when the database has no users yet: the first
+    restore into a new database is how its users arrive.
+    """
+    import time
+    from db.query import authenticate_session, check_permission, has_users
+    from db.dump import restore_database
+    if has_users():
+        user = authenticate_session(username, password)
+        if not user:
+            _fail("Authentication failed.")
+
+        if not check_permission(user, "admin"):
+            _fail("Access denied: Only admins can restore the database.")
+    else:
+        click.echo("The database has no users yet; restoring without a login.")
+
+    start = time.perf_counter()
+    try:
+        counts = restore_database(dump_file, replace=replace)
+    except ValueError as e:
+        _fail(f"Restore failed: {e}")
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    click.echo(f"Restored {total} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/sec).")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.option('--since', type=int, default=0, show_default=True, help="Cursor of the last change already seen")
+@click.option('--limit', type=int, default=None, help="Stop after about this many changes (default: all)")
+@click.option('--table', 'tables', multiple=True, type=click.Choice(['users', 'plans', 'plan_versions', 'logs']),
+              help="Only these tables (repeatable)")
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None,
+              help="Write the changes as NDJSON for apply-changes (compressed if it ends in .gz or .br)")
+def changes(username, password, since, limit, tables, output):
+    """List the users, plans, versions and logs changed after a cursor."""
+    from itertools import islice
+    from db.changes import CHANGE_BATCH_SIZE, iter_changes, source_name, write_changes
+    from db.database_setup import get_engine
+    from db.query import authenticate_session, check_permission
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can read the change feed.")
+
+    batch_size = min(limit, CHANGE_BATCH_SIZE) if limit else CHANGE_BATCH_SIZE
+    engine = get_engine()
+    with engine.connect() as conn:
+        batches = iter_changes(conn, since, batch_size, list(tables) or None)
+        if limit:
+            batches = islice(batches, -(-limit // batch_size))
+        if output:
+            cursor, count = write_changes(output, batches, since, source_name(engine))
+            click.echo(f"Wrote {count} changes to {output}.")
+        else:
+            cursor, count = since, 0
+            for cursor, batch in batches:
+                for change in batch:
+                    click.echo(f"{change['seq']}\t{change['op']}\t{change['table']}\t{change['id']}")
+                count += len(batch)
+    click.echo(f"Next cursor: {cursor} ({count} changes).")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('target_url')
+@click.option('--input', 'input_file', type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Apply a file written by `changes --output` instead of reading this database's feed")
+@click.option('--interval', type=float, default=None, help="Keep running and sync every INTERVAL seconds")
+@click.option('--since', type=int, default=None,
+              help="Cursor to start from if the replica has no cursor for this source yet, e.g. the newest change "
+                   "in the backup it was cloned from (default: the whole feed)")
+def apply_changes(username, password, target_url, input_file, interval, since):
+    """Bring the replica database at TARGET_URL up to date with the change feed."""
+    import time
+    from db import changes as feed
+    from db.database_setup import create_db_engine
+    from db.query import authenticate_session, check_permission
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can sync replicas.")
+
+    target = create_db_engine(target_url)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                if input_file:
+                    header, batches = feed.read_change_file(input_file)
+                    cursor, counts = feed.apply_changes(target, header.get("source") or input_file, batches, since)
+                else:
+                    cursor, counts = feed.sync_replica(target, since=since)
+            except ValueError as e:
+                _fail(f"Sync failed: {e}")
+            applied = ", ".join(f"{count} {table}" for table, count in sorted(counts.items())) or "no changes"
+            click.echo(f"Replica at cursor {cursor}: applied {applied} in {time.perf_counter() - start:.2f}s.")
+            if interval is None or input_file:
+                return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        click.echo("Stopped replica sync.")
+    finally:
+        target.dispose()
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.option('--dir', 'backup_dir', default=None, help="Snapshot directory (default: BACKUP_DIR)")
+@click.option('--compression', type=click.Choice(['gz', 'br', 'none']), default=None, help="Default: BACKUP_COMPRESSION")
+@click.option('--interval', type=float, default=None, help="Keep running and take a snapshot every INTERVAL seconds")
+@click.option('--keep-last', type=int, default=None, help="Snapshots always kept (default: BACKUP_KEEP_LAST)")
+@click.option('--keep-daily', type=int, default=None, help="Days with one snapshot kept each (default: BACKUP_KEEP_DAILY)")
+@click.option('--no-prune', is_flag=True, help="Keep every snapshot")
+def backup(username, password, backup_dir, compression, interval, keep_last, keep_daily, no_prune):
+    """Take an online, compressed snapshot of the SQLite database, then apply retention."""
+    import time
+    from db import backup as backups
+    from db.query import authenticate_session, check_permission
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can back up the database.")
+
+    keep_last = backups.BACKUP_KEEP_LAST if keep_last is None else keep_last
+    keep_daily = backups.BACKUP_KEEP_DAILY if keep_daily is None else keep_daily
+    try:
+        while True:
+            try:
+                metadata = backups.create_backup(backup_dir=backup_dir, compression=compression)
+            except (NotImplementedError, FileNotFoundError, ValueError) as e:
+                _fail(f"Backup failed: {e}")
+            click.echo(f"Snapshot {metadata['file']}: {metadata['database_bytes']} -> {metadata['backup_bytes']} bytes "
+                       f"in {metadata['total_seconds']:.2f}s (copy {metadata['copy_seconds']:.2f}s).")
+            if not no_prune:
+                removed = backups.prune_backups(backup_dir, keep_last, keep_daily)
+                if removed:
+                    click.echo(f"Pruned {len(removed)} old snapshots.")
+            if interval is None:
+                return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        click.echo("Stopped scheduled backups.")
+
+@cli.command()
+@click.option('--dir', 'backup_dir', default=None, help="Snapshot directory (default: BACKUP_DIR)")
+def list_backups(backup_dir):
+    """List database snapshots, oldest first."""
+    from db.backup import list_backups as list_snapshots
+    snapshots = list_snapshots(backup_dir)
+    for metadata in snapshots:
+        click.echo(f"{metadata['path']}  {metadata['created_at']}  {metadata['backup_bytes']} bytes  "
+                   f"schema v{metadata['schema_version']}")
+    if not snapshots:
+        click.echo("No snapshots found.")
+
+@cli.command()
+@click.argument('snapshot', type=click.Path(exists=True, dir_okay=False))
+@click.option('--quick', is_flag=True, help="Run PRAGMA quick_check instead of the full integrity_check")
+def verify_backup(snapshot, quick):
+    """Check a snapshot's checksum and SQLite integrity."""
+    import time
+    from db.backup import verify_backup as verify_snapshot
+    start = time.perf_counter()
+    problems = verify_snapshot(snapshot, quick=quick)
+    elapsed = time.perf_counter() - start
+    if problems:
+        for problem in problems:
+            click.echo(f"  {problem}")
+        _fail(f"Snapshot {snapshot} is damaged.")
+    click.echo(f"Snapshot {snapshot} is sound ({elapsed:.2f}s).")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('snapshot', type=click.Path(exists=True, dir_okay=False))
+@click.option('--no-safety-snapshot', is_flag=True, help="Do not snapshot the current database first")
+@click.confirmation_option(prompt="Replace the current database with this snapshot?")
+def restore_backup(username, password, snapshot, no_safety_snapshot):
+    """Verify a snapshot and restore it over the current SQLite database."""
+    from db.backup import restore_backup as restore_snapshot
+    from db.database_setup import session
+    from db.query import authenticate_session, check_permission
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can restore the database.")
+
+    # Release the session's connection before the file underneath it is replaced
+    session.close()
+    try:
+        safety = restore_snapshot(snapshot, snapshot_first=not no_safety_snapshot)
+    except (NotImplementedError, ValueError) as e:
+        _fail(f"Restore failed: {e}")
+    if safety:
+        click.echo(f"Saved the previous database as {safety['file']}.")
+    click.echo(f"Restored the database from {snapshot}.")
+
+@cli.command()
+@click.argument('plan_id', type=int)
+def list_sections(plan_id):
+    """List the sections of a plan's latest content."""
+    from db.query import list_plan_sections
+    sections = list_plan_sections(plan_id)
+    if not sections:
+        click.echo("No sections found.")
+        return
+    for path, level, length in sections:
+        click.echo(f"{'  ' * max(level - 2, 0)}{path or '(preamble)'} ({length} chars)")
+
+@cli.command()
+@click.argument('plan_id', type=int)
+@click.argument('path')
+def get_section(plan_id, path):
+    """Print one section of a plan by heading path (e.g. "Key Contacts and Roles")."""
+    from db.query import get_plan_section
+    content = get_plan_section(plan_id, path)
+    if content is None:
+        _fail(f"Section '{path}' not found.")
+    click.echo(content, nl=False)
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.argument('plan_id', type=int)
+@click.argument('path')
+@click.argument('body_file', type=click.File('r'))
+def update_section(username, password, plan_id, path, body_file):
+    """Replace the body of one plan section with the contents of BODY_FILE ('-' for stdin)."""
+    from db.query import authenticate_session, check_permission, update_plan_section
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "editor"):
+        _fail("Access denied: You do not have permission to edit plans.")
+
+    version = update_plan_section(plan_id, path, body_file.read())
+    if version:
+        click.echo(f"Updated section '{path}' of plan {plan_id} (version {version.version_number}).")
+    else:
+        _fail("Section update failed.")
+
+@cli.command()
+@click.argument('plan_id', type=int)
+@click.argument('from_version', type=int)
+@click.argument('to_version', type=int)
+@click.option('--context', type=int, default=3, show_default=True, help="Unchanged lines shown around each change")
+def diff_plan(plan_id, from_version, to_version, context):
+    """Show what changed between two versions of a plan, section by section."""
+    from db.query import diff_plan_versions
+    diffs = diff_plan_versions(plan_id, from_version, to_version, context)
+    if diffs is None:
+        _fail("Diff failed: version not found.")
+    if not diffs:
+        click.echo("No differences.")
+        return
+    for section in diffs:
+        click.echo(f"=== {section.path or '(preamble)'} [{section.status}]")
+        for line in section.lines:
+            click.echo(line)
+
+@cli.command()
+@click.argument('query', required=False)
+@click.option('--type', 'plan_type', type=click.Choice(['drp', 'irp']), default=None, help="Only search plans of this type")
+@click.option('--latest', 'latest_only', is_flag=True, help="Only match the latest version of each plan")
+@click.option('--limit', type=int, default=20, show_default=True, help="Maximum number of results")
+@click.option('--raw', is_flag=True, help="Pass QUERY to FTS5 unchanged (phrases, OR, NEAR, prefix*)")
+@click.option('--rebuild', is_flag=True, help="Rebuild the search index from stored versions first")
+def search(query, plan_type, latest_only, limit, raw, rebuild):
+    """Search plan titles and content, best matches first."""
+    from db.database_setup import session
+    from db.query import search_plans
+    from db.search import rebuild_index
+    if rebuild:
+        indexed = rebuild_index(session.connection())
+        session.commit()
+        click.echo(f"Indexed {indexed} plan versions.")
+    if not query:
+        return
+
+    try:
+        results = search_plans(query, plan_type=plan_type, latest_only=latest_only, limit=limit, raw=raw)
+    except NotImplementedError as e:
+        _fail(str(e))
+    for result in results:
+        click.echo(f"Plan {result.plan_id} v{result.version_number} [{result.plan_type}] {result.title}: {result.snippet}")
+    if not results:
+        click.echo("No matches found.")
+
+@cli.command()
+@click.option('--framework', default=None, help="Check every plan against this catalog (default: each plan's own framework)")
+@click.option('--plan-id', 'plan_ids', multiple=True, type=int, help="Only check these plans (repeatable)")
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None,
+              help="Write the plan x control matrix to this file (.csv, or .json for the full report)")
+@click.option('--missing', 'show_missing', is_flag=True, help="List the missing controls of each plan")
+@click.option('--force', is_flag=True, help="Rescan every plan even if its content was checked before")
+def coverage(framework, plan_ids, output, show_missing, force):
+    """Check the latest version of each plan against its compliance control catalog."""
+    from db.compliance import write_matrix
+    from db.query import plan_coverage
+    report = plan_coverage(framework=framework, plan_ids=list(plan_ids) or None, force=force)
+    if report is None:
+        _fail("Coverage check failed. See the log for details.")
+
+    for plan in report["plans"]:
+        line = f"Plan {plan['plan_id']} [{plan['framework']}] {plan['title']}: {len(plan['hits'])}/{len(plan['applicable'])} controls"
+        if show_missing and plan["missing"]:
+            line += f" (missing {', '.join(plan['missing'])})"
+        click.echo(line)
+    if output:
+        click.echo(f"Coverage matrix written to {write_matrix(report, output)}")
+    click.echo(f"Checked {len(report['plans'])} plans: {report['scanned']} scanned, {report['cached']} from cache, "
+               f"{len(report['skipped'])} skipped (no framework or catalog).")
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help="Interface to bind")
+@click.option('--port', type=int, default=8000, show_default=True, help="Port to listen on")
+@click.option('--workers', type=int, default=1, show_default=True, help="Worker processes")
+def serve(host, port, workers):
+    """Run the async HTTP API server."""
+    import uvicorn
+    uvicorn.run("api.app:create_app", factory=True, host=host, port=port, workers=workers, log_level="warning")
+
+@cli.command()
+@click.option('--clear', is_flag=True, help="Delete every cached entry")
+def content_cache(clear):
+    """Show (or clear) the on-disk plan content cache set by CONTENT_CACHE_PATH."""
+    from db.content_cache import get_cache
+    cache = get_cache()
+    if not cache.path:
+        click.echo("CONTENT_CACHE_PATH is not set; plan content is only cached for the life of each command.")
         return
+    if clear:
+        cache.clear()
+        cache.save()
+        click.echo(f"Cleared {cache.path}.")
+        return
+    stats = cache.stats()
+    click.echo(f"{cache.path}: {stats['entries']} versions, {stats['bytes']} bytes "
+               f"(limits {cache.max_entries} versions, {cache.max_bytes} bytes).")
+
+@cli.command()
+@click.option('--user', 'username', default=None, help="Log in once as this user before the first command")
+@click.option('--timings', is_flag=True, help="Print how long each command took")
+def shell(username, timings):
+    """Run commands interactively in one process with a warm engine and session."""
+    try:
+        import readline  # noqa: F401  (line editing and history for input())
+    except ImportError:
+        pass
+    from db.database_setup import get_engine
+    from db.query import login_user
+    get_engine()
+    if username:
+        user = login_user(username, click.prompt("Password", hide_input=True))
+        if not user:
+            _fail("Login failed. Invalid credentials.")
+        click.echo(f"Logged in as {user.username} (Role: {user.role})")
+
+    click.echo("Enter commands as you would after 'main.py' ('help' lists them, 'exit' quits).")
+    while True:
+        try:
+            line = input(f"{username or 'drir'}> ")
+        except EOFError:
+            click.echo()
+            break
+        except KeyboardInterrupt:
+            click.echo()
+            continue
+        try:
+            commands = _parse_command_lines([line])
+        except click.UsageError as e:
+            click.echo(e.message)
+            continue
+        if not commands:
+            continue
+        args = commands[0][1]
+        if args[0] in ("exit", "quit"):
+            break
+        ok, elapsed = _run_command(["--help"] if args[0] == "help" else args)
+        if timings:
+            click.echo(f"({elapsed * 1000:.1f} ms{'' if ok else ', failed'})", err=True)
 
-    delete_plan(plan_id)
+@cli.command()
+@click.argument('batch_file', type=click.File('r'))
+@click.option('--transaction', is_flag=True, help="Run everything in one database transaction, rolled back if any command fails")
+@click.option('--stop-on-error', is_flag=True, help="Stop at the first failing command (implied by --transaction)")
+@click.option('--timings/--no-timings', default=True, show_default=True, help="Print per-command timings to stderr")
+def run_batch(batch_file, transaction, stop_on_error, timings):
+    """Run a file of commands (one per line, as after 'main.py'; '-' for stdin) in one process."""
+    import time
+    from contextlib import nullcontext
+    from db.database_setup import get_engine, single_transaction
+
+    commands = _parse_command_lines(batch_file)
+    if transaction:
+        for line_number, args in commands:
+            if args[0] in _OWN_CONNECTION_COMMANDS:
+                raise click.UsageError(f"Line {line_number}: '{args[0]}' uses its own database connection "
+                                       "and cannot run under --transaction.")
+    get_engine()
+    results = []
+    error = None
+    start = time.perf_counter()
+    try:
+        with single_transaction() if transaction else nullcontext():
+            for line_number, args in commands:
+                ok, elapsed = _run_command(args)
+                results.append((line_number, args[0], ok, elapsed))
+                if not ok and (transaction or stop_on_error):
+                    break
+            failed = [line_number for line_number, _, ok, _ in results if not ok]
+            if failed and transaction:
+                raise click.ClickException(f"Command on line {failed[0]} failed; rolled back the whole batch.")
+    except click.ClickException as e:
+        error = e
+    total = time.perf_counter() - start
+
+    if timings:
+        for line_number, name, ok, elapsed in results:
+            click.echo(f"{line_number:5d}  {name:28} {elapsed * 1000:10.1f} ms  {'ok' if ok else 'FAILED'}", err=True)
+        click.echo(f"{len(results)} commands in {total * 1000:.1f} ms, {len(failed)} failed.", err=True)
+    if error:
+        raise error
+    if failed:
+        sys.exit(1)
 
 @cli.command()
 @click.argument('username')
 def delete_user_cli(username):
     """Delete a user by their username."""
-    delete_user(username)
+    from db.query import delete_user
+    if not delete_user(username):
+        _fail(f"Deleting user '{username}' failed.")
 
-@cli.command()
+@cli.command(cls=_SessionCommand)
 @click.argument('username')
-@click.argument('password')
-def view_logs_cli(username, password):
-    """View logs of actions taken."""
-    user = authenticate_user(username, password)
+@click.argument('password', required=False)
+@click.option('--older-than', 'older_than_days', type=int, default=None,
+              help="Archive logs older than this many days (default: LOG_RETENTION_DAYS)")
+@click.option('--archive-dir', default=None, help="Directory for archive segments (default: LOG_ARCHIVE_DIR)")
+def archive_logs(username, password, older_than_days, archive_dir):
+    """Move old audit logs into compressed archive segments."""
+    from db.query import archive_old_logs, authenticate_session, check_permission
+    user = authenticate_session(username, password)
     if not user:
-        click.echo("Authentication failed.")
-        return
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can archive logs.")
+
+    result = archive_old_logs(older_than_days, archive_dir)
+    if result is None:
+        _fail("Log archival failed.")
+    segments, rows = result
+    click.echo(f"Archived {rows} logs into {segments} segments.")
+
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.option('--since', type=click.DateTime(['%Y-%m-%d']), default=None, help="First day to include (UTC)")
+@click.option('--until', type=click.DateTime(['%Y-%m-%d']), default=None, help="Day after the last one to include (UTC)")
+@click.option('--user', 'log_user', default=None, help="Only count logs for this username")
+@click.option('--action', 'action_prefix', default=None, help="Only count actions starting with this text")
+@click.option('--by', 'group_by', multiple=True, type=click.Choice(['day', 'user', 'action']),
+              default=('user', 'action'), show_default=True, help="Group totals by (repeatable)")
+@click.option('--rebuild', is_flag=True, help="Recompute the rollups from hot and archived logs first")
+def log_report(username, password, since, until, log_user, action_prefix, group_by, rebuild):
+    """Summarize audit activity from the daily rollups."""
+    from db.query import authenticate_session, check_permission, get_user_by_username, log_report
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
 
     if not check_permission(user, "admin"):
-        click.echo("Access denied: Only admins can view logs.")
+        _fail("Access denied: Only admins can view logs.")
+
+    user_id = None
+    if log_user:
+        target = get_user_by_username(log_user)
+        if not target:
+            _fail(f"User '{log_user}' not found.")
+        user_id = target.id
+
+    rows = log_report(since=since.date() if since else None, until=until.date() if until else None,
+                      user_id=user_id, action_prefix=action_prefix, group_by=group_by, rebuild=rebuild)
+    if not rows:
+        click.echo("No activity found.")
         return
+    for row in rows:
+        click.echo(" | ".join(str(value) for value in row[:-1]) + f": {row.total}")
 
-    logs = view_logs(user)
-    if logs:
-        for log in logs:
-            click.echo(f"{log.timestamp} - {log.action}")
-    else:
+@cli.command(cls=_SessionCommand)
+@click.argument('username')
+@click.argument('password', required=False)
+@click.option('--user', 'log_user', default=None, help="Only show logs for this username")
+@click.option('--action', 'action_prefix', default=None, help="Only show actions starting with this text")
+@click.option('--since', type=click.DateTime(), default=None, help="Only show logs at or after this time (UTC)")
+@click.option('--until', type=click.DateTime(), default=None, help="Only show logs before this time (UTC)")
+@click.option('--limit', type=int, default=None, help="Maximum number of logs to show")
+@click.option('--after-id', type=int, default=None, help="Resume after this log ID (keyset pagination)")
+def view_logs_cli(username, password, log_user, action_prefix, since, until, limit, after_id):
+    """View logs of actions taken."""
+    from db.query import authenticate_session, check_permission, get_user_by_username, view_logs
+    user = authenticate_session(username, password)
+    if not user:
+        _fail("Authentication failed.")
+
+    if not check_permission(user, "admin"):
+        _fail("Access denied: Only admins can view logs.")
+
+    user_id = None
+    if log_user:
+        target = get_user_by_username(log_user)
+        if not target:
+            _fail(f"User '{log_user}' not found.")
+        user_id = target.id
+
+    last_id = None
+    shown = 0
+    for log in view_logs(user_id=user_id, action_prefix=action_prefix, since=since, until=until, after_id=after_id, limit=limit):
+        click.echo(f"[{log.id}] {log.timestamp} - {log.action}")
+        last_id = log.id
+        shown += 1
+
+    if not shown:
         click.echo("No logs found.")
+    elif limit is not None and shown == limit:
+        click.echo(f"More logs may be available: use --after-id {last_id}")
 
 if __name__ == "__main__":
     cli()
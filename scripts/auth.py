@@ -4,16 +4,8 @@ import os
 # Add the project root to sys.path to resolve module imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-import bcrypt
-from sqlalchemy.orm import sessionmaker
 from db.models import User
-from db.database_setup import DATABASE_URL
-from sqlalchemy import create_engine
-
-# Set up database connection
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-session = Session()
+from db.database_setup import session  # Shared engine and thread-local session
 
 # Role hierarchy for access control
 ROLE_HIERARCHY = {
@@ -23,13 +15,24 @@ ROLE_HIERARCHY = {
     "viewer": 0     # Read-only access
 }
 
+# Password hashing backend shared by db/query.py and this module.
+# New hashes use werkzeug (scrypt by default, override with PASSWORD_HASH_METHOD);
+# bcrypt hashes created by earlier versions of this module still verify.
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
 def hash_password(password):
-    """Hashes a password using bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """Hashes a password with the configured werkzeug method."""
+    from werkzeug.security import generate_password_hash
+    method = os.getenv("PASSWORD_HASH_METHOD")
+    return generate_password_hash(password, method=method) if method else generate_password_hash(password)
 
 def verify_password(password, hashed_password):
-    """Verifies a password against the stored hash."""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    """Verifies a password against the stored hash (werkzeug or legacy bcrypt)."""
+    if hashed_password.startswith(BCRYPT_PREFIXES):
+        import bcrypt
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    from werkzeug.security import check_password_hash
+    return check_password_hash(hashed_password, password)
 
 def check_permission(user, required_role):
     """Checks if a user has the required role to perform an action."""
@@ -0,0 +1,195 @@
+"""Incremental Markdown/HTML/JSON/PDF export of the latest plan versions.
+
+Markdown is converted to HTML once per exported version in the parent process
+and kept in the content cache (db/content_cache.py) with the version's text.
+PDF rendering, the slow step, is fanned out over a process pool whose workers
+parse the export stylesheet and font configuration once at start-up. A
+``manifest.json`` in the output directory records the content hash each plan
+was exported from, so re-running an export only rebuilds plans whose latest
+``PlanVersion`` changed.
+"""
+import html
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+EXPORT_FORMATS = ("md", "html", "json", "pdf")
+DEFAULT_OUTPUT_DIR = "outputs"
+MANIFEST_NAME = "manifest.json"
+STYLESHEET_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "export.css")
+
+_MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]
+
+
+# HTML rendering
+def markdown_to_html(content):
+    """Convert plan markdown to an HTML fragment."""
+    import markdown
+    return markdown.markdown(content, extensions=_MARKDOWN_EXTENSIONS)
+
+def wrap_html(title, body, stylesheet=None):
+    """Wrap an HTML fragment in a standalone document, optionally with inline CSS."""
+    style = f"<style>\n{stylesheet}\n</style>\n" if stylesheet else ""
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{html.escape(title)}</title>\n{style}</head>\n<body>\n"
+        f"{body}\n</body>\n</html>\n"
+    )
+
+def load_stylesheet(path=STYLESHEET_PATH):
+    """Return the export stylesheet text (empty if it is missing)."""
+    if not os.path.exists(path):
+        return ""
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+
+# PDF workers
+_pdf_stylesheets = None
+_pdf_font_config = None
+
+def _init_pdf_worker(stylesheet_path):
+    """Parse the stylesheet and build the font configuration once per worker process."""
+    global _pdf_stylesheets, _pdf_font_config
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+    _pdf_font_config = FontConfiguration()
+    _pdf_stylesheets = [CSS(filename=stylesheet_path, font_config=_pdf_font_config)] if os.path.exists(stylesheet_path) else []
+
+def _render_pdf(job):
+    """Render one HTML document to PDF using the worker's cached stylesheet and fonts."""
+    from weasyprint import HTML
+    plan_id, html_document, target = job
+    try:
+        HTML(string=html_document).write_pdf(target, stylesheets=_pdf_stylesheets, font_config=_pdf_font_config)
+        return plan_id, None
+    except Exception as e:
+        return plan_id, str(e)
+
+def pdf_available():
+    """Return True if WeasyPrint and its native libraries can be loaded."""
+    try:
+        import weasyprint  # noqa: F401
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+# Manifest
+def load_manifest(output_dir):
+    """Load the export manifest, or an empty one if none exists yet."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"plans": {}}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+def save_manifest(output_dir, manifest):
+    """Atomically write the export manifest."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+def _is_current(entry, version, formats, output_dir):
+    """Return True if a manifest entry already covers this version in every requested format."""
+    if not entry or entry.get("content_hash") != version.content_hash:
+        return False
+    files = entry.get("files", {})
+    return all(fmt in files and os.path.exists(os.path.join(output_dir, files[fmt])) for fmt in formats)
+
+
+# Export
+def export_plans(output_dir=DEFAULT_OUTPUT_DIR, formats=("md", "html", "pdf"), plan_ids=None, workers=None, force=False):
+    """Export the latest version of each plan, skipping plans unchanged since the last run.
+
+    Returns a summary dict with the exported and skipped plan IDs and any PDF errors.
+    """
+    from db.content_cache import plan_content
+    from db.database_setup import session
+    from db.query import latest_plan_versions
+
+    formats = [fmt for fmt in EXPORT_FORMATS if fmt in formats]
+    if "pdf" in formats and not pdf_available():
+        logging.error("PDF export requires WeasyPrint and its system libraries. Skipping PDF output.")
+        formats.remove("pdf")
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    summary = {"exported": [], "skipped": [], "errors": {}}
+    stylesheet = load_stylesheet() if "html" in formats else ""
+
+    versions = list(latest_plan_versions(plan_ids))
+    pdf_jobs = []
+    for version in versions:
+        key = str(version.plan_id)
+        if not force and _is_current(manifest["plans"].get(key), version, formats, output_dir):
+            summary["skipped"].append(version.plan_id)
+            continue
+
+        rendered = "html" in formats or "pdf" in formats
+        entry = plan_content(session, version.plan_id, version.version_number, version.content_hash, html=rendered)
+        content = entry.content
+        os.makedirs(os.path.join(output_dir, version.plan_type), exist_ok=True)
+        base_name = f"plan_{version.plan_id}"
+        files = {}
+
+        if "md" in formats:
+            files["md"] = _write(output_dir, version.plan_type, f"{base_name}.md", content)
+        if "json" in formats:
+            document = {
+                "id": version.plan_id,
+                "title": version.title,
+                "plan_type": version.plan_type,
+                "version": version.version_number,
+                "content_hash": version.content_hash,
+                "content": content,
+            }
+            files["json"] = _write(output_dir, version.plan_type, f"{base_name}.json", json.dumps(document, indent=2))
+        if rendered:
+            body = entry.html
+            if "html" in formats:
+                html_document = wrap_html(version.title, body, stylesheet)
+                files["html"] = _write(output_dir, version.plan_type, f"{base_name}.html", html_document)
+            if "pdf" in formats:
+                # PDF workers apply their cached stylesheet, so no inline CSS here
+                files["pdf"] = os.path.join(version.plan_type, f"{base_name}.pdf")
+                pdf_jobs.append((version.plan_id, wrap_html(version.title, body), os.path.join(output_dir, files["pdf"])))
+
+        manifest["plans"][key] = {
+            "title": version.title,
+            "version_number": version.version_number,
+            "content_hash": version.content_hash,
+            "files": files,
+        }
+        summary["exported"].append(version.plan_id)
+
+    for plan_id, error in _run_pdf_jobs(pdf_jobs, workers):
+        if error:
+            logging.error(f"PDF export of plan {plan_id} failed: {error}")
+            summary["errors"][plan_id] = error
+            # Force a rebuild next time
+            manifest["plans"][str(plan_id)]["content_hash"] = None
+
+    save_manifest(output_dir, manifest)
+    logging.info(f"Exported {len(summary['exported'])} plans, {len(summary['skipped'])} unchanged.")
+    return summary
+
+def _write(output_dir, plan_type, file_name, text):
+    """Write an export file and return its path relative to the output directory."""
+    relative_path = os.path.join(plan_type, file_name)
+    with open(os.path.join(output_dir, relative_path), "w", encoding="utf-8") as file:
+        file.write(text)
+    return relative_path
+
+def _run_pdf_jobs(jobs, workers):
+    """Render PDF jobs in-process for a single job, otherwise across a process pool."""
+    if not jobs:
+        return []
+    if workers == 1 or len(jobs) == 1:
+        _init_pdf_worker(STYLESHEET_PATH)
+        return [_render_pdf(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker, initargs=(STYLESHEET_PATH,)) as executor:
+        return list(executor.map(_render_pdf, jobs, chunksize=4))
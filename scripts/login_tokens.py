@@ -0,0 +1,139 @@
+"""Signed, expiring local login sessions for the CLI.
+
+``login`` stores an HMAC-signed token in the user's config directory. Later
+commands that are not given a password validate the token with a single HMAC
+instead of re-running the slow password hash. The token holds nothing derived
+from the password itself, so reading the config directory does not allow
+guessing passwords faster than the stored hash does. Tokens are bound to a
+fingerprint of the stored password hash, so changing a password invalidates
+existing sessions.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+SESSION_FILE = "session"
+SECRET_FILE = "secret_key"
+REVOKED_FILE = "revoked"
+
+def config_dir():
+    """Return the directory holding the session token and signing key."""
+    base = os.getenv("DRIR_CONFIG_DIR")
+    if base:
+        return base
+    return os.path.join(os.getenv("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config"), "dr_ir_generation")
+
+def session_ttl():
+    """Return the lifetime of a login session in seconds."""
+    return int(os.getenv("LOGIN_SESSION_TTL", str(8 * 60 * 60)))
+
+def _path(name):
+    return os.path.join(config_dir(), name)
+
+def _write_private(name, data):
+    """Write a file readable only by the current user."""
+    os.makedirs(config_dir(), mode=0o700, exist_ok=True)
+    fd = os.open(_path(name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+
+def _secret_key():
+    """Load the local signing key, creating it on first use."""
+    try:
+        with open(_path(SECRET_FILE), "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        key = secrets.token_bytes(32)
+        _write_private(SECRET_FILE, key)
+        return key
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _mac(key, message):
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def hash_fingerprint(password_hash):
+    """Return a short fingerprint of a stored password hash."""
+    return hashlib.sha256(password_hash.encode("utf-8")).hexdigest()[:16]
+
+
+# Tokens
+def sign_claims(claims):
+    """Return a signed token carrying claims."""
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_mac(_secret_key(), payload)}"
+
+def verify_token(token):
+    """Return the claims of an authentic, unexpired token, or None."""
+    try:
+        payload, signature = token.split(".")
+    except ValueError:
+        return None
+    if not hmac.compare_digest(_mac(_secret_key(), payload), signature):
+        return None
+    claims = json.loads(_b64decode(payload))
+    if claims["exp"] <= time.time():
+        return None
+    return claims
+
+def issue_session(user):
+    """Create and store a signed session for an already authenticated user; return its claims."""
+    now = int(time.time())
+    claims = {
+        "uid": user.id,
+        "usr": user.username,
+        "iat": now,
+        "exp": now + session_ttl(),
+        "jti": secrets.token_hex(8),
+        "pwh": hash_fingerprint(user.password_hash),
+    }
+    _write_private(SESSION_FILE, sign_claims(claims).encode("ascii"))
+    return claims
+
+def _revoked():
+    """Return the set of revoked token IDs that have not expired yet."""
+    try:
+        with open(_path(REVOKED_FILE), encoding="utf-8") as file:
+            entries = [line.split() for line in file if line.strip()]
+    except FileNotFoundError:
+        return {}
+    now = time.time()
+    return {jti: int(exp) for jti, exp in entries if int(exp) > now}
+
+def load_session():
+    """Return the claims of the stored session if it is authentic, unexpired and not revoked."""
+    try:
+        with open(_path(SESSION_FILE), encoding="ascii") as file:
+            claims = verify_token(file.read().strip())
+    except FileNotFoundError:
+        return None
+    if claims is None or claims["jti"] in _revoked():
+        return None
+    return claims
+
+def session_matches(claims, password_hash):
+    """Check that a session was issued for the user's current password hash."""
+    return hmac.compare_digest(claims["pwh"], hash_fingerprint(password_hash))
+
+def revoke_session(all_sessions=False):
+    """Log out: revoke the stored session, or every session by rotating the signing key."""
+    claims = load_session()
+    if all_sessions:
+        _write_private(SECRET_FILE, secrets.token_bytes(32))
+    elif claims:
+        revoked = _revoked()
+        revoked[claims["jti"]] = claims["exp"]
+        _write_private(REVOKED_FILE, "".join(f"{jti} {exp}\n" for jti, exp in revoked.items()).encode("utf-8"))
+    try:
+        os.remove(_path(SESSION_FILE))
+    except FileNotFoundError:
+        pass
+    return claims
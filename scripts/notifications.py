@@ -0,0 +1,232 @@
+"""Pooled, queued email notifications over SMTP.
+
+``NotificationDispatcher`` keeps ``pool_size`` worker threads, each holding one
+persistent SMTP connection (connect, STARTTLS and login happen once, not per
+message). ``submit`` only queues the message; a worker takes every message
+waiting (up to ``batch_size``) and sends them back to back over its connection.
+Transient failures (dropped connections, 4xx replies) are retried with
+exponential backoff on a fresh connection; permanent 5xx rejections are not.
+Settings come from the ``SMTP_*`` keys in ``.env``.
+"""
+import atexit
+import logging
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from email.message import EmailMessage
+
+# Load settings from .env when python-dotenv is available
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER") or None
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD") or None
+SMTP_FROM = os.getenv("SMTP_FROM") or SMTP_USER or "noreply@example.com"
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_SSL = os.getenv("SMTP_SSL", "false").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "50"))
+SMTP_QUEUE_SIZE = int(os.getenv("SMTP_QUEUE_SIZE", "1000"))
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "3"))
+SMTP_RETRY_BACKOFF = float(os.getenv("SMTP_RETRY_BACKOFF", "1.0"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+
+_STOP = object()
+
+
+def build_message(to_addresses, subject, body, from_address=None):
+    """Build a plain-text EmailMessage for one or more recipients."""
+    if isinstance(to_addresses, str):
+        to_addresses = [to_addresses]
+    message = EmailMessage()
+    message["From"] = from_address or SMTP_FROM
+    message["To"] = ", ".join(to_addresses)
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+class NotificationDispatcher:
+    """Background SMTP sender with one persistent connection per worker thread."""
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, username=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, use_ssl=SMTP_SSL, timeout=SMTP_TIMEOUT, pool_size=SMTP_POOL_SIZE,
+                 batch_size=SMTP_BATCH_SIZE, queue_size=SMTP_QUEUE_SIZE, max_retries=SMTP_MAX_RETRIES,
+                 backoff=SMTP_RETRY_BACKOFF, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads if they are not already running."""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.pool_size):
+                thread = threading.Thread(target=self._run, name=f"smtp-sender-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, to_addresses, subject, body, from_address=None):
+        """Queue a message, blocking when the queue is full."""
+        self.submit_message(build_message(to_addresses, subject, body, from_address))
+
+    def submit_message(self, message):
+        """Queue a prepared EmailMessage."""
+        self.start()
+        self._queue.put(message)
+
+    def flush(self):
+        """Block until every message submitted so far has been sent or has failed."""
+        if self._threads:
+            self._queue.join()
+
+    def close(self):
+        """Send what is queued, then close the connections and stop the workers."""
+        threads = [thread for thread in self._threads if thread.is_alive()]
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join()
+        self._threads = []
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    # Connections
+    def _connect(self):
+        """Open, secure and authenticate a new SMTP connection."""
+        if self.use_ssl:
+            connection = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                          context=ssl.create_default_context())
+        else:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                connection.starttls(context=ssl.create_default_context())
+        connection.ehlo()
+        if self.username:
+            connection.login(self.username, self.password)
+        self._count("connections")
+        return connection
+
+    @staticmethod
+    def _disconnect(connection):
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    def _ready(self, connection, last_used):
+        """Return a usable connection, checking idle ones with NOOP and reconnecting if needed."""
+        if connection is not None and time.monotonic() - last_used > self.idle_timeout:
+            try:
+                if connection.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP failed")
+            except (smtplib.SMTPException, OSError):
+                self._disconnect(connection)
+                connection = None
+        return connection or self._connect()
+
+    # Worker
+    def _run(self):
+        """Send batches of queued messages over this worker's connection."""
+        connection = None
+        last_used = time.monotonic()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+
+            for message in batch:
+                connection = self._deliver(connection, last_used, message)
+                last_used = time.monotonic()
+                self._queue.task_done()
+        self._disconnect(connection)
+
+    def _deliver(self, connection, last_used, message):
+        """Send one message with retries; return the connection to keep using."""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retried")
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                connection = self._ready(connection, last_used)
+                connection.send_message(message)
+                self._count("sent")
+                return connection
+            except smtplib.SMTPRecipientsRefused as e:
+                logging.error(f"Recipients refused for '{message['Subject']}': {e.recipients}")
+                break
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code >= 500:
+                    logging.error(f"SMTP rejected '{message['Subject']}': {e.smtp_code} {e.smtp_error!r}")
+                    break
+                logging.warning(f"SMTP deferred '{message['Subject']}' ({e.smtp_code}), attempt {attempt + 1}.")
+            except (smtplib.SMTPException, OSError) as e:
+                logging.warning(f"SMTP connection error sending '{message['Subject']}': {e}, attempt {attempt + 1}.")
+                self._disconnect(connection)
+                connection = None
+        self._count("failed")
+        logging.error(f"Failed to send '{message['Subject']}' to {message['To']}.")
+        return connection
+
+
+_dispatcher = None
+
+def get_dispatcher():
+    """Return the process-wide dispatcher, creating it on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher()
+        atexit.register(_dispatcher.close)
+    return _dispatcher
+
+def notify(to_addresses, subject, body, from_address=None):
+    """Queue a notification on the shared dispatcher."""
+    get_dispatcher().submit(to_addresses, subject, body, from_address)
+
+def flush_notifications():
+    """Wait for every queued notification to be sent."""
+    if _dispatcher is not None:
+        _dispatcher.flush()
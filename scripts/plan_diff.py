@@ -0,0 +1,165 @@
+"""Section-aware diffs between two versions of a plan.
+
+Plans are split on their ``##``/``###`` headings (the structure used by the
+master templates). Sections are paired by heading path, unchanged sections are
+skipped by comparing content hashes, and line diffs run only inside the
+sections that changed. Results are keyed by the pair of content hashes and
+the context size: the query layer saves them in the ``plan_diffs`` table so
+every later run (CLI or API) reuses them, and each process also keeps a small
+LRU in front of that table. The same section split drives ``merge_sections``,
+the three-way merge used when two editors save concurrently.
+"""
+import difflib
+import hashlib
+import json
+import re
+from collections import OrderedDict, namedtuple
+
+SECTION_HEADING = re.compile(r"^(#{2,3})\s+(.+?)\s*#*\s*$")
+
+Section = namedtuple("Section", ["path", "level", "text", "hash"])
+SectionDiff = namedtuple("SectionDiff", ["path", "status", "lines"])
+
+DIFF_CACHE_SIZE = 256
+_diff_cache = OrderedDict()
+
+
+def split_sections(content):
+    """Split markdown into sections keyed by heading path.
+
+    The text before the first ``##`` heading (usually the ``#`` title) is the
+    section with path ``""``. ``###`` headings are nested under the preceding
+    ``##`` heading as ``"Parent/Child"``. Repeated paths get a ``" (n)"`` suffix.
+    """
+    sections = []
+    seen = {}
+    parent = None
+    path, level, lines = "", 1, []
+
+    def close():
+        if path or lines:
+            text = "".join(lines)
+            sections.append(Section(path, level, text, hashlib.sha256(text.encode("utf-8")).hexdigest()))
+
+    for line in content.splitlines(keepends=True):
+        match = SECTION_HEADING.match(line)
+        if not match:
+            lines.append(line)
+            continue
+        close()
+        level = len(match.group(1))
+        title = match.group(2)
+        if level == 2:
+            parent = title
+            path = title
+        else:
+            path = f"{parent}/{title}" if parent else title
+        seen[path] = seen.get(path, 0) + 1
+        if seen[path] > 1:
+            path = f"{path} ({seen[path]})"
+        lines = [line]
+    close()
+    return sections
+
+def diff_sections(old_content, new_content, context=3):
+    """Return SectionDiffs for sections added, removed or changed between two documents."""
+    old_sections = {section.path: section for section in split_sections(old_content)}
+    new_sections = split_sections(new_content)
+    new_paths = {section.path for section in new_sections}
+    diffs = []
+
+    for section in new_sections:
+        old = old_sections.get(section.path)
+        if old is None:
+            diffs.append(SectionDiff(section.path, "added", _line_diff("", section.text, section.path, context)))
+        elif old.hash != section.hash:
+            diffs.append(SectionDiff(section.path, "changed", _line_diff(old.text, section.text, section.path, context)))
+    for path, old in old_sections.items():
+        if path not in new_paths:
+            diffs.append(SectionDiff(path, "removed", _line_diff(old.text, "", path, context)))
+    return diffs
+
+def _line_diff(old_text, new_text, path, context):
+    """Unified line diff of one section."""
+    label = path or "(preamble)"
+    return list(difflib.unified_diff(
+        old_text.splitlines(), new_text.splitlines(),
+        fromfile=f"a/{label}", tofile=f"b/{label}", n=context, lineterm="",
+    ))
+
+
+# Three-way merge
+class MergeConflict(ValueError):
+    """Both sides of a merge changed the same sections differently."""
+
+    def __init__(self, paths):
+        super().__init__(f"Conflicting edits in: {', '.join(path or '(preamble)' for path in paths)}")
+        self.paths = paths
+
+def merge_sections(base, theirs, ours):
+    """Merge two edits of base section by section, or raise MergeConflict.
+
+    A section changed (or removed) on one side only takes that side's text;
+    sections changed identically on both sides are kept once. Sections added
+    by ours are placed after the section that precedes them in ours.
+    """
+    base_text = {section.path: section.text for section in split_sections(base)}
+    their_sections = split_sections(theirs)
+    our_sections = split_sections(ours)
+    their_text = {section.path: section.text for section in their_sections}
+    our_text = {section.path: section.text for section in our_sections}
+
+    order = [section.path for section in their_sections]
+    previous = None
+    for section in our_sections:
+        if section.path not in their_text:
+            order.insert(order.index(previous) + 1 if previous in order else 0, section.path)
+        previous = section.path
+
+    merged, conflicts = [], []
+    for path in order:
+        original, mine, other = base_text.get(path), our_text.get(path), their_text.get(path)
+        if mine == other or original == mine:
+            text = other
+        elif original == other:
+            text = mine
+        else:
+            conflicts.append(path)
+            continue
+        if text is not None:
+            merged.append(text)
+    if conflicts:
+        raise MergeConflict(conflicts)
+    # A section that ended the file may no longer be last
+    return "".join(text if text.endswith("\n") else text + "\n" for text in merged[:-1]) + "".join(merged[-1:])
+
+
+# Diff cache
+def dump_diffs(diffs):
+    """Serialize SectionDiffs to JSON for storage."""
+    return json.dumps([list(diff) for diff in diffs])
+
+def load_diffs(text):
+    """Inverse of dump_diffs."""
+    return [SectionDiff(*diff) for diff in json.loads(text)]
+
+def cached_diff(old_hash, new_hash, compute, context=3):
+    """Return the diff for two content hashes, calling compute only on a miss in this process's LRU.
+
+    compute is called with no arguments and returns the SectionDiffs (the query
+    layer reads them from, or saves them to, the plan_diffs table).
+    """
+    key = (old_hash, new_hash, context)
+    if key in _diff_cache:
+        _diff_cache.move_to_end(key)
+        return _diff_cache[key]
+
+    result = [] if old_hash == new_hash else compute()
+    _diff_cache[key] = result
+    if len(_diff_cache) > DIFF_CACHE_SIZE:
+        _diff_cache.popitem(last=False)
+    return result
+
+def clear_diff_cache():
+    """Drop every diff cached in this process (saved diffs stay in plan_diffs)."""
+    _diff_cache.clear()
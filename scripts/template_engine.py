@@ -0,0 +1,154 @@
+"""Compiled templates for generating DRP/IRP plans from the master templates.
+
+Each master template is parsed once into a ``CompiledTemplate`` that records the
+literal text between ``[Placeholder]`` markers, the position of every
+placeholder and the markdown section headings. Rendering is then a single join
+over the precompiled segments instead of one rewrite per placeholder.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+# Matches "[System A]", "[e.g., 4 hours]" etc. on a single line
+PLACEHOLDER_PATTERN = re.compile(r"\[([^\[\]\n]+)\]")
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*$", re.MULTILINE)
+
+# Friendly inventory keys for the placeholders customized by archive/policy_generator.sh
+PLACEHOLDER_ALIASES = {
+    "system_name": "System A",
+    "rto": "e.g., 4 hours",
+    "rpo": "e.g., 15 minutes",
+    "dependencies": "e.g., Database B",
+    "tools": "e.g., Splunk, Carbon Black",
+    "tool_purpose": "e.g., Log analysis, endpoint detection",
+    "regulatory_contact": "Regulatory body or governing authority.",
+    "notification_timeline": "e.g., Within 72 hours for GDPR compliance.",
+    "version": "e.g., 1.0",
+    "approval_date": "Insert Date",
+    "approved_by": "Name and Title",
+    "review_cycle": "e.g., Annual",
+}
+
+# Inventory columns that describe the plan itself rather than template values
+PLAN_FIELDS = ("title", "plan_type", "owner", "framework")
+
+
+class CompiledTemplate:
+    """A master template pre-split into literal segments and placeholder slots."""
+
+    def __init__(self, source, name=None):
+        self.name = name
+        self.source = source
+        self.literals = []
+        self.slots = []
+        self.placeholders = {}
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            self.literals.append(source[position:match.start()])
+            self.slots.append(match.group(1))
+            self.placeholders.setdefault(match.group(1), []).append(match.start())
+            position = match.end()
+        self.literals.append(source[position:])
+        self.sections = [
+            (len(match.group(1)), match.group(2), match.start())
+            for match in HEADING_PATTERN.finditer(source)
+        ]
+
+    def render(self, values):
+        """Render the template in one pass, leaving unknown placeholders untouched."""
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot)
+            parts.append(f"[{slot}]" if value is None else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+    def section_of(self, offset):
+        """Return the (level, title) of the section containing a source offset."""
+        current = None
+        for level, title, start in self.sections:
+            if start > offset:
+                break
+            current = (level, title)
+        return current
+
+
+@lru_cache(maxsize=None)
+def load_template(plan_type):
+    """Compile the master template for a plan type (cached per process)."""
+    path = os.path.join(TEMPLATE_DIR, f"{plan_type.lower()}_master_template.md")
+    if not os.path.exists(path):
+        raise ValueError(f"No master template for plan type '{plan_type}'.")
+    with open(path, encoding="utf-8") as file:
+        return CompiledTemplate(file.read(), name=os.path.basename(path))
+
+def resolve_values(row):
+    """Map an inventory row onto placeholder names, accepting alias keys."""
+    values = {}
+    for key, value in row.items():
+        if key in PLAN_FIELDS or value in (None, ""):
+            continue
+        values[PLACEHOLDER_ALIASES.get(key, key)] = value
+    return values
+
+
+# Inventories (rows are loaded with scripts.utils.load_records, list_key="systems")
+def _merge_row(row, defaults):
+    """Overlay a row's non-empty values on the defaults."""
+    return {**(defaults or {}), **{k: v for k, v in row.items() if v not in (None, "")}}
+
+def validate_inventory(rows, defaults=None):
+    """Split inventory rows into renderable rows and failures.
+
+    Returns (valid_rows, failed) where failed holds (row_number, system_name, reason).
+    """
+    valid, failed = [], []
+    for row_number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            failed.append((row_number, None, "row is not a mapping"))
+            continue
+        merged = _merge_row(row, defaults)
+        try:
+            load_template(str(merged.get("plan_type", "drp")).lower())
+        except ValueError as e:
+            failed.append((row_number, merged.get("system_name"), str(e)))
+            continue
+        valid.append(row)
+    return valid, failed
+
+
+# Rendering
+def render_plan(row, defaults=None):
+    """Render one inventory row into a plan dict with its encoded first version."""
+    from db.versioning import encode_version
+
+    row = _merge_row(row, defaults)
+    plan_type = str(row.get("plan_type", "drp")).lower()
+    content = load_template(plan_type).render(resolve_values(row))
+    title = row.get("title") or f"{row.get('system_name', 'Unnamed System')} {plan_type.upper()}"
+    return {
+        "title": title,
+        "plan_type": plan_type,
+        "owner": row.get("owner"),
+        "framework": row.get("framework"),
+        "version": encode_version(1, content),
+    }
+
+def _render_chunk(rows, defaults):
+    """Worker entry point: render a chunk of rows with the per-process template cache."""
+    return [render_plan(row, defaults) for row in rows]
+
+def render_inventory(rows, defaults=None, workers=None, chunk_size=200):
+    """Render every inventory row, fanning out over a process pool for large inventories."""
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return _render_chunk(rows, defaults)
+
+    rendered = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_render_chunk, chunks, [defaults] * len(chunks)):
+            rendered.extend(result)
+    return rendered
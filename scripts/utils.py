@@ -3,21 +3,18 @@ import re
 import logging
 import random
 import string
-import shutil
 from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
-from werkzeug.security import generate_password_hash, check_password_hash
 
-# Password Hashing
+# Password Hashing (delegates to the shared backend in scripts/auth.py)
 def generate_hash(password: str) -> str:
     """Generate a hashed password."""
-    return generate_password_hash(password)
+    from scripts.auth import hash_password
+    return hash_password(password)
 
 def verify_password(stored_hash: str, password: str) -> bool:
     """Verify a password against a stored hash."""
-    return check_password_hash(stored_hash, password)
+    from scripts.auth import verify_password as verify
+    return verify(password, stored_hash)
 
 # File Handling Utilities
 def safe_write(file_path, content):
@@ -29,11 +26,12 @@ def safe_write(file_path, content):
         logging.error(f"Error writing to {file_path}: {e}")
 
 def backup_file(file_path):
-    """Backup a file by appending a timestamp."""
+    """Backup a file by appending a timestamp (SQLite databases are copied with the online backup API)."""
+    from db.backup import copy_file
     if os.path.exists(file_path):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = f"{file_path}_{timestamp}.bak"
-        shutil.copy(file_path, backup_path)
+        copy_file(file_path, backup_path)
         logging.info(f"Backup created: {backup_path}")
     else:
         logging.warning("File not found.")
@@ -98,6 +96,30 @@ def get_user_by_id(user_id):
     return session.query(User).filter(User.id == user_id).first()
 
 # File and Directory Operations
+def load_records(file_path, list_key=None):
+    """Load a list of dict records from a CSV, JSON or YAML file.
+
+    JSON/YAML files may hold the list directly or under list_key in a mapping.
+    """
+    import csv
+    import json
+    extension = os.path.splitext(file_path)[1].lower()
+    with open(file_path, encoding="utf-8", newline="") as file:
+        if extension == ".csv":
+            return list(csv.DictReader(file))
+        if extension == ".json":
+            data = json.load(file)
+        elif extension in (".yaml", ".yml"):
+            import yaml
+            data = yaml.safe_load(file)
+        else:
+            raise ValueError(f"Unsupported file format '{extension}'. Use .csv, .json or .yaml.")
+    if isinstance(data, dict) and list_key:
+        data = data.get(list_key, [])
+    if not isinstance(data, list):
+        raise ValueError(f"{file_path} must contain a list of records" + (f" or a mapping with a '{list_key}' list." if list_key else "."))
+    return data
+
 def file_exists(file_path):
     """Check if a file or directory exists."""
     return os.path.exists(file_path)
@@ -112,24 +134,23 @@ def format_bullet_list(items):
     return "\n".join([f"- {item}" for item in items])
 
 # Email Utility (SMTP)
-def send_email(to_address, subject, body, from_address="noreply@example.com"):
-    """Send an email."""
+def send_email(to_address, subject, body, from_address=None, wait=True):
+    """Send an email through the pooled dispatcher (see scripts/notifications.py); return True if it was sent.
+
+    With wait=False the message is only queued, and True means it was accepted.
+    """
+    from scripts.notifications import get_dispatcher
     try:
-        msg = MIMEMultipart()
-        msg['From'] = from_address
-        msg['To'] = to_address
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        # Establish SMTP connection
-        with smtplib.SMTP('smtp.example.com', 587) as server:
-            server.starttls()
-            server.login(from_address, "your_email_password")
-            text = msg.as_string()
-            server.sendmail(from_address, to_address, text)
-            logging.info("Email sent successfully.")
+        dispatcher = get_dispatcher()
+        failed = dispatcher.failed
+        dispatcher.submit(to_address, subject, body, from_address)
+        if wait:
+            dispatcher.flush()
+            return dispatcher.failed == failed
+        return True
     except Exception as e:
         logging.error(f"Failed to send email: {e}")
+        return False
 
 # Plan Management
 def get_plan_by_id(plan_id):
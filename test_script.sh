@@ -45,7 +45,7 @@ python -c "from scripts.utils import safe_write, backup_file; safe_write('test_f
 
 # Step 10: Test email sending (simulated)
 echo "📧 Testing email functionality..."
-python -c "from scripts.utils import send_email; send_email('recipient@example.com', 'Test Subject', 'This is a test email body.')" || { echo "❌ Email functionality failed."; ERRORS=1; }
+python -c "import sys; from scripts.utils import send_email; sys.exit(0 if send_email('recipient@example.com', 'Test Subject', 'This is a test email body.') else 1)" || { echo "❌ Email functionality failed."; ERRORS=1; }
 
 # If there were any errors, report and exit
 if [ $ERRORS -ne 0 ]; then
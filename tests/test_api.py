@@ -0,0 +1,109 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from api.app import create_app
+from db.database_setup import create_db_engine, ensure_schema
+from db.models import Log, User
+from scripts.auth import hash_password
+
+TEMPLATE_PATH = "templates/drp_master_template.md"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Fixture providing an API client on a fresh database with an admin and a viewer."""
+    monkeypatch.setenv("DRIR_CONFIG_DIR", str(tmp_path / "config"))
+    url = f"sqlite:///{tmp_path / 'api.db'}"
+    engine = create_db_engine(url)
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": "api_admin", "password_hash": hash_password("AdminPass123!"), "role": "admin"},
+            {"username": "api_viewer", "password_hash": hash_password("ViewerPass123!"), "role": "viewer"},
+        ])
+        conn.execute(insert(Log), [{"user_id": 1, "action": f"Seeded action {i}"} for i in range(3)])
+    engine.dispose()
+    with TestClient(create_app(url)) as test_client:
+        yield test_client
+
+def login(client, username, password):
+    """Return auth headers for a user."""
+    response = client.post("/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_auth_required_and_roles(client):
+    """Ensure bad credentials, missing tokens and insufficient roles are rejected."""
+    assert client.post("/auth/login", json={"username": "api_admin", "password": "wrong"}).status_code == 401
+    assert client.get("/plans").status_code == 401
+    viewer = login(client, "api_viewer", "ViewerPass123!")
+    assert client.get("/users/me", headers=viewer).json()["role"] == "viewer"
+    assert client.post("/plans", json={"title": "Nope", "plan_type": "drp"}, headers=viewer).status_code == 403
+    assert client.get("/logs", headers=viewer).status_code == 403
+
+def test_plan_version_lifecycle(client):
+    """Ensure plans, versions, sections and rollback work end to end."""
+    admin = login(client, "api_admin", "AdminPass123!")
+    template = open(TEMPLATE_PATH).read()
+    created = client.post("/plans", json={"title": "API Plan", "plan_type": "drp", "content": template}, headers=admin)
+    assert created.status_code == 201
+    plan_id = created.json()["id"]
+    assert created.json()["owner"] == "api_admin" and created.json()["latest_version"] == 1
+
+    version = client.post(f"/plans/{plan_id}/versions", json={"content": template + "- Extra\n"}, headers=admin)
+    assert version.json()["version_number"] == 2 and version.json()["storage"] == "delta"
+    section = client.put(f"/plans/{plan_id}/sections/Scope", json={"body": "- Everything\n"}, headers=admin)
+    assert section.json()["version_number"] == 3
+    assert client.get(f"/plans/{plan_id}/sections/Scope", headers=admin).json()["content"] == "## Scope\n- Everything\n"
+
+    rolled = client.post(f"/plans/{plan_id}/rollback", json={"version_number": 1}, headers=admin)
+    assert rolled.json()["version_number"] == 4
+    latest = client.get(f"/plans/{plan_id}/content", headers=admin).json()
+    assert latest["content"] == template and latest["version_number"] == 4
+    assert [v["version_number"] for v in client.get(f"/plans/{plan_id}/versions", headers=admin).json()] == [1, 2, 3, 4]
+    assert [p["title"] for p in client.get("/plans", params={"sort_by": "title"}, headers=admin).json()] == ["API Plan"]
+
+    assert client.delete(f"/plans/{plan_id}", headers=admin).status_code == 204
+    assert client.get(f"/plans/{plan_id}", headers=admin).status_code == 404
+
+def test_concurrent_writers_get_conflicts(client, monkeypatch):
+    """Ensure rollback and section updates answer 409 when another writer saved first."""
+    admin = login(client, "api_admin", "AdminPass123!")
+    plan_id = client.post("/plans", json={"title": "Race Plan", "plan_type": "drp", "content": "# Race\n## Scope\n- All\n"},
+                          headers=admin).json()["id"]
+
+    def lost_race(*args):
+        raise IntegrityError("INSERT INTO plan_versions", {}, Exception("UNIQUE constraint failed"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr("api.app.append_version", lost_race)
+        patch.setattr("api.app.replace_section", lost_race)
+        assert client.post(f"/plans/{plan_id}/rollback", json={"version_number": 1}, headers=admin).status_code == 409
+        assert client.put(f"/plans/{plan_id}/sections/Scope", json={"body": "- None\n"}, headers=admin).status_code == 409
+    assert client.post(f"/plans/{plan_id}/rollback", json={"version_number": 1}, headers=admin).json()["version_number"] == 2
+
+def test_users_and_logs(client):
+    """Ensure admins can create users and page through logs."""
+    admin = login(client, "api_admin", "AdminPass123!")
+    created = client.post("/users", json={"username": "api_editor", "password": "EditorPass123!", "role": "editor"}, headers=admin)
+    assert created.status_code == 201
+    assert client.post("/users", json={"username": "api_editor", "password": "EditorPass123!"}, headers=admin).status_code == 409
+    page = client.get("/logs", params={"limit": 2}, headers=admin).json()
+    assert [log["action"] for log in page["items"]] == ["Seeded action 0", "Seeded action 1"]
+    page = client.get("/logs", params={"limit": 2, "after_id": page["next_after_id"]}, headers=admin).json()
+    assert [log["action"] for log in page["items"]] == ["Seeded action 2"] and page["next_after_id"] is None
+
+def test_change_feed(client):
+    """Ensure writes through the API appear in the admin-only change feed, page by page."""
+    admin = login(client, "api_admin", "AdminPass123!")
+    viewer = login(client, "api_viewer", "ViewerPass123!")
+    assert client.get("/changes", headers=viewer).status_code == 403
+
+    plan_id = client.post("/plans", json={"title": "Feed Plan", "plan_type": "irp", "framework": "FISMA", "content": "# Feed\n"},
+                          headers=admin).json()["id"]
+    page = client.get("/changes", params={"limit": 1}, headers=admin).json()
+    assert [(change["table"], change["op"]) for change in page["changes"]] == [("plans", "insert")]
+    assert page["changes"][0]["row"]["framework"] == "fisma"
+    page = client.get("/changes", params={"since": page["cursor"], "table": ["plan_versions"]}, headers=admin).json()
+    assert [change["row"]["plan_id"] for change in page["changes"]] == [plan_id]
+    assert client.get("/changes", params={"since": page["cursor"]}, headers=admin).json()["changes"] == []
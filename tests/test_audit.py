@@ -0,0 +1,58 @@
+import pytest
+from db import audit
+from db.audit import AuditWriter, set_audit_mode, flush_audit_log
+from db.query import create_user, log_action
+from db.database_setup import session, SessionFactory
+from db.models import Log, User
+
+@pytest.fixture
+def test_user():
+    """Fixture to create a test user for audit writer testing."""
+    user = create_user("audit_tester", "AuditPass123!", "editor")
+    yield user
+    session.query(Log).filter_by(user_id=user.id).delete()
+    session.query(User).filter_by(username="audit_tester").delete()
+    session.commit()
+
+@pytest.fixture
+def async_mode():
+    """Fixture to switch log_action into buffered mode for one test."""
+    set_audit_mode("async")
+    yield
+    set_audit_mode("sync")
+
+def count_logs(user_id):
+    """Count logs for a user in a fresh transaction."""
+    session.expire_all()
+    return session.query(Log).filter_by(user_id=user_id).count()
+
+def test_async_log_action_flush(test_user, async_mode):
+    """Ensure buffered log actions are written once flushed."""
+    for i in range(25):
+        log_action(test_user.id, f"Buffered action {i}")
+    flush_audit_log()
+    assert count_logs(test_user.id) == 25
+
+def test_writer_flushes_on_batch_size(test_user):
+    """Ensure a full batch is written without an explicit flush."""
+    writer = AuditWriter(SessionFactory, batch_size=10, flush_interval=60)
+    for i in range(10):
+        writer.submit(test_user.id, f"Batched action {i}")
+    writer._queue.join()
+    assert writer.written == 10
+    assert count_logs(test_user.id) == 10
+    writer.close()
+
+def test_writer_close_drains_queue(test_user):
+    """Ensure closing the writer persists events still in the buffer."""
+    writer = AuditWriter(SessionFactory, batch_size=1000, flush_interval=60)
+    for i in range(5):
+        writer.submit(test_user.id, f"Pending action {i}")
+    writer.close()
+    assert count_logs(test_user.id) == 5
+
+def test_invalid_audit_mode():
+    """Ensure unknown durability modes are rejected."""
+    with pytest.raises(ValueError):
+        set_audit_mode("eventually")
+    assert audit.AUDIT_LOG_MODE == "sync"
@@ -0,0 +1,85 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta, UTC
+import pytest
+from click.testing import CliRunner
+from db.backup import create_backup, list_backups, prune_backups, restore_backup, verify_backup
+from db.query import create_user, delete_user
+from main import cli
+
+@pytest.fixture
+def source_db(tmp_path):
+    """Fixture to create a small WAL-mode SQLite database."""
+    path = str(tmp_path / "source.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [(f"item {i}" * 20,) for i in range(2000)])
+    conn.execute("PRAGMA user_version=4")
+    conn.commit()
+    conn.close()
+    return path
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize("compression", ["gz", "br", "none"])
+def test_backup_verify_and_restore(source_db, tmp_path, compression):
+    """Ensure a snapshot verifies and restores the database as it was."""
+    backup_dir = str(tmp_path / "backups")
+    metadata = create_backup(source_db, backup_dir, compression, pages=16, step_sleep=0)
+    snapshot = os.path.join(backup_dir, metadata["file"])
+    assert metadata["schema_version"] == 4 and metadata["steps"] > 1
+    assert verify_backup(snapshot) == []
+
+    conn = sqlite3.connect(source_db)
+    conn.execute("DELETE FROM items")
+    conn.commit()
+    conn.close()
+
+    safety = restore_backup(snapshot, source_db)
+    assert _count(source_db) == 2000
+    assert safety is not None and len(list_backups(backup_dir)) == 2
+
+def test_verify_detects_damage(source_db, tmp_path):
+    """Ensure a modified snapshot fails verification and is not restored."""
+    backup_dir = str(tmp_path / "backups")
+    snapshot = os.path.join(backup_dir, create_backup(source_db, backup_dir, "none")["file"])
+    with open(snapshot, "r+b") as file:
+        file.seek(8192)
+        file.write(b"\x00" * 512)
+    assert "checksum mismatch" in verify_backup(snapshot)
+    with pytest.raises(ValueError):
+        restore_backup(snapshot, str(tmp_path / "target.db"))
+
+def test_restore_backup_command_requires_admin(source_db, tmp_path):
+    """Ensure the restore-backup command refuses non-admins before touching the snapshot."""
+    snapshot = os.path.join(str(tmp_path / "backups"), create_backup(source_db, str(tmp_path / "backups"), "none")["file"])
+    create_user("restore_viewer", "RestorePass123!", "viewer")
+    try:
+        result = CliRunner().invoke(cli, ["restore-backup", "restore_viewer", "RestorePass123!", snapshot, "--yes"])
+        assert result.exit_code == 1 and "Access denied" in result.output
+        result = CliRunner().invoke(cli, ["restore-backup", "restore_viewer", "wrong", snapshot, "--yes"])
+        assert result.exit_code == 1 and "Authentication failed." in result.output
+    finally:
+        delete_user("restore_viewer")
+
+def test_prune_keeps_newest_and_one_per_day(tmp_path):
+    """Ensure retention keeps the newest snapshots plus the newest of each recent day."""
+    now = datetime(2026, 10, 18, 12, tzinfo=UTC)
+    for hours in range(0, 24 * 5, 6):
+        name = f"snapshot-{hours:03d}.db"
+        (tmp_path / name).write_bytes(b"")
+        created_at = (now - timedelta(hours=hours)).isoformat()
+        (tmp_path / f"{name}.json").write_text(json.dumps({"file": name, "created_at": created_at}))
+
+    removed = prune_backups(str(tmp_path), keep_last=2, keep_daily=3, now=now)
+    kept = sorted(os.path.basename(metadata["path"]) for metadata in list_backups(str(tmp_path)))
+    # The two newest, then the newest of Oct 17 and of Oct 16; Oct 15 and earlier are past the window
+    assert kept == ["snapshot-000.db", "snapshot-006.db", "snapshot-018.db", "snapshot-042.db"]
+    assert len(removed) == 20 - len(kept)
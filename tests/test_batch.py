@@ -0,0 +1,80 @@
+import pytest
+from click.testing import CliRunner
+from db.query import create_user, delete_plan, delete_user, list_plans
+from main import cli
+
+def _run_batch(tmp_path, lines, *options):
+    batch_file = tmp_path / "batch.txt"
+    batch_file.write_text("\n".join(lines) + "\n")
+    return CliRunner().invoke(cli, ["run-batch", *options, str(batch_file)])
+
+def _plans_titled(title):
+    return [plan for plan in list_plans() if plan.title == title]
+
+@pytest.fixture
+def batch_user(tmp_path, monkeypatch):
+    """Fixture to create an editor with an isolated login session directory."""
+    monkeypatch.setenv("DRIR_CONFIG_DIR", str(tmp_path / "config"))
+    yield create_user("batch_tester", "BatchPass123!", "editor")
+    delete_user("batch_tester")
+
+def test_run_batch_runs_every_command(tmp_path, batch_user):
+    """Ensure a batch runs its commands in order and reports per-command timings."""
+    result = _run_batch(tmp_path, [
+        "# Comments and blank lines are skipped",
+        "",
+        "login batch_tester BatchPass123!",
+        'create-plan-cli batch_tester "Batch Plan" drp nist',
+        "list-plans-cli --limit 1",
+    ])
+    assert result.exit_code == 0, result.output
+    assert "create-plan-cli" in result.output and "3 commands in" in result.output
+
+    for plan in _plans_titled("Batch Plan"):
+        delete_plan(plan.id)
+
+def test_run_batch_transaction_rolls_back_on_failure(tmp_path, batch_user):
+    """Ensure --transaction undoes earlier commands when a later one fails."""
+    result = _run_batch(tmp_path, [
+        "login batch_tester BatchPass123!",
+        'create-plan-cli batch_tester "Rolled Back Plan" drp nist',
+        "no-such-command",
+        'create-plan-cli batch_tester "Never Created" drp nist',
+    ], "--transaction")
+    assert result.exit_code == 1
+    assert "rolled back the whole batch" in result.output
+    assert _plans_titled("Rolled Back Plan") == []
+    assert _plans_titled("Never Created") == []
+
+def test_run_batch_transaction_rolls_back_on_failed_commands(tmp_path, batch_user):
+    """Ensure commands that fail without raising (denied, not found) still fail and roll back the batch."""
+    result = _run_batch(tmp_path, [
+        "login batch_tester BatchPass123!",
+        'create-plan-cli batch_tester "Denied Batch Plan" drp nist',
+        "delete-plan-cli batch_tester 999999",
+    ], "--transaction")
+    assert result.exit_code == 1
+    assert "Access denied: Only admins can delete plans." in result.output
+    assert "FAILED" in result.output and "rolled back the whole batch" in result.output
+    assert _plans_titled("Denied Batch Plan") == []
+
+    result = _run_batch(tmp_path, ['create-plan-cli nobody "Unauthenticated Plan" drp nist'], "--stop-on-error")
+    assert result.exit_code == 1
+    assert "Authentication failed." in result.output and "FAILED" in result.output
+
+def test_run_batch_transaction_refuses_own_connection_commands(tmp_path, batch_user):
+    """Ensure --transaction refuses commands that write through their own connections before running anything."""
+    result = _run_batch(tmp_path, [
+        "login batch_tester BatchPass123!",
+        'create-plan-cli batch_tester "Never Started" drp nist',
+        "archive-logs batch_tester BatchPass123!",
+    ], "--transaction")
+    assert result.exit_code == 2
+    assert "Line 3: 'archive-logs' uses its own database connection" in result.output
+    assert _plans_titled("Never Started") == []
+
+def test_run_batch_refuses_nested_shells(tmp_path):
+    """Ensure shell and run-batch cannot be started from a batch."""
+    result = _run_batch(tmp_path, ["shell"], "--stop-on-error")
+    assert result.exit_code == 1
+    assert "cannot be run from a shell or batch" in result.output
@@ -0,0 +1,128 @@
+import pytest
+from click.testing import CliRunner
+from sqlalchemy import insert, select, text
+from db.changes import apply_changes, iter_changes, latest_change_id, read_changes, replica_cursor, sync_replica
+from db.database_setup import create_db_engine, get_engine, session
+from db.models import Change, Plan, PlanSection, PlanVersion, User
+from db.query import (create_user, create_plan, save_plan_version, update_plan_section, delete_plan, delete_user,
+                      import_users, get_user_by_username, log_action)
+from main import cli
+
+@pytest.fixture
+def feed_start():
+    """Fixture to record the feed cursor before a test and remove the test's users and plans after it."""
+    create_user("feed_tester", "FeedPass123!", "admin")
+    yield latest_change_id(session)
+    for plan in session.query(Plan).filter(Plan.title.like("Feed %")).all():
+        delete_plan(plan.id)
+    for username in ("feed_tester", "feed_importer"):
+        delete_user(username)
+
+@pytest.fixture
+def replica(tmp_path):
+    """Fixture to provide an engine for an empty replica database."""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    yield engine
+    engine.dispose()
+
+def _rows(engine, table, ids):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT * FROM {table} WHERE id IN ({','.join(map(str, ids))}) ORDER BY id")).all()
+
+def test_flushes_and_bulk_writes_are_recorded(feed_start):
+    """Ensure ORM writes, cascaded deletes and bulk inserts each add one change per row, and rollbacks add none."""
+    plan = create_plan("Feed Plan", "drp", "feed_tester", "nist")
+    save_plan_version(plan.id, "# Feed Plan\n## Scope\n- Payroll\n")
+    plan.title = plan.title  # No net change, so no update is recorded
+    session.commit()
+    import_users([{"username": "feed_importer", "password": "FeedPass123!"}], workers=1)
+    importer_id = get_user_by_username("feed_importer").id
+    version_id = session.query(PlanVersion.id).filter_by(plan_id=plan.id).scalar()
+
+    session.add(User(username="feed_rolled_back", password_hash="x", role="viewer"))
+    session.flush()
+    session.rollback()
+
+    cursor, changes = read_changes(session, feed_start)
+    assert [(change["table"], change["id"], change["op"]) for change in changes] == [
+        ("plans", plan.id, "insert"), ("plan_versions", version_id, "insert"), ("users", importer_id, "insert"),
+    ]
+    assert changes[0]["row"]["title"] == "Feed Plan" and changes[0]["row"]["framework"] == "nist"
+    assert cursor == latest_change_id(session)
+
+    delete_plan(plan.id)
+    operations = session.execute(select(Change.table_name, Change.operation).where(Change.id > cursor)).all()
+    assert sorted(operations) == [("plan_versions", "delete"), ("plans", "delete")]
+    assert [change["op"] for change in read_changes(session, cursor)[1]] == ["delete", "delete"]
+
+def test_replica_sync_applies_only_new_changes(feed_start, replica):
+    """Ensure a replica matches the source after each sync, including derived sections, search and rollups."""
+    plan = create_plan("Feed Synced", "drp", "feed_tester", "nist")
+    for body in ("- Payroll\n", "- Payroll and HR\n"):
+        save_plan_version(plan.id, f"# Feed Synced\n## Scope\n{body}")
+    user_id = get_user_by_username("feed_tester").id
+    log_action(user_id, "Feed sync test")
+
+    source = "test-source"
+    cursor, counts = apply_changes(replica, source, iter_changes(session, feed_start))
+    assert counts == {"plans": 1, "plan_versions": 2, "logs": 1}
+    version_ids = [row.id for row in session.query(PlanVersion.id).filter_by(plan_id=plan.id)]
+    for table, ids in (("plans", [plan.id]), ("plan_versions", version_ids)):
+        assert _rows(replica, table, ids) == _rows(get_engine(), table, ids)
+    with replica.connect() as conn:
+        assert conn.execute(select(PlanSection.content).where(PlanSection.plan_id == plan.id, PlanSection.path == "Scope")).scalar() \
+            == "## Scope\n- Payroll and HR\n"
+        assert conn.execute(text("SELECT count(*) FROM plan_search WHERE plan_search MATCH 'payroll'")).scalar() == 2
+        assert conn.execute(text("SELECT count FROM log_rollups WHERE action = 'Feed sync test'")).scalar() == 1
+        assert replica_cursor(conn, source) == cursor
+
+    update_plan_section(plan.id, "Scope", "- Billing\n")
+    cursor, counts = apply_changes(replica, source, iter_changes(session, feed_start))
+    assert counts == {"plans": 1, "plan_versions": 1}
+    delete_plan(plan.id)
+    cursor, counts = apply_changes(replica, source, iter_changes(session, cursor))
+    assert counts == {"plans": 1, "plan_versions": 3}
+    assert _rows(replica, "plans", [plan.id]) == []
+    with replica.connect() as conn:
+        assert conn.execute(select(PlanSection.id).where(PlanSection.plan_id == plan.id)).first() is None
+
+def test_changes_file_round_trip(feed_start, replica, tmp_path):
+    """Ensure `changes --output` and `apply-changes --input` sync a replica, and replaying the file is a no-op."""
+    plan = create_plan("Feed Shipped", "irp", "feed_tester", "fedramp")
+    save_plan_version(plan.id, "# Feed Shipped\n## Containment\n- Isolate hosts\n")
+    runner = CliRunner()
+    output = str(tmp_path / "changes.ndjson.gz")
+    target = str(replica.url)
+
+    result = runner.invoke(cli, ["changes", "feed_tester", "FeedPass123!", "--since", str(feed_start), "--output", output])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(cli, ["apply-changes", "feed_tester", "FeedPass123!", target, "--input", output])
+    assert result.exit_code == 0, result.output
+    assert "1 plans" in result.output and "1 plan_versions" in result.output
+    assert _rows(replica, "plans", [plan.id]) == _rows(get_engine(), "plans", [plan.id])
+
+    result = runner.invoke(cli, ["apply-changes", "feed_tester", "FeedPass123!", target, "--input", output])
+    assert "no changes" in result.output
+
+def test_sync_replica_catches_up_from_the_start(feed_start, replica):
+    """Ensure sync_replica copies the whole feed to a new replica and then only what changed since."""
+    cursor, _ = sync_replica(replica)
+    assert cursor == latest_change_id(session)
+    plan = create_plan("Feed Direct", "drp", "feed_tester", "stig")
+    assert sync_replica(replica) == (latest_change_id(session), {"plans": 1})
+
+def test_replica_without_cursor_ignores_its_own_changes(feed_start, replica):
+    """Ensure a replica's own change ids never stand in for a missing source cursor, and --since sets one."""
+    from db.database_setup import ensure_schema
+    ensure_schema(replica)
+    with replica.begin() as conn:
+        conn.execute(insert(Change), [{"id": 10 ** 9, "table_name": "users", "row_id": 1, "operation": "insert"}])
+    plan = create_plan("Feed Local", "drp", "feed_tester", "nist")
+
+    cursor, counts = apply_changes(replica, "local-source", iter_changes(session, 0))
+    assert cursor == latest_change_id(session) and counts["plans"] >= 1
+    assert _rows(replica, "plans", [plan.id]) == _rows(get_engine(), "plans", [plan.id])
+
+    result = CliRunner().invoke(cli, ["apply-changes", "feed_tester", "FeedPass123!", str(replica.url), "--since", str(cursor)])
+    assert result.exit_code == 0, result.output
+    assert "no changes" in result.output
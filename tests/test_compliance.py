@@ -0,0 +1,93 @@
+import csv
+import pytest
+from click.testing import CliRunner
+from db.compliance import ControlIndex, load_catalog, load_index
+from db.query import create_user, create_plan, save_plan_version, delete_plan, plan_coverage
+from db.database_setup import session
+from db.models import ControlCoverage, Plan, User
+from main import cli
+from scripts.template_engine import load_template
+
+CATALOG = {
+    "framework": "test",
+    "name": "Test catalog",
+    "controls": [
+        {"id": "CP-9", "title": "System Backup", "plan_types": ["drp"], "keywords": ["backup", "off-site storage"], "headings": []},
+        {"id": "CP-4", "title": "Testing", "plan_types": ["drp"], "keywords": [], "headings": ["Testing Schedule"]},
+        {"id": "IR-4", "title": "Incident Handling", "plan_types": ["irp"], "keywords": ["containment"], "headings": []},
+    ],
+}
+
+@pytest.fixture
+def coverage_plans():
+    """Fixture to create a template-rendered DRP and IRP and a plan without a framework."""
+    create_user("coverage_tester", "CoveragePass123!", "editor")
+    plans = [
+        create_plan("Coverage DRP", "drp", "coverage_tester", "NIST"),
+        create_plan("Coverage IRP", "irp", "coverage_tester", "nist"),
+        create_plan("Coverage Untagged", "drp", "coverage_tester", None),
+    ]
+    for plan in plans:
+        save_plan_version(plan.id, load_template(plan.plan_type).source)
+    plan_ids = [plan.id for plan in plans]
+    yield plan_ids
+    for plan_id in plan_ids:
+        delete_plan(plan_id)
+    session.query(ControlCoverage).delete()
+    session.query(User).filter_by(username="coverage_tester").delete()
+    session.commit()
+
+def test_index_matches_keywords_and_headings():
+    """Ensure the compiled index counts whole-word keywords across line breaks and headings."""
+    index = ControlIndex(CATALOG)
+    content = "# Plan\n## Testing Schedule\n- Nightly backup to off-site\n  storage.\n- backupserver is not evidence\n"
+    assert index.scan(content) == {"CP-9": 2, "CP-4": 1}
+    assert index.applicable("irp") == ["IR-4"]
+
+def test_catalog_extends_parent():
+    """Ensure an extending catalog keeps the parent's controls and adds its own evidence."""
+    nist = {control["id"]: control for control in load_catalog("nist")["controls"]}
+    fedramp = {control["id"]: control for control in load_catalog("fedramp")["controls"]}
+    assert set(nist) < set(fedramp)
+    assert "US-CERT" in fedramp["IR-6"]["keywords"]
+    assert set(nist["IR-6"]["keywords"]) < set(fedramp["IR-6"]["keywords"])
+    with pytest.raises(ValueError):
+        load_catalog("iso27001")
+
+def test_coverage_uses_cache_until_content_changes(coverage_plans):
+    """Ensure plans store their framework, and only changed content is rescanned."""
+    drp_id, irp_id, untagged_id = coverage_plans
+    assert session.get(Plan, drp_id).framework == "nist"
+
+    report = plan_coverage(plan_ids=coverage_plans)
+    assert report["skipped"] == [untagged_id]
+    assert (report["scanned"], report["cached"]) == (2, 0)
+    plans = {plan["plan_id"]: plan for plan in report["plans"]}
+    assert "CP-9" in plans[drp_id]["hits"] and "IR-4" not in plans[drp_id]["applicable"]
+    assert "IR-4" in plans[irp_id]["hits"] and not plans[irp_id]["missing"]
+
+    assert (plan_coverage(plan_ids=coverage_plans)["cached"]) == 2
+    save_plan_version(drp_id, "# Coverage DRP\n## Scope\n- Payroll\n")
+    report = plan_coverage(plan_ids=coverage_plans)
+    assert (report["scanned"], report["cached"]) == (1, 1)
+    drp = next(plan for plan in report["plans"] if plan["plan_id"] == drp_id)
+    assert "CP-9" in drp["missing"] and drp["hits"]["CP-1"] == 1
+
+    report = plan_coverage(framework="stig", plan_ids=coverage_plans)
+    assert report["scanned"] == 3 and report["skipped"] == []
+    assert plan_coverage(plan_ids=coverage_plans, force=True)["scanned"] == 2
+
+def test_coverage_cli_writes_matrix(coverage_plans, tmp_path):
+    """Ensure the coverage command prints per-plan totals and writes a plan x control CSV."""
+    output = tmp_path / "coverage.csv"
+    result = CliRunner().invoke(cli, ["coverage", "--missing", "--output", str(output)] +
+                                [arg for plan_id in coverage_plans for arg in ("--plan-id", str(plan_id))])
+    assert result.exit_code == 0, result.output
+    assert f"Plan {coverage_plans[0]} [nist] Coverage DRP:" in result.output
+    assert "1 skipped" in result.output
+
+    rows = list(csv.DictReader(output.open()))
+    assert [int(row["plan_id"]) for row in rows] == coverage_plans[:2]
+    controls = [control["id"] for control in load_index("nist").controls]
+    assert list(rows[0])[7:] == controls
+    assert rows[0]["CP-9"] not in ("", "0") and rows[0]["IR-4"] == ""
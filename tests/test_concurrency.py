@@ -0,0 +1,82 @@
+import threading
+import pytest
+from sqlalchemy.exc import IntegrityError
+from db.query import create_user, create_plan, save_plan_version, delete_plan, get_plan_content, list_plan_versions
+from db.database_setup import session
+from db.models import Plan, PlanVersion, User
+from scripts.plan_diff import merge_sections
+
+EDITORS = 8
+SAVES_PER_EDITOR = 6
+
+@pytest.fixture
+def plans():
+    """Fixture to create one shared plan and one plan per editor."""
+    create_user("concurrency_tester", "ConcurrencyPass123!", "editor")
+    created = [create_plan(f"Concurrent Plan {i}", "drp", "concurrency_tester", "nist") for i in range(EDITORS + 1)]
+    plan_ids = [plan.id for plan in created]
+    yield plan_ids
+    for plan_id in plan_ids:
+        delete_plan(plan_id)
+    session.query(User).filter_by(username="concurrency_tester").delete()
+    session.commit()
+
+def test_concurrent_saves_lose_and_duplicate_nothing(plans):
+    """Ensure parallel editors on shared and separate plans get every save stored exactly once."""
+    shared, own_plans = plans[0], plans[1:]
+    failures = []
+    start = threading.Barrier(EDITORS)
+
+    def editor(index):
+        start.wait()
+        try:
+            for n in range(SAVES_PER_EDITOR):
+                for plan_id in (shared, own_plans[index]):
+                    if save_plan_version(plan_id, f"# Plan\n## Scope\n- Editor {index} edit {n}\n") is None:
+                        failures.append((index, plan_id, n))
+        finally:
+            session.remove()
+
+    threads = [threading.Thread(target=editor, args=(i,)) for i in range(EDITORS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    session.expire_all()
+    expected = {shared: EDITORS * SAVES_PER_EDITOR, **{plan_id: SAVES_PER_EDITOR for plan_id in own_plans}}
+    for plan_id, count in expected.items():
+        numbers = [version.version_number for version in list_plan_versions(plan_id)]
+        assert numbers == list(range(1, count + 1))
+        assert session.get(Plan, plan_id).lock_version == count + 1
+    contents = {get_plan_content(shared, number) for number in range(1, expected[shared] + 1)}
+    assert len(contents) == expected[shared]
+
+def test_stale_base_version_is_refused_or_merged(plans):
+    """Ensure an edit based on an old version is refused, or merged section by section when asked."""
+    plan_id = plans[0]
+    base = "# Plan\n## Scope\n- Payroll\n## Contacts\n- Alice\n"
+    save_plan_version(plan_id, base)
+    save_plan_version(plan_id, base.replace("Alice", "Bob"), base_version=1)
+
+    edit = base.replace("Payroll", "Payroll and HR")
+    assert save_plan_version(plan_id, edit, base_version=1) is None
+    version = save_plan_version(plan_id, edit, base_version=1, merge=merge_sections)
+    assert version.version_number == 3
+    assert get_plan_content(plan_id) == "# Plan\n## Scope\n- Payroll and HR\n## Contacts\n- Bob\n"
+
+    clash = base.replace("Alice", "Carol")
+    assert save_plan_version(plan_id, clash, base_version=1, merge=merge_sections) is None
+
+def test_version_numbers_are_unique(plans):
+    """Ensure the database rejects a duplicate version number for a plan."""
+    plan_id = plans[0]
+    save_plan_version(plan_id, "# Plan\n")
+    duplicate = session.query(PlanVersion).filter_by(plan_id=plan_id, version_number=1).one()
+    session.add(PlanVersion(plan_id=plan_id, version_number=1, storage=duplicate.storage, codec=duplicate.codec,
+                            payload=duplicate.payload, content_hash=duplicate.content_hash,
+                            content_length=duplicate.content_length))
+    with pytest.raises(IntegrityError):
+        session.commit()
+    session.rollback()
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import event, insert
+from db.query import create_user, create_plan, save_plan_version, delete_plan, get_plan_content, rollback_plan
+from db.database_setup import get_engine, session
+from db.models import PlanVersion, User
+from db.versioning import encode_version
+from db.content_cache import ContentCache, get_cache
+
+@pytest.fixture
+def cached_plan():
+    """Fixture to create a plan with two versions and an empty content cache."""
+    create_user("cache_tester", "CachePass123!", "editor")
+    plan = create_plan("Cached Plan", "drp", "cache_tester", "nist")
+    save_plan_version(plan.id, "# Plan\n## Scope\n- First\n")
+    save_plan_version(plan.id, "# Plan\n## Scope\n- Second\n")
+    get_cache().clear()
+    yield plan
+    delete_plan(plan.id)
+    session.query(User).filter_by(username="cache_tester").delete()
+    session.commit()
+
+def test_latest_content_is_served_from_memory(cached_plan):
+    """Ensure repeated reads of the latest version only run the version lookup."""
+    cache = get_cache()
+    hits = cache.hits
+    assert get_plan_content(cached_plan.id) == "# Plan\n## Scope\n- Second\n"
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(get_engine(), "before_cursor_execute", listener)
+    try:
+        assert get_plan_content(cached_plan.id) == "# Plan\n## Scope\n- Second\n"
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", listener)
+    assert len(statements) == 1 and "plan_versions" in statements[0]
+    assert cache.hits == hits + 1
+
+def test_versions_written_elsewhere_are_seen(cached_plan):
+    """Ensure a version saved outside this session (e.g. by another process) is served at once."""
+    assert get_plan_content(cached_plan.id) == "# Plan\n## Scope\n- Second\n"
+    with get_engine().begin() as conn:
+        conn.execute(insert(PlanVersion), {"plan_id": cached_plan.id, **encode_version(3, "# Plan\n## Scope\n- Third\n")})
+    assert get_plan_content(cached_plan.id) == "# Plan\n## Scope\n- Third\n"
+
+def test_saving_and_rollback_show_the_new_latest(cached_plan):
+    """Ensure new and rolled-back versions are visible immediately."""
+    assert get_plan_content(cached_plan.id) == "# Plan\n## Scope\n- Second\n"
+    save_plan_version(cached_plan.id, "# Plan\n## Scope\n- Third\n")
+    assert get_plan_content(cached_plan.id) == "# Plan\n## Scope\n- Third\n"
+    rollback_plan(cached_plan.id, 1)
+    assert get_plan_content(cached_plan.id) == "# Plan\n## Scope\n- First\n"
+    assert get_plan_content(cached_plan.id, 2) == "# Plan\n## Scope\n- Second\n"
+
+def test_html_is_rendered_once(cached_plan, monkeypatch):
+    """Ensure rendered HTML is cached alongside the content."""
+    html = get_plan_content(cached_plan.id, html=True)
+    assert "<h2>Scope</h2>" in html
+    monkeypatch.setattr("scripts.export.markdown_to_html", lambda content: pytest.fail("HTML was re-rendered"))
+    assert get_plan_content(cached_plan.id, html=True) == html
+    assert get_cache().html_hits >= 1
+
+def test_deleting_a_plan_drops_its_entries(cached_plan):
+    """Ensure a deleted plan's versions leave the cache."""
+    get_plan_content(cached_plan.id, 1)
+    get_plan_content(cached_plan.id, 2)
+    delete_plan(cached_plan.id)
+    assert len(get_cache()) == 0
+
+def test_lru_eviction_by_entries_and_bytes():
+    """Ensure the least recently used entries are evicted at either limit."""
+    cache = ContentCache(max_entries=2, max_bytes=10)
+    cache.put(1, 1, "a", "aaa")
+    cache.put(1, 2, "b", "bbb")
+    assert cache.get(1, 1, "a") is not None
+    cache.put(1, 3, "c", "ccc")
+    assert cache.get(1, 2, "b") is None
+    cache.put(1, 4, "d", "dddddddd")
+    assert len(cache) == 1 and cache.get(1, 4, "d") is not None
+    assert cache.evictions == 3
+    assert cache.get(1, 4, "other-hash") is None
+
+def test_cache_persists_between_runs(tmp_path):
+    """Ensure entries saved to disk are reused and checked against the content hash."""
+    path = str(tmp_path / "cache.json.gz")
+    cache = ContentCache(path=path)
+    cache.put(7, 1, "hash-1", "# Plan\n", "<h1>Plan</h1>")
+    assert cache.save()
+    assert not cache.save()
+
+    reloaded = ContentCache(path=path)
+    assert reloaded.load() == 1
+    assert reloaded.get(7, 1, "hash-1").html == "<h1>Plan</h1>"
+    assert reloaded.get(7, 1, "hash-2") is None
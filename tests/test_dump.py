@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from datetime import date
+from click.testing import CliRunner
+from sqlalchemy import select
+from db.database_setup import create_db_engine
+from db.dump import dump_database, restore_database
+from db.query import create_user, delete_user
+from db.models import Base, Log, LogRollup, Plan, PlanVersion, User
+from db.versioning import encode_version, decode_chain
+from main import cli
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+@pytest.fixture
+def source_engine(tmp_path):
+    """Fixture providing a small populated database on its own file."""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Base.metadata.tables["users"].insert(), [{"id": 1, "username": "dumper", "password_hash": "x", "role": "admin"}])
+        conn.execute(Base.metadata.tables["plans"].insert(), [{"id": 1, "title": "Dumped Plan", "plan_type": "drp", "owner_id": 1}])
+        conn.execute(Base.metadata.tables["plan_versions"].insert(), [{"plan_id": 1, **encode_version(1, "# Dumped\n")}])
+        conn.execute(Base.metadata.tables["logs"].insert(), [{"user_id": 1, "action": f"Entry {i}"} for i in range(250)])
+        conn.execute(Base.metadata.tables["log_rollups"].insert(), [{"day": date(2024, 1, 2), "user_id": 1, "action": "Entry", "count": 250}])
+    yield engine
+    engine.dispose()
+
+@pytest.mark.parametrize("suffix", [".ndjson", ".ndjson.gz", ".ndjson.br"])
+def test_dump_restore_roundtrip(source_engine, tmp_path, suffix):
+    """Ensure every row, date, datetime and binary payload survives a dump and restore."""
+    path = str(tmp_path / f"backup{suffix}")
+    dumped = dump_database(path, engine=source_engine, chunk_size=100)
+    assert dumped["logs"] == 250
+
+    target = create_db_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    assert restore_database(path, engine=target) == dumped
+
+    with target.connect() as conn:
+        version = conn.execute(select(PlanVersion.storage, PlanVersion.codec, PlanVersion.payload)).one()
+        assert decode_chain([version]) == "# Dumped\n"
+        assert conn.execute(select(Plan.created_at)).scalar() is not None
+        assert conn.execute(select(User.username)).scalar() == "dumper"
+        assert conn.execute(select(LogRollup.day)).scalar() == date(2024, 1, 2)
+    target.dispose()
+
+def test_restore_refuses_non_empty_database(source_engine, tmp_path):
+    """Ensure restore only overwrites existing rows when asked to."""
+    path = str(tmp_path / "backup.ndjson")
+    dump_database(path, engine=source_engine)
+    with pytest.raises(ValueError):
+        restore_database(path, engine=source_engine)
+
+    restore_database(path, engine=source_engine, replace=True)
+    with source_engine.connect() as conn:
+        assert len(conn.execute(select(Log.id)).all()) == 250
+
+def _rewrite(path, edit):
+    """Apply edit to the decoded lines of a plain NDJSON dump."""
+    with open(path) as file:
+        lines = [json.loads(line) for line in file]
+    edit(lines)
+    with open(path, "w") as file:
+        file.writelines(json.dumps(line) + "\n" for line in lines)
+
+def test_restore_rejects_mismatched_dumps(source_engine, tmp_path):
+    """Ensure dumps from another schema version or with unknown columns are refused before anything is written."""
+    path = str(tmp_path / "backup.ndjson")
+    dump_database(path, engine=source_engine)
+    target = create_db_engine(f"sqlite:///{tmp_path / 'target.db'}")
+
+    _rewrite(path, lambda lines: lines[0].update(schema_version=lines[0]["schema_version"] - 1))
+    with pytest.raises(ValueError, match="schema version"):
+        restore_database(path, engine=target)
+
+    def add_column(lines):
+        lines[0]["schema_version"] += 1
+        users = next(line for line in lines if line.get("table") == "users")
+        users["columns"].append("nickname")
+    _rewrite(path, add_column)
+    with pytest.raises(ValueError, match="unknown columns in 'users': nickname"):
+        restore_database(path, engine=target)
+    with target.connect() as conn:
+        assert conn.execute(select(User.id)).first() is None
+    target.dispose()
+
+def test_restore_command_requires_admin(tmp_path):
+    """Ensure the restore command refuses non-admins before reading the dump."""
+    create_user("restore_viewer", "RestorePass123!", "viewer")
+    try:
+        path = tmp_path / "backup.ndjson"
+        path.write_text("{}\n")
+        result = CliRunner().invoke(cli, ["restore", "restore_viewer", "RestorePass123!", str(path), "--replace"])
+        assert "Access denied" in result.output
+        result = CliRunner().invoke(cli, ["restore", "restore_viewer", "wrong", str(path)])
+        assert "Authentication failed." in result.output
+    finally:
+        delete_user("restore_viewer")
+
+def test_restore_command_bootstraps_a_new_database(source_engine, tmp_path):
+    """Ensure a database without users can be restored without a login, and then requires an admin."""
+    path = str(tmp_path / "backup.ndjson")
+    dump_database(path, engine=source_engine)
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'new.db'}", "DRIR_CONFIG_DIR": str(tmp_path / "config")}
+
+    def restore(*args):
+        return subprocess.run([sys.executable, "main.py", "restore", *args, path], cwd=PROJECT_ROOT, env=env,
+                              capture_output=True, text=True)
+
+    result = restore("nobody", "nothing")
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "no users yet" in result.stdout and "Restored" in result.stdout
+    result = restore("nobody", "nothing", "--replace")
+    assert result.returncode == 1 and "Authentication failed." in result.stdout
@@ -0,0 +1,50 @@
+import json
+import os
+import pytest
+from db.query import create_user, create_plan, save_plan_version
+from db.database_setup import session
+from db.models import Plan, PlanVersion, PlanSection, User
+from scripts.export import export_plans, pdf_available, MANIFEST_NAME
+
+@pytest.fixture
+def export_plan():
+    """Fixture to create a plan with one version to export."""
+    create_user("export_tester", "ExportPass123!", "editor")
+    plan = create_plan("Export Plan", "drp", "export_tester", "nist")
+    save_plan_version(plan.id, "# Export Plan\n\n## Scope\n- Billing system\n")
+    yield plan
+    session.query(PlanVersion).filter_by(plan_id=plan.id).delete()
+    session.query(PlanSection).filter_by(plan_id=plan.id).delete()
+    session.query(Plan).filter_by(id=plan.id).delete()
+    session.query(User).filter_by(username="export_tester").delete()
+    session.commit()
+
+def test_export_writes_formats_and_manifest(export_plan, tmp_path):
+    """Ensure each requested format is written and recorded in the manifest."""
+    summary = export_plans(str(tmp_path), ("md", "html", "json"), plan_ids=[export_plan.id])
+    assert summary["exported"] == [export_plan.id]
+
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    files = manifest["plans"][str(export_plan.id)]["files"]
+    assert set(files) == {"md", "html", "json"}
+    assert "<h2>Scope</h2>" in (tmp_path / files["html"]).read_text()
+    assert json.loads((tmp_path / files["json"]).read_text())["version"] == 1
+
+def test_export_is_incremental(export_plan, tmp_path):
+    """Ensure unchanged plans are skipped and new versions are rebuilt."""
+    export_plans(str(tmp_path), ("md",), plan_ids=[export_plan.id])
+    assert export_plans(str(tmp_path), ("md",), plan_ids=[export_plan.id])["skipped"] == [export_plan.id]
+
+    save_plan_version(export_plan.id, "# Export Plan\n\n## Scope\n- Payroll system\n")
+    assert export_plans(str(tmp_path), ("md",), plan_ids=[export_plan.id])["exported"] == [export_plan.id]
+    assert "Payroll" in (tmp_path / "drp" / f"plan_{export_plan.id}.md").read_text()
+
+    # Asking for a format that was never produced also triggers a rebuild
+    assert export_plans(str(tmp_path), ("md", "html"), plan_ids=[export_plan.id])["exported"] == [export_plan.id]
+
+@pytest.mark.skipif(not pdf_available(), reason="WeasyPrint system libraries are not installed")
+def test_export_pdf(export_plan, tmp_path):
+    """Ensure PDFs are rendered through the worker pool."""
+    summary = export_plans(str(tmp_path), ("pdf",), plan_ids=[export_plan.id], workers=1)
+    assert summary["errors"] == {}
+    assert os.path.getsize(tmp_path / "drp" / f"plan_{export_plan.id}.pdf") > 0
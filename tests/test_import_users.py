@@ -0,0 +1,39 @@
+import pytest
+from db.query import create_user, import_users, authenticate_user
+from db.database_setup import session
+from db.models import User
+
+@pytest.fixture
+def cleanup_imported():
+    """Fixture to remove users created by import tests."""
+    yield
+    session.query(User).filter(User.username.startswith("import_")).delete()
+    session.commit()
+
+def test_import_users_bulk(cleanup_imported):
+    """Ensure valid users are created across the hashing pool and can log in."""
+    records = [{"username": f"import_{i}", "password": f"ImportPass{i}!", "role": "editor"} for i in range(12)]
+    report = import_users(records, chunk_size=5, workers=2)
+    assert sorted(report["created"]) == sorted(r["username"] for r in records)
+    assert report["failed"] == []
+    assert authenticate_user("import_3", "ImportPass3!").role == "editor"
+
+def test_import_users_reports_failures(cleanup_imported):
+    """Ensure bad rows are reported per row without aborting the batch."""
+    create_user("import_existing", "Existing123!", "viewer")
+    records = [
+        {"username": "import_ok", "password": "Ok123!"},
+        {"username": "import_existing", "password": "Again123!"},
+        {"username": "import_ok", "password": "Dup123!"},
+        {"username": "import_bad_role", "password": "Role123!", "role": "owner"},
+        {"username": "", "password": "NoName123!"},
+    ]
+    report = import_users(records, workers=1)
+    assert report["created"] == ["import_ok"]
+    assert [(row, reason) for row, _, reason in report["failed"]] == [
+        (3, "duplicate username in import"),
+        (4, "unknown role 'owner'"),
+        (5, "missing username or password"),
+        (2, "user already exists"),
+    ]
+    assert session.query(User).filter_by(username="import_ok").one().role == "viewer"
@@ -0,0 +1,100 @@
+import pytest
+from db.query import create_user, delete_user, login_user, authenticate_session, logout_user
+from db.database_setup import session
+from scripts import auth, login_tokens
+
+@pytest.fixture
+def session_user(tmp_path, monkeypatch):
+    """Fixture to create a user with an isolated login session directory."""
+    monkeypatch.setenv("DRIR_CONFIG_DIR", str(tmp_path / "config"))
+    user = create_user("session_tester", "SessionPass123!", "admin")
+    yield user
+    delete_user("session_tester")
+
+@pytest.fixture
+def no_hashing(monkeypatch):
+    """Fixture that fails the test if a password hash is verified."""
+    def fail(*args):
+        raise AssertionError("password hash was recomputed")
+    monkeypatch.setattr("db.query.verify_password", fail)
+
+def test_login_issues_session(session_user):
+    """Ensure logging in stores a valid session for the user."""
+    assert login_user("session_tester", "SessionPass123!") is not None
+    claims = login_tokens.load_session()
+    assert claims["usr"] == "session_tester"
+
+def test_session_skips_password_hashing(session_user, no_hashing):
+    """Ensure later commands authenticate by HMAC instead of re-hashing."""
+    login_tokens.issue_session(session_user)
+    assert authenticate_session("session_tester").id == session_user.id
+
+def test_session_holds_nothing_derived_from_the_password(session_user, monkeypatch):
+    """Ensure the stored token has no password MAC and a given password is checked against the hash."""
+    claims = login_user("session_tester", "SessionPass123!") and login_tokens.load_session()
+    assert set(claims) == {"uid", "usr", "iat", "exp", "jti", "pwh"}
+
+    checked = []
+    monkeypatch.setattr("db.query.verify_password", lambda password, hashed: checked.append(password) or True)
+    assert authenticate_session("session_tester", "SessionPass123!").id == session_user.id
+    assert checked == ["SessionPass123!"]
+
+def test_session_rejects_wrong_password(session_user):
+    """Ensure a wrong password is not accepted just because a session exists."""
+    login_user("session_tester", "SessionPass123!")
+    assert authenticate_session("session_tester", "WrongPassword!") is None
+
+def test_tampered_or_expired_session(session_user, monkeypatch):
+    """Ensure forged and expired tokens are rejected."""
+    login_user("session_tester", "SessionPass123!")
+    path = login_tokens._path(login_tokens.SESSION_FILE)
+    token = open(path).read()
+    with open(path, "w") as file:
+        file.write(token[:-1] + ("0" if token[-1] != "0" else "1"))
+    assert login_tokens.load_session() is None
+
+    monkeypatch.setenv("LOGIN_SESSION_TTL", "-1")
+    login_user("session_tester", "SessionPass123!")
+    assert authenticate_session("session_tester") is None
+
+def test_logout_and_password_change_revoke(session_user):
+    """Ensure logout and password changes invalidate the session."""
+    login_user("session_tester", "SessionPass123!")
+    logout_user()
+    assert authenticate_session("session_tester") is None
+
+    login_user("session_tester", "SessionPass123!")
+    session_user.password_hash = auth.hash_password("NewPass456!")
+    session.commit()
+    assert authenticate_session("session_tester") is None
+
+def test_legacy_bcrypt_hashes_verify():
+    """Ensure hashes created by the old bcrypt backend still verify."""
+    import bcrypt
+    legacy = bcrypt.hashpw(b"OldPass", bcrypt.gensalt(rounds=4)).decode()
+    assert auth.verify_password("OldPass", legacy)
+    assert not auth.verify_password("Wrong", legacy)
+    assert auth.verify_password("NewPass", auth.hash_password("NewPass"))
+
+def test_commands_take_an_optional_password(session_user, tmp_path):
+    """Ensure every authenticated command accepts USERNAME PASSWORD or just USERNAME after login."""
+    from click.testing import CliRunner
+    from db.query import list_plans
+    from main import cli
+    runner = CliRunner()
+    result = runner.invoke(cli, ["create-plan-cli", "session_tester", "SessionPass123!", "Session Plan", "drp", "nist"])
+    assert result.exit_code == 0, result.output
+    plan_id = next(plan.id for plan in list_plans() if plan.title == "Session Plan")
+    result = runner.invoke(cli, ["save-plan-version-cli", "session_tester", str(plan_id), "# Session\n"])
+    assert result.exit_code == 1 and "Authentication failed." in result.output
+
+    login_user("session_tester", "SessionPass123!")
+    result = runner.invoke(cli, ["save-plan-version-cli", "session_tester", str(plan_id), "# Session\n"])
+    assert "Saved version 1" in result.output
+    result = runner.invoke(cli, ["save-plan-version-cli", "session_tester", "WrongPassword!", str(plan_id), "# Again\n"])
+    assert "Authentication failed." in result.output
+    result = runner.invoke(cli, ["dump", "session_tester", "--chunk-size", "10", str(tmp_path / "dump.ndjson")])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(cli, ["delete-plan-cli", "session_tester", "SessionPass123!", str(plan_id)])
+    assert result.exit_code == 0, result.output
+    assert plan_id not in [plan.id for plan in list_plans()]
@@ -1,5 +1,6 @@
 import pytest
-from db.query import create_user, log_action  # Ensure create_user is imported
+from datetime import datetime, timedelta, UTC
+from db.query import create_user, log_action, view_logs  # Ensure create_user is imported
 from db.database_setup import session
 from db.models import Log, User
 
@@ -44,3 +45,36 @@ def test_log_integrity(test_user):
 
     assert logs[0].action == "Initial log entry"
     assert logs[1].action == "Secondary log entry"
+
+def test_view_logs_keyset_pagination(test_user):
+    """Ensure paging with after_id walks every log exactly once."""
+    session.query(Log).filter_by(user_id=test_user.id).delete()
+    session.commit()
+    for i in range(7):
+        log_action(test_user.id, f"Paged entry {i}")
+
+    seen = []
+    after_id = None
+    while True:
+        page = list(view_logs(user_id=test_user.id, after_id=after_id, limit=3, batch_size=2))
+        if not page:
+            break
+        seen.extend(log.action for log in page)
+        after_id = page[-1].id
+
+    assert seen == [f"Paged entry {i}" for i in range(7)]
+
+def test_view_logs_filters(test_user):
+    """Ensure action prefix and time range filters narrow the results."""
+    session.query(Log).filter_by(user_id=test_user.id).delete()
+    session.commit()
+    log_action(test_user.id, "Exported plan 1")
+    log_action(test_user.id, "Deleted plan 1")
+    log_action(test_user.id, "Exported plan 2")
+
+    exported = list(view_logs(user_id=test_user.id, action_prefix="Exported"))
+    assert [log.action for log in exported] == ["Exported plan 1", "Exported plan 2"]
+
+    tomorrow = datetime.now(UTC).replace(tzinfo=None) + timedelta(days=1)
+    assert list(view_logs(user_id=test_user.id, since=tomorrow)) == []
+    assert len(list(view_logs(user_id=test_user.id, until=tomorrow))) == 3
@@ -0,0 +1,65 @@
+import pytest
+from scripts.notifications import NotificationDispatcher
+from tests.fake_smtp import FakeSMTPServer
+
+@pytest.fixture
+def smtp_server():
+    """Fixture providing a local stand-in SMTP server."""
+    with FakeSMTPServer() as server:
+        yield server
+
+def make_dispatcher(server, **overrides):
+    """Create a dispatcher pointed at the fake server."""
+    settings = {"host": "127.0.0.1", "port": server.port, "username": "notifier", "password": "secret",
+                "starttls": False, "pool_size": 2, "backoff": 0.01}
+    return NotificationDispatcher(**{**settings, **overrides})
+
+def test_messages_share_pooled_connections(smtp_server):
+    """Ensure many messages go out over at most pool_size logged-in connections."""
+    dispatcher = make_dispatcher(smtp_server)
+    for i in range(25):
+        dispatcher.submit(f"approver{i}@example.com", f"Plan {i} changed", "Please review.")
+    dispatcher.flush()
+    dispatcher.close()
+
+    assert dispatcher.sent == 25 and dispatcher.failed == 0
+    assert len(smtp_server.messages) == 25
+    assert smtp_server.connections <= 2 and smtp_server.logins == smtp_server.connections
+    assert any(b"Subject: Plan 0 changed" in data for _, data in smtp_server.messages)
+
+def test_transient_failures_are_retried(smtp_server):
+    """Ensure deferred replies and dropped connections are retried on a fresh attempt."""
+    smtp_server.defer_next = 1
+    smtp_server.drop_next = 1
+    dispatcher = make_dispatcher(smtp_server, pool_size=1)
+    dispatcher.submit("approver@example.com", "Retry me", "Body")
+    dispatcher.submit("approver@example.com", "And me", "Body")
+    dispatcher.close()
+
+    assert dispatcher.sent == 2 and dispatcher.retried == 2
+    assert smtp_server.connections == 2
+
+def test_gives_up_after_max_retries(smtp_server):
+    """Ensure a message that keeps failing is counted as failed without blocking the queue."""
+    smtp_server.defer_next = 10
+    dispatcher = make_dispatcher(smtp_server, pool_size=1, max_retries=2)
+    dispatcher.submit("approver@example.com", "Never delivered", "Body")
+    dispatcher.flush()
+    assert dispatcher.failed == 1 and dispatcher.retried == 2
+
+    smtp_server.defer_next = 0
+    dispatcher.submit("approver@example.com", "Delivered", "Body")
+    dispatcher.close()
+    assert dispatcher.sent == 1
+
+def test_send_email_reports_the_send_result(smtp_server, monkeypatch):
+    """Ensure the legacy send_email helper waits for delivery and returns False when it fails."""
+    from scripts.utils import send_email
+    dispatcher = make_dispatcher(smtp_server, pool_size=1, max_retries=1)
+    monkeypatch.setattr("scripts.notifications._dispatcher", dispatcher)
+    assert send_email("approver@example.com", "Sent", "Body") is True
+    assert len(smtp_server.messages) == 1
+
+    smtp_server.defer_next = 10
+    assert send_email("approver@example.com", "Not sent", "Body") is False
+    dispatcher.close()
@@ -0,0 +1,63 @@
+import pytest
+from db.query import create_user, create_plan, save_plan_version, delete_plan, diff_plan_versions
+from db.database_setup import session
+from db.models import PlanDiff, User
+from scripts import plan_diff
+from scripts.plan_diff import split_sections, diff_sections
+
+TEMPLATE_PATH = "templates/drp_master_template.md"
+
+def test_split_sections_uses_heading_paths():
+    """Ensure ## and ### headings become nested section paths."""
+    template = open(TEMPLATE_PATH).read()
+    paths = [section.path for section in split_sections(template)]
+    assert paths[0] == ""
+    assert "Key Contacts and Roles/Escalation Contacts" in paths
+    assert "".join(section.text for section in split_sections(template)) == template
+
+def test_diff_only_reports_changed_sections():
+    """Ensure unchanged sections are skipped and changes are line-diffed."""
+    template = open(TEMPLATE_PATH).read()
+    edited = template.replace("[System A]", "Payroll").replace("## Scope", "## Scope of Plan")
+    diffs = {d.path: d for d in diff_sections(template, edited)}
+    assert set(diffs) == {
+        "Risk Assessment/Business Impact Analysis (BIA)", "Appendices/Appendix B: Critical System Inventory",
+        "Scope of Plan", "Scope",
+    }
+    assert diffs["Scope"].status == "removed"
+    assert diffs["Scope of Plan"].status == "added"
+    assert "+  - System Name: Payroll" in diffs["Risk Assessment/Business Impact Analysis (BIA)"].lines
+
+@pytest.fixture
+def diff_plan():
+    """Fixture to create a plan with two versions."""
+    create_user("diff_tester", "DiffPass123!", "editor")
+    plan = create_plan("Diff Plan", "drp", "diff_tester", "nist")
+    save_plan_version(plan.id, "# Plan\n## Scope\n- Old system\n## Contacts\n- Alice\n")
+    save_plan_version(plan.id, "# Plan\n## Scope\n- New system\n## Contacts\n- Alice\n")
+    plan_diff.clear_diff_cache()
+    session.query(PlanDiff).delete()
+    session.commit()
+    yield plan
+    delete_plan(plan.id)
+    session.query(User).filter_by(username="diff_tester").delete()
+    session.commit()
+
+def test_diff_plan_versions_is_cached_in_process(diff_plan, monkeypatch):
+    """Ensure repeated diffs of the same pair in one process skip reconstruction."""
+    diffs = diff_plan_versions(diff_plan.id, 1, 2)
+    assert [(d.path, d.status) for d in diffs] == [("Scope", "changed")]
+
+    monkeypatch.setattr("db.query.reconstruct", lambda *args: pytest.fail("content was reloaded"))
+    assert diff_plan_versions(diff_plan.id, 1, 2) is diffs
+    assert diff_plan_versions(diff_plan.id, 1, 9) is None
+
+def test_diff_plan_versions_is_saved_across_runs(diff_plan, monkeypatch):
+    """Ensure a diff saved by an earlier run is reused once the in-process cache is empty."""
+    diffs = diff_plan_versions(diff_plan.id, 1, 2, context=1)
+    assert session.query(PlanDiff).filter_by(context=1).count() == 1
+
+    plan_diff.clear_diff_cache()
+    monkeypatch.setattr("db.query.reconstruct", lambda *args: pytest.fail("content was reloaded"))
+    monkeypatch.setattr("db.query.diff_sections", lambda *args: pytest.fail("diff was recomputed"))
+    assert diff_plan_versions(diff_plan.id, 1, 2, context=1) == diffs
@@ -1,7 +1,7 @@
 import pytest
-from db.query import create_user, create_plan, list_plans  # Fix: Import create_user
+from db.query import create_user, create_plan, list_plans, plan_catalog, save_plan_version  # Fix: Import create_user
 from db.database_setup import session
-from db.models import Plan, User
+from db.models import Plan, PlanVersion, PlanSection, User
 
 @pytest.fixture
 def test_user():
@@ -16,6 +16,8 @@ def test_plan(test_user):
     """Fixture to create a test plan."""
     plan = create_plan("Test Plan", "drp", "plan_tester", "nist")
     yield plan
+    session.query(PlanVersion).filter_by(plan_id=plan.id).delete()
+    session.query(PlanSection).filter_by(plan_id=plan.id).delete()
     session.query(Plan).filter_by(title="Test Plan").delete()
     session.commit()
 
@@ -27,3 +29,32 @@ def test_list_plans(test_plan):
     """Test if plans are listed correctly."""
     plans = list_plans()
     assert any(plan.title == "Test Plan" for plan in plans)
+
+def test_plan_catalog_summary(test_plan):
+    """Ensure catalog rows carry the owner name and latest version number."""
+    save_plan_version(test_plan.id, "Draft one\n")
+    save_plan_version(test_plan.id, "Draft two\n")
+
+    rows = list(plan_catalog(owner="plan_tester", plan_type="drp"))
+    assert len(rows) == 1
+    assert rows[0].title == "Test Plan"
+    assert rows[0].owner == "plan_tester"
+    assert rows[0].latest_version == 2
+
+def test_plan_catalog_sort_and_pagination(test_user):
+    """Ensure sorting and limit/offset page through plans in order."""
+    for title in ("Catalog C", "Catalog A", "Catalog B"):
+        create_plan(title, "irp", "plan_tester", "nist")
+
+    rows = list(plan_catalog(owner="plan_tester", sort_by="title", limit=2))
+    assert [row.title for row in rows] == ["Catalog A", "Catalog B"]
+    rows = list(plan_catalog(owner="plan_tester", sort_by="title", limit=2, offset=2))
+    assert [row.title for row in rows] == ["Catalog C"]
+
+    session.query(Plan).filter(Plan.title.startswith("Catalog")).delete()
+    session.commit()
+
+def test_plan_catalog_invalid_sort():
+    """Ensure unknown sort keys are rejected."""
+    with pytest.raises(ValueError):
+        list(plan_catalog(sort_by="password_hash"))
@@ -0,0 +1,44 @@
+import json
+from click.testing import CliRunner
+from db.query import create_user, get_user_by_username, list_plans
+from db.database_setup import session
+from db.models import User
+from db.profiling import QueryProfiler
+from main import cli
+
+def test_profiler_counts_statements_and_repeats():
+    """Ensure statements, commits and repeated queries are recorded."""
+    with QueryProfiler(repeat_threshold=3) as profiler:
+        create_user("profile_tester", "ProfilePass123!", "viewer")
+        for _ in range(4):
+            session.expire_all()
+            get_user_by_username("profile_tester")
+        list_plans()
+
+    summary = profiler.summary()
+    assert summary["statements"] >= 6
+    assert summary["commits"] >= 1
+    assert summary["db_ms"] <= summary["wall_ms"]
+    assert any(item["count"] >= 4 and "FROM users" in item["statement"] for item in summary["repeated"])
+    assert len(summary["slowest"]) <= 5
+
+    session.query(User).filter_by(username="profile_tester").delete()
+    session.commit()
+
+def test_profiler_stops_listening():
+    """Ensure statements after stop() are not counted."""
+    profiler = QueryProfiler().start()
+    list_plans()
+    profiler.stop()
+    counted = profiler.summary()["statements"]
+    list_plans()
+    assert profiler.summary()["statements"] == counted
+
+def test_cli_profile_option(tmp_path):
+    """Ensure --profile-output writes the JSON summary for the command."""
+    output = tmp_path / "profile.json"
+    result = CliRunner().invoke(cli, ["--profile-output", str(output), "list-plans-cli", "--limit", "1"])
+    assert result.exit_code == 0
+    summary = json.loads(output.read_text())
+    assert summary["command"] == "list-plans-cli"
+    assert summary["statements"] >= 1
@@ -0,0 +1,88 @@
+import gzip
+import os
+import pytest
+from datetime import date, datetime, timedelta, UTC
+from db.query import create_user, log_action, view_logs, archive_old_logs, log_report
+from db.database_setup import create_db_engine, ensure_schema, session
+from db.models import Log, LogRollup, LogSegment, User
+from db.retention import archive_logs
+
+@pytest.fixture
+def retention_user():
+    """Fixture to create a user with a mix of old and recent logs."""
+    user = create_user("retention_tester", "RetentionPass123!", "admin")
+    session.query(Log).filter_by(user_id=user.id).delete()  # Leftovers from earlier users with this id
+    session.query(LogRollup).filter_by(user_id=user.id).delete()
+    now = datetime.now(UTC).replace(tzinfo=None)
+    for days_ago, action in ((400, "Exported plan 1"), (200, "Deleted plan 1"), (120, "Exported plan 2")):
+        session.add(Log(user_id=user.id, action=action, timestamp=now - timedelta(days=days_ago)))
+    session.commit()
+    log_action(user.id, "Exported plan 3")
+    yield user
+    session.query(LogSegment).delete()
+    session.query(LogRollup).filter_by(user_id=user.id).delete()
+    session.query(Log).filter_by(user_id=user.id).delete()
+    session.query(User).filter_by(username="retention_tester").delete()
+    session.commit()
+
+def test_archive_moves_old_logs_to_segments(retention_user, tmp_path):
+    """Ensure old logs leave the hot table but still come back from view_logs in order."""
+    before = [(log.id, log.action) for log in view_logs(user_id=retention_user.id)]
+    assert archive_old_logs(older_than_days=90, archive_dir=str(tmp_path)) == (1, 3)
+    segment = session.query(LogSegment).one()
+    assert os.path.exists(segment.path) and segment.row_count == 3
+
+    assert session.query(Log).filter_by(user_id=retention_user.id).count() == 1
+    assert [(log.id, log.action) for log in view_logs(user_id=retention_user.id)] == before
+    assert [log.action for log in view_logs(user_id=retention_user.id, action_prefix="Exported")] == [
+        "Exported plan 1", "Exported plan 2", "Exported plan 3",
+    ]
+    assert len(list(view_logs(user_id=retention_user.id, limit=2))) == 2
+    assert len(list(view_logs(user_id=retention_user.id, include_archive=False))) == 1
+    assert list(view_logs(user_id=retention_user.id, after_id=before[1][0]))[0].id == before[2][0]
+    assert archive_old_logs(older_than_days=90, archive_dir=str(tmp_path)) == (0, 0)
+
+def test_rollups_count_every_write(retention_user, tmp_path):
+    """Ensure rollups track log writes and survive archival and rebuilds."""
+    today = datetime.now(UTC).date()
+    rows = log_report(user_id=retention_user.id, group_by=("action",))
+    assert [(row.action, row.total) for row in rows] == [("Exported plan 3", 1)]
+
+    archive_old_logs(older_than_days=90, archive_dir=str(tmp_path))
+    rows = log_report(user_id=retention_user.id, group_by=("user",), rebuild=True)
+    assert [(row.user, row.total) for row in rows] == [("retention_tester", 4)]
+    rows = log_report(since=today - timedelta(days=365), until=today + timedelta(days=1),
+                      user_id=retention_user.id, action_prefix="Exported", group_by=("day",))
+    assert [row.total for row in rows] == [1, 1]
+    with pytest.raises(ValueError):
+        log_report(group_by=("password_hash",))
+
+@pytest.fixture
+def archive_engine(tmp_path):
+    """Fixture providing an engine on its own database file."""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    ensure_schema(engine)
+    yield engine
+    engine.dispose()
+
+def test_archived_ids_are_never_reused(archive_engine, tmp_path, monkeypatch):
+    """Ensure new logs get ids above archived ones, segments are never overwritten and paths are absolute."""
+    monkeypatch.chdir(tmp_path)
+    old = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=200)
+    with archive_engine.begin() as conn:
+        conn.execute(Log.__table__.insert(), [{"action": "First", "timestamp": old}])
+    assert archive_logs(older_than_days=90, archive_dir="archive", engine=archive_engine) == (1, 1)
+
+    with archive_engine.begin() as conn:
+        conn.execute(Log.__table__.insert(), [{"action": "Second", "timestamp": old}])
+        assert conn.execute(Log.__table__.select()).one().id == 2
+        orphan = tmp_path / "archive" / "logs-0000000002-0000000002.ndjson.gz"
+        orphan.write_bytes(b"left by an interrupted run")
+    assert archive_logs(older_than_days=90, archive_dir="archive", engine=archive_engine) == (1, 1)
+
+    with archive_engine.connect() as conn:
+        paths = conn.execute(LogSegment.__table__.select().order_by(LogSegment.id)).all()
+    assert [os.path.isabs(row.path) for row in paths] == [True, True]
+    with gzip.open(paths[0].path, "rt") as file:
+        assert '"First"' in file.read()
+    assert len(list((tmp_path / "archive").glob("*.orphaned-*"))) == 1
@@ -0,0 +1,44 @@
+import pytest
+from db.query import create_user, create_plan, save_plan_version, rollback_plan, delete_plan, search_plans
+from db.database_setup import session
+from db.models import User
+
+@pytest.fixture
+def searchable_plans():
+    """Fixture to create a DRP and an IRP with searchable content."""
+    create_user("search_tester", "SearchPass123!", "editor")
+    drp = create_plan("Payroll Recovery", "drp", "search_tester", "nist")
+    irp = create_plan("Ransomware Response", "irp", "search_tester", "nist")
+    save_plan_version(drp.id, "## Scope\n- Payroll database hosted by Contoso\n")
+    save_plan_version(drp.id, "## Scope\n- Payroll database hosted by Fabrikam\n")
+    save_plan_version(irp.id, "## Contacts\n- Vendor: Contoso incident hotline\n")
+    yield drp, irp
+    for plan in (drp, irp):
+        delete_plan(plan.id)
+    session.query(User).filter_by(username="search_tester").delete()
+    session.commit()
+
+def test_search_ranks_and_snippets(searchable_plans):
+    """Ensure matches come back with highlighted snippets."""
+    drp, irp = searchable_plans
+    results = search_plans("contoso")
+    assert {(r.plan_id, r.version_number) for r in results} == {(drp.id, 1), (irp.id, 1)}
+    assert all("[Contoso]" in r.snippet for r in results)
+
+    # Title matches outrank content-only matches
+    assert search_plans("payroll")[0].title == "Payroll Recovery"
+
+def test_search_filters(searchable_plans):
+    """Ensure plan type and latest-version filters narrow the results."""
+    drp, irp = searchable_plans
+    assert [r.plan_id for r in search_plans("contoso", plan_type="irp")] == [irp.id]
+    assert [r.plan_id for r in search_plans("contoso", latest_only=True)] == [irp.id]
+
+def test_rollback_and_delete_update_index(searchable_plans):
+    """Ensure rollbacks are indexed and deleted plans disappear from results."""
+    drp, irp = searchable_plans
+    rollback_plan(drp.id, 1)
+    assert {r.plan_id for r in search_plans("contoso", latest_only=True)} == {drp.id, irp.id}
+
+    delete_plan(irp.id)
+    assert [r.plan_id for r in search_plans("hotline")] == []
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import event
+from db.query import (
+    create_user, create_plan, save_plan_version, delete_plan, get_plan_content,
+    get_plan_section, list_plan_sections, update_plan_section,
+)
+from db.database_setup import get_engine, session
+from db.models import PlanSection, User
+
+TEMPLATE_PATH = "templates/drp_master_template.md"
+CONTACTS = "Key Contacts and Roles"
+
+@pytest.fixture
+def section_plan():
+    """Fixture to create a plan whose latest version is the DRP template."""
+    create_user("section_tester", "SectionPass123!", "editor")
+    plan = create_plan("Sectioned Plan", "drp", "section_tester", "nist")
+    save_plan_version(plan.id, open(TEMPLATE_PATH).read())
+    yield plan
+    delete_plan(plan.id)
+    session.query(User).filter_by(username="section_tester").delete()
+    session.commit()
+
+def test_sections_compose_latest_version(section_plan):
+    """Ensure the stored sections compose back into the saved document."""
+    template = open(TEMPLATE_PATH).read()
+    paths = [path for path, level, length in list_plan_sections(section_plan.id)]
+    assert paths[0] == "" and CONTACTS in paths
+    assert get_plan_content(section_plan.id) == template
+    assert get_plan_section(section_plan.id, CONTACTS).startswith(f"## {CONTACTS}\n")
+    assert get_plan_section(section_plan.id, "Missing Section") is None
+
+def test_update_section_writes_one_row(section_plan):
+    """Ensure a section update rewrites only that section and records a version."""
+    template = open(TEMPLATE_PATH).read()
+    before = {row.path: row.content_hash for row in session.query(PlanSection).filter_by(plan_id=section_plan.id)}
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(get_engine(), "before_cursor_execute", listener)
+    try:
+        version = update_plan_section(section_plan.id, CONTACTS, "- Incident lead: Dana (555-0100)\n")
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", listener)
+    assert version.version_number == 2 and version.storage == "delta"
+    assert [s for s in statements if s.startswith("UPDATE plan_sections")] == ["UPDATE plan_sections SET content=?, content_hash=? WHERE plan_sections.id = ?"]
+
+    after = {row.path: row.content_hash for row in session.query(PlanSection).filter_by(plan_id=section_plan.id)}
+    assert [path for path in before if before[path] != after[path]] == [CONTACTS]
+    assert get_plan_section(section_plan.id, CONTACTS) == f"## {CONTACTS}\n- Incident lead: Dana (555-0100)\n"
+    assert get_plan_content(section_plan.id, 2) == get_plan_content(section_plan.id)
+    assert get_plan_content(section_plan.id, 1) == template
+
+def test_update_section_rejects_headings(section_plan):
+    """Ensure a body that would change the section structure is refused."""
+    assert update_plan_section(section_plan.id, CONTACTS, "## Sneaky\n- text\n") is None
+    assert update_plan_section(section_plan.id, "Missing Section", "- text\n") is None
+    assert len(section_plan.versions) == 1
+
+def test_sections_backfill_from_versions(section_plan):
+    """Ensure plans saved before section storage existed are split on first read."""
+    session.query(PlanSection).filter_by(plan_id=section_plan.id).delete()
+    session.commit()
+    assert get_plan_section(section_plan.id, CONTACTS).startswith(f"## {CONTACTS}")
+    assert get_plan_content(section_plan.id) == open(TEMPLATE_PATH).read()
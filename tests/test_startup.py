@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def run_python(code):
+    """Run a snippet in a fresh interpreter from the project root and return its stdout."""
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+def test_help_does_not_load_database_stack():
+    """Ensure `main.py --help` never imports SQLAlchemy, werkzeug or bcrypt."""
+    loaded = run_python(
+        "import sys, main\n"
+        "try:\n"
+        "    main.cli(['--help'], standalone_mode=False)\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(m for m in ('sqlalchemy', 'werkzeug', 'bcrypt') if m in sys.modules))"
+    )
+    assert loaded.splitlines()[-1] == "[]"
+
+def test_importing_session_does_not_connect():
+    """Ensure importing db.database_setup creates no engine until a session is used."""
+    assert run_python("import db.database_setup as d; print(d._engine is None)") == "True"
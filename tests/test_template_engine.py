@@ -0,0 +1,69 @@
+import csv
+import pytest
+from click.testing import CliRunner
+from db.query import create_user, create_plans_bulk, get_plan_content
+from db.database_setup import session
+from db.models import Plan, PlanVersion, PlanSection, User
+from scripts.template_engine import CompiledTemplate, load_template, render_inventory
+from scripts.utils import load_records
+from main import cli
+
+def test_compiled_template_records_placeholders():
+    """Ensure placeholders and sections are located once at compile time."""
+    template = CompiledTemplate("# Plan\n## Systems\n- Name: [System A]\n- Backup: [System A] nightly\n")
+    assert template.placeholders["System A"] == [26, 47]
+    assert [title for _, title, _ in template.sections] == ["Plan", "Systems"]
+    assert template.section_of(26) == (2, "Systems")
+
+def test_render_replaces_known_placeholders_only():
+    """Ensure rendering fills given values and leaves the rest untouched."""
+    template = CompiledTemplate("RTO [e.g., 4 hours], RPO [e.g., 15 minutes]")
+    assert template.render({"e.g., 4 hours": "2 hours"}) == "RTO 2 hours, RPO [e.g., 15 minutes]"
+
+def test_master_templates_compile():
+    """Ensure both master templates compile with their known placeholders."""
+    assert "System A" in load_template("drp").placeholders
+    assert "e.g., Splunk, Carbon Black" in load_template("irp").placeholders
+    with pytest.raises(ValueError):
+        load_template("bcp")
+
+@pytest.fixture
+def bulk_owner():
+    """Fixture to create the owner of bulk-generated plans."""
+    user = create_user("bulk_tester", "BulkPass123!", "editor")
+    yield user
+    plan_ids = [plan_id for (plan_id,) in session.query(Plan.id).filter_by(owner_id=user.id)]
+    session.query(PlanVersion).filter(PlanVersion.plan_id.in_(plan_ids)).delete()
+    session.query(PlanSection).filter(PlanSection.plan_id.in_(plan_ids)).delete()
+    session.query(Plan).filter(Plan.id.in_(plan_ids)).delete()
+    session.query(User).filter_by(username="bulk_tester").delete()
+    session.commit()
+
+def test_generate_bulk_from_csv(bulk_owner, tmp_path):
+    """Ensure a CSV inventory renders in a process pool and stores every plan."""
+    inventory = tmp_path / "inventory.csv"
+    with open(inventory, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["system_name", "rto", "rpo", "plan_type"])
+        writer.writeheader()
+        for i in range(30):
+            writer.writerow({"system_name": f"Billing {i}", "rto": "2 hours", "rpo": "5 minutes",
+                             "plan_type": "irp" if i % 3 == 0 else "drp"})
+
+    rendered = render_inventory(load_records(str(inventory), list_key="systems"), {"owner": "bulk_tester"}, workers=2, chunk_size=10)
+    plan_ids = create_plans_bulk(rendered)
+    assert len(plan_ids) == 30
+
+    content = get_plan_content(plan_ids[1])
+    assert "System Name: Billing 1" in content
+    assert "Recovery Time Objective (RTO): 2 hours" in content
+    assert session.get(Plan, plan_ids[0]).title == "Billing 0 IRP"
+
+def test_generate_bulk_reports_bad_rows(bulk_owner, tmp_path):
+    """Ensure rows with an unknown plan type are reported by row number and the rest are generated."""
+    inventory = tmp_path / "inventory.csv"
+    inventory.write_text("system_name,plan_type\nPayroll,drp\nLedger,bcp\nHR,\n")
+    result = CliRunner().invoke(cli, ["generate-bulk", "bulk_tester", "BulkPass123!", str(inventory)])
+    assert result.exit_code == 0, result.output
+    assert "Row 2 (Ledger): No master template for plan type 'bcp'." in result.output
+    assert "Generated 2 of 3 plans, 1 failed" in result.output
+    assert sorted(title for (title,) in session.query(Plan.title).filter_by(owner_id=bulk_owner.id)) == ["HR DRP", "Payroll DRP"]
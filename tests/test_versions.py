@@ -0,0 +1,60 @@
+import pytest
+from db.query import create_user, create_plan, save_plan_version, list_plan_versions, get_plan_content, rollback_plan
+from db.database_setup import session
+from db.models import Plan, PlanVersion, PlanSection, User
+from db.versioning import KEYFRAME_INTERVAL, make_delta, apply_delta
+
+TEMPLATE_PATH = "templates/drp_master_template.md"
+
+@pytest.fixture
+def test_plan():
+    """Fixture to create a plan owned by a fresh user."""
+    create_user("version_tester", "VersionPass123!", "editor")
+    plan = create_plan("Versioned Plan", "drp", "version_tester", "nist")
+    yield plan
+    session.query(PlanVersion).filter_by(plan_id=plan.id).delete()
+    session.query(PlanSection).filter_by(plan_id=plan.id).delete()
+    session.query(Plan).filter_by(id=plan.id).delete()
+    session.query(User).filter_by(username="version_tester").delete()
+    session.commit()
+
+def edited(template, n):
+    """Return the template with a single line changed for edit n."""
+    return template.replace("[System A]", f"System {n}")
+
+def test_delta_roundtrip():
+    """Ensure applying a delta reproduces the new content exactly."""
+    old = "a\nb\nc\nd"
+    new = "a\nB\nc\nd\ne\n"
+    assert apply_delta(old, make_delta(old, new)) == new
+
+def test_reconstruct_every_version(test_plan):
+    """Ensure every saved version can be reconstructed across keyframe boundaries."""
+    template = open(TEMPLATE_PATH).read()
+    total = KEYFRAME_INTERVAL * 2 + 3
+    for n in range(1, total + 1):
+        save_plan_version(test_plan.id, edited(template, n))
+
+    for n in (1, 2, KEYFRAME_INTERVAL, KEYFRAME_INTERVAL + 1, total):
+        assert get_plan_content(test_plan.id, n) == edited(template, n)
+    assert get_plan_content(test_plan.id) == edited(template, total)
+
+    versions = session.query(PlanVersion).filter_by(plan_id=test_plan.id).all()
+    keyframes = [v for v in versions if v.storage == "full"]
+    assert len(keyframes) == 3
+    stored = sum(len(v.payload) for v in versions)
+    assert stored * 10 < len(template) * total
+
+def test_rollback_creates_new_version(test_plan):
+    """Ensure rollback restores old content as the newest version."""
+    save_plan_version(test_plan.id, "first draft\n")
+    save_plan_version(test_plan.id, "second draft\n")
+
+    version = rollback_plan(test_plan.id, 1)
+    assert version.version_number == 3
+    assert get_plan_content(test_plan.id) == "first draft\n"
+    assert [v.version_number for v in list_plan_versions(test_plan.id)] == [1, 2, 3]
+
+def test_rollback_missing_version(test_plan):
+    """Ensure rolling back to a non-existent version fails cleanly."""
+    assert rollback_plan(test_plan.id, 42) is None